@@ -0,0 +1,144 @@
+"""
+Queued logging for the backend.
+
+Request threads only enqueue log records; a QueueListener thread formats
+and writes them. Records are enqueued unformatted, so f-string-free
+logger.debug("...%s", x) calls cost next to nothing when DEBUG is off and
+formatting never happens on the request path even when it is on.
+
+Two streams:
+    root logger   -> stderr (captured into logs/server.log by run_stack.sh)
+    access log    -> logs/access.log, one JSON object per request, rotated
+
+    BACKEND_LOG_LEVEL=INFO      root level (DEBUG re-enables handler debug output)
+    ACCESS_LOG=logs/access.log  access log path ("" disables it)
+    ACCESS_LOG_SAMPLE=1.0       fraction of successful requests logged; errors always are
+"""
+import os
+import re
+import sys
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_LEVEL = os.environ.get("BACKEND_LOG_LEVEL", "INFO").upper()
+ACCESS_LOG_PATH = os.environ.get("ACCESS_LOG", os.path.join(PROJECT_ROOT, "logs", "access.log"))
+ACCESS_LOG_SAMPLE = float(os.environ.get("ACCESS_LOG_SAMPLE", "1.0"))
+ACCESS_LOG_MAX_BYTES = 10 * 1024 * 1024
+ACCESS_LOG_BACKUPS = 5
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# "HamClock-linux/4.22 (id 1301431275 up 510) crc 0"
+HAMCLOCK_UA = re.compile(r"HamClock-([\w.-]+)/([\d.]+\w*)(?: \(id (\d+)(?: up (\d+))?\))?")
+
+access_logger = logging.getLogger("hamclock.access")
+access_logger.propagate = False
+
+_listeners = []
+_atexit_registered = False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as-is; the listener thread does all formatting."""
+
+    def prepare(self, record):
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        fields = record.msg if isinstance(record.msg, dict) else {"msg": record.getMessage()}
+        return json.dumps({"ts": round(record.created, 3), **fields}, separators=(",", ":"))
+
+
+def _attach(logger, handler):
+    q = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(q))
+    listener = logging.handlers.QueueListener(q, handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+
+def setup_logging(level=LOG_LEVEL, access_path=ACCESS_LOG_PATH):
+    """Route the root logger and the access log through queue listeners."""
+    if _listeners:
+        return
+    root = logging.getLogger()
+    root.setLevel(level)
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    _attach(root, stream)
+
+    if access_path:
+        os.makedirs(os.path.dirname(access_path), exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(
+            access_path, maxBytes=ACCESS_LOG_MAX_BYTES, backupCount=ACCESS_LOG_BACKUPS, delay=True)
+        rotating.setFormatter(JsonFormatter())
+        _attach(access_logger, rotating)
+        access_logger.setLevel(logging.INFO)
+    else:
+        access_logger.disabled = True
+    global _atexit_registered
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
+
+
+def reinit_after_fork(access_path=ACCESS_LOG_PATH):
+    """
+    In a forked worker: the listener threads did not survive the fork, so
+    replace the queue handlers with fresh ones.
+    """
+    _listeners.clear()
+    for logger in (logging.getLogger(), access_logger):
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+    access_logger.disabled = False
+    setup_logging(access_path=access_path)
+
+
+def worker_access_path(worker, access_path=ACCESS_LOG_PATH):
+    """logs/access.log -> logs/access.w<N>.log, so workers don't rotate each other's file."""
+    if not access_path:
+        return access_path
+    root, ext = os.path.splitext(access_path)
+    return f"{root}.w{worker}{ext}"
+
+
+def stop_logging():
+    """Flush and stop the listener threads."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def parse_client(user_agent):
+    """
+    (platform, version, client id, uptime) from a HamClock User-Agent;
+    fields are None for other clients.
+    """
+    m = HAMCLOCK_UA.search(user_agent or "")
+    if not m:
+        return None, None, None, None
+    platform, version, cid, up = m.groups()
+    return platform, version, cid, int(up) if up else None
+
+
+def client_key(user_agent, address):
+    """HamClock client id when present, else the peer address."""
+    cid = parse_client(user_agent)[2]
+    return cid if cid else address
+
+
+def log_access(fields):
+    """Log one request. Successful requests are sampled at ACCESS_LOG_SAMPLE."""
+    if access_logger.disabled:
+        return
+    if (fields.get("status") or 0) < 400 and ACCESS_LOG_SAMPLE < 1.0 and random.random() >= ACCESS_LOG_SAMPLE:
+        return
+    access_logger.info(fields)
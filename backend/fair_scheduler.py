@@ -0,0 +1,233 @@
+"""
+Per-client fair scheduling for expensive routes.
+
+Routes registered with a `cost` (VOACAP maps, band conditions, wx.pl, ...)
+go through two stages; routes with cost 0 (static files) never touch it.
+
+1. Token bucket per client: `cost` tokens per request, refilled at
+   SCHED_RATE tokens/s up to SCHED_BURST. An empty bucket answers 429 with
+   Retry-After.
+2. Weighted fair queueing for SCHED_SLOTS concurrent executions. Each
+   request gets a virtual finish tag max(V, client's last tag) + cost/weight
+   and free slots go to the lowest tag, so a client firing many requests
+   queues behind everyone else's occasional ones instead of ahead of them.
+   A request that waits longer than SCHED_MAX_WAIT seconds answers 503.
+
+Clients are keyed by the HamClock User-Agent id (see access_log.client_key),
+falling back to the peer address.
+
+    SCHED_SLOTS=8          concurrent expensive requests
+    SCHED_RATE=1.0         tokens/s per client
+    SCHED_BURST=20         bucket size
+    SCHED_MAX_WAIT=30      seconds a request may queue
+    SCHED_WEIGHTS=id:2,..  per-client weights (default 1)
+"""
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+
+SLOTS = int(os.environ.get("SCHED_SLOTS", max(4, 2 * (os.cpu_count() or 1))))
+RATE = float(os.environ.get("SCHED_RATE", "1.0"))
+BURST = float(os.environ.get("SCHED_BURST", "20"))
+MAX_WAIT = float(os.environ.get("SCHED_MAX_WAIT", "30"))
+MAX_CLIENTS = int(os.environ.get("SCHED_MAX_CLIENTS", "10000"))
+
+
+def parse_weights(spec):
+    """"1301431275:2,10.0.0.5:0.5" -> {client: weight}"""
+    weights = {}
+    for item in spec.split(","):
+        client, sep, weight = item.strip().rpartition(":")
+        if sep and client:
+            weights[client] = float(weight)
+    return weights
+
+
+class _Client:
+    __slots__ = ("tokens", "stamp", "last_finish", "weight", "in_flight",
+                 "requests", "cost", "throttled", "rejected", "wait_s", "busy_s")
+
+    def __init__(self, tokens, weight):
+        self.tokens = tokens
+        self.stamp = time.monotonic()
+        self.last_finish = 0.0
+        self.weight = weight
+        self.in_flight = 0
+        self.requests = 0
+        self.cost = 0.0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_s = 0.0
+        self.busy_s = 0.0
+
+
+class _Waiter:
+    __slots__ = ("client", "state", "start", "enqueued", "wake", "admitted", "cancelled")
+
+    def __init__(self, client, state, start, wake):
+        self.client = client
+        self.state = state
+        self.start = start
+        self.enqueued = time.monotonic()
+        self.wake = wake
+        self.admitted = False
+        self.cancelled = False
+
+
+class FairScheduler:
+    def __init__(self, slots=SLOTS, rate=RATE, burst=BURST, max_wait=MAX_WAIT,
+                 weights=None, max_clients=MAX_CLIENTS):
+        self.slots = slots
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.weights = weights if weights is not None else parse_weights(os.environ.get("SCHED_WEIGHTS", ""))
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+        self._queue = []  # (finish tag, seq, waiter)
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._busy = 0
+
+    def _client(self, client):
+        state = self._clients.get(client)
+        if state is None:
+            state = self._clients[client] = _Client(self.burst, self.weights.get(client, 1.0))
+            if len(self._clients) > self.max_clients:
+                self._evict()
+        else:
+            self._clients.move_to_end(client)
+        return state
+
+    def _evict(self):
+        # Least recently seen idle clients; their bucket would be full again anyway
+        for client in list(self._clients)[:len(self._clients) - self.max_clients]:
+            if self._clients[client].in_flight == 0:
+                del self._clients[client]
+
+    def throttle(self, client, cost):
+        """Take `cost` tokens from the client's bucket. 0 if allowed, else seconds until it would be."""
+        cost = min(cost, self.burst)
+        with self._lock:
+            state = self._client(client)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.stamp) * self.rate)
+            state.stamp = now
+            if state.tokens >= cost:
+                state.tokens -= cost
+                state.requests += 1
+                state.cost += cost
+                return 0.0
+            state.throttled += 1
+            return (cost - state.tokens) / self.rate
+
+    def enqueue(self, client, cost, wake):
+        """
+        Ask for a slot. Returns None when admitted at once; otherwise a waiter
+        whose `wake()` is called (from another thread) once it is admitted.
+        """
+        with self._lock:
+            state = self._client(client)
+            start = max(self._vtime, state.last_finish)
+            finish = start + cost / state.weight
+            state.last_finish = finish
+            waiter = _Waiter(client, state, start, wake)
+            if self._busy < self.slots and not self._queue:
+                self._admit(waiter)
+                return None
+            heapq.heappush(self._queue, (finish, next(self._seq), waiter))
+            return waiter
+
+    def _admit(self, waiter):
+        self._busy += 1
+        self._vtime = max(self._vtime, waiter.start)
+        waiter.admitted = True
+        waiter.state.in_flight += 1
+        waiter.state.wait_s += time.monotonic() - waiter.enqueued
+
+    def cancel(self, waiter):
+        """Give up waiting. False if the waiter was admitted meanwhile (the caller then owns a slot)."""
+        with self._lock:
+            if waiter.admitted:
+                return False
+            waiter.cancelled = True
+            waiter.state.rejected += 1
+            return True
+
+    def release(self, client, busy_s=0.0):
+        """Return a slot and admit the next waiters in finish-tag order."""
+        woken = []
+        with self._lock:
+            self._busy -= 1
+            state = self._clients.get(client)
+            if state is not None:
+                state.in_flight -= 1
+                state.busy_s += busy_s
+            while self._queue and self._busy < self.slots:
+                _, _, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                self._admit(waiter)
+                woken.append(waiter)
+        for waiter in woken:
+            waiter.wake()
+
+    def acquire(self, client, cost):
+        """Blocking enqueue for handler threads. False after max_wait seconds."""
+        event = threading.Event()
+        waiter = self.enqueue(client, cost, event.set)
+        if waiter is None or event.wait(self.max_wait):
+            return True
+        return not self.cancel(waiter)
+
+    async def acquire_async(self, client, cost):
+        """enqueue() for the asyncio front end. False after max_wait seconds."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+
+        waiter = self.enqueue(client, cost, wake)
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return not self.cancel(waiter)
+
+    def stats(self, top=20):
+        """Slot usage plus the `top` clients by tokens consumed."""
+        with self._lock:
+            clients = sorted(self._clients.items(), key=lambda item: -item[1].cost)[:top]
+            queued = sum(1 for _, _, w in self._queue if not w.cancelled)
+            return {
+                "slots": self.slots, "busy": self._busy, "queued": queued, "clients": len(self._clients),
+                "rate": self.rate, "burst": self.burst,
+                "top": [{"client": client, "weight": s.weight, "requests": s.requests, "cost": round(s.cost, 2),
+                         "throttled": s.throttled, "rejected": s.rejected, "in_flight": s.in_flight,
+                         "tokens": round(s.tokens, 2), "wait_s": round(s.wait_s, 3), "busy_s": round(s.busy_s, 3)}
+                        for client, s in clients],
+            }
+
+    def prometheus_lines(self, top=20):
+        stats = self.stats(top)
+        lines = ["# TYPE hamclock_scheduler_busy_slots gauge",
+                 f"hamclock_scheduler_busy_slots {stats['busy']}",
+                 "# TYPE hamclock_scheduler_queued gauge",
+                 f"hamclock_scheduler_queued {stats['queued']}",
+                 "# TYPE hamclock_scheduler_clients gauge",
+                 f"hamclock_scheduler_clients {stats['clients']}"]
+        for name, field in (("hamclock_client_requests_total", "requests"), ("hamclock_client_cost_total", "cost"),
+                            ("hamclock_client_throttled_total", "throttled"), ("hamclock_client_rejected_total", "rejected"),
+                            ("hamclock_client_wait_seconds_total", "wait_s"), ("hamclock_client_busy_seconds_total", "busy_s")):
+            lines.append(f"# TYPE {name} counter")
+            for entry in stats["top"]:
+                lines.append(f'{name}{{client="{entry["client"]}"}} {entry[field]}')
+        return lines
@@ -1,7 +1,10 @@
-import requests
 import os
 import re
 import datetime
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 CTY_WT_MOD_URL = "https://download.win-test.com/files/country/CTY_WT_MOD.DAT"
 # Fallback if win-test is down
@@ -14,6 +17,7 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "backend", "data", "processed_data", "cty")
 def fetch_and_process_cty():
     """Download or use local CTY_WT_MOD.DAT and derive cty_wt_mod-ll-dxcc.txt"""
     content = None
+    changed = True
     local_source = os.path.join(BASE_DIR, "CTY_WT_MOD.DAT")
     
     if os.path.exists(local_source):
@@ -28,16 +32,18 @@ def fetch_and_process_cty():
         print(f"Fetching CTY data from {CTY_WT_MOD_URL}...")
         headers = {'User-Agent': 'HamClock/1.0'}
         try:
-            resp = requests.get(CTY_WT_MOD_URL, headers=headers, timeout=30)
+            resp = upstream.get(CTY_WT_MOD_URL, headers=headers, timeout=30)
             resp.raise_for_status()
             content = resp.text
+            changed = resp.changed
         except Exception as e:
             print(f"Error fetching from primary URL: {e}")
             try:
                 print(f"Trying fallback {FALLBACK_URL}...")
-                resp = requests.get(FALLBACK_URL, headers=headers, timeout=30)
+                resp = upstream.get(FALLBACK_URL, headers=headers, timeout=30)
                 resp.raise_for_status()
                 content = resp.text
+                changed = resp.changed
             except Exception as e2:
                 print(f"Fallback failed: {e2}")
                 return None
@@ -49,6 +55,10 @@ def fetch_and_process_cty():
         os.makedirs(OUTPUT_DIR)
 
     output_path = os.path.join(OUTPUT_DIR, "cty_wt_mod-ll-dxcc.txt")
+    if not changed and os.path.exists(output_path):
+        print(f"CTY source unchanged; keeping {output_path}")
+        os.utime(output_path)  # the scheduler ages this source by its mtime on start-up
+        return output_path
     
     entities = []
     current_adif = None
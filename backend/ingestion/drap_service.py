@@ -1,11 +1,14 @@
 import os
-import requests
 import logging
 import time
 import struct
 import zlib
 import calendar
 from PIL import Image
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 logger = logging.getLogger(__name__)
 
@@ -92,7 +95,7 @@ def get_color_rgb565(v):
 def fetch_and_process_drap():
     try:
         logger.info(f"Fetching DRAP data from {DRAP_DATA_URL}")
-        resp = requests.get(DRAP_DATA_URL, timeout=10)
+        resp = upstream.get(DRAP_DATA_URL, timeout=10)
         resp.raise_for_status()
         
         lines = resp.text.splitlines()
@@ -163,6 +166,11 @@ def fetch_and_process_drap():
             for u in filtered_uts[-400:]: # Keep exactly 400 points to match client read limit
                 f.write(f"{history[u]}\n")
         
+        # The stats above are re-anchored to now every run; the map only follows the grid
+        if not resp.changed and os.path.exists(MAP_FILE) and os.path.exists(MAP_FILE_Z):
+            logger.info("DRAP grid unchanged; keeping maps")
+            return True
+
         # Map generation (660x330)
         # Interpolate the source grid (usually 90 longitudes x 37 latitudes)
         # We'll use PIL to interpolate then convert to 565
@@ -1,13 +1,19 @@
-import requests
 import re
 import datetime
 import logging
 import time
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 logger = logging.getLogger(__name__)
 
 ADXO_URL = "https://www.ng3k.com/Misc/adxo.html"
 
+# Rows parsed from the last page fetched, reused while the page is unchanged
+_last_results = None
+
 def parse_adxo_date(date_str):
     """Parse NG3K date format like '2026 Jan01' or '2026 Jan31'"""
     try:
@@ -21,12 +27,15 @@ def parse_adxo_date(date_str):
 
 def fetch_dxpeditions():
     """Fetch and parse NG3K DXPeditions"""
+    global _last_results
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        resp = requests.get(ADXO_URL, headers=headers, timeout=15)
+        resp = upstream.get(ADXO_URL, headers=headers, timeout=15)
         resp.raise_for_status()
+        if not resp.changed and _last_results is not None:
+            return list(_last_results)
         html = resp.text
         
         # Regex to find rows: <tr class="adxoitem".*?</tr>
@@ -65,6 +74,7 @@ def fetch_dxpeditions():
             except Exception as e:
                 logger.debug(f"Error parsing row: {e}")
         
+        _last_results = list(results)
         return results
     except Exception as e:
         logger.error(f"Error fetching ADXO: {e}")
@@ -1,5 +1,8 @@
-import requests
 import sys
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 def get_geoloc(ip=None):
     """
@@ -11,7 +14,7 @@ def get_geoloc(ip=None):
         url += ip
         
     try:
-        resp = requests.get(url, timeout=10)
+        resp = upstream.fetch(url, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         
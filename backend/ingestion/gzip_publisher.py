@@ -0,0 +1,84 @@
+import os
+import sys
+import gzip
+import logging
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "processed_data")
+
+# Only text products are worth it; .bmp.z maps are already zlib-compressed
+GZIP_SUFFIXES = (".txt",)
+MIN_GZIP_BYTES = 1024
+
+
+def publish_gzip(path):
+    """
+    Write `path`.gz next to `path` and give it the source's mtime, so the
+    server can tell a variant is current by comparing mtimes. Returns
+    (raw bytes, gzip bytes). The variant is written atomically.
+    """
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        raw = f.read()
+    # mtime=0 keeps the output deterministic for identical input
+    data = gzip.compress(raw, compresslevel=9, mtime=0)
+    gz_path = path + ".gz"
+    tmp_path = gz_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp_path, gz_path)
+    return len(raw), len(data)
+
+
+def publish_gzip_variants(root=OUTPUT_DIR, min_bytes=MIN_GZIP_BYTES):
+    """
+    Refresh stale gzip variants for every large text file under `root` and
+    remove variants whose source is gone or too small.
+    Returns {relative path: (raw bytes, gzip bytes)} for every current variant.
+    """
+    report = {}
+    for dirpath, _, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(".gz"):
+                source = name[:-3]
+                if source not in names or os.path.getsize(os.path.join(dirpath, source)) < min_bytes:
+                    os.remove(path)
+                continue
+            if not name.endswith(GZIP_SUFFIXES):
+                continue
+            try:
+                st = os.stat(path)
+                if st.st_size < min_bytes:
+                    continue
+                gz_path = path + ".gz"
+                if os.path.exists(gz_path) and os.stat(gz_path).st_mtime_ns == st.st_mtime_ns:
+                    sizes = (st.st_size, os.path.getsize(gz_path))
+                else:
+                    sizes = publish_gzip(path)
+            except OSError as e:
+                logger.warning(f"Failed to publish gzip variant for {path}: {e}")
+                continue
+            report[os.path.relpath(path, root)] = sizes
+    return report
+
+
+def format_report(report):
+    lines = [f"{'endpoint':45} {'raw':>9} {'gzip':>9} {'saved':>9}"]
+    total_raw = total_gz = 0
+    for rel, (raw, gz) in sorted(report.items()):
+        total_raw += raw
+        total_gz += gz
+        lines.append(f"/{rel:44} {raw:>9} {gz:>9} {raw - gz:>9} ({(1 - gz / raw) * 100:.0f}%)")
+    if report:
+        lines.append(f"{'total':45} {total_raw:>9} {total_gz:>9} {total_raw - total_gz:>9}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    root = sys.argv[1] if len(sys.argv) > 1 else OUTPUT_DIR
+    print(format_report(publish_gzip_variants(root)))
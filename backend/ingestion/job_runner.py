@@ -0,0 +1,89 @@
+"""
+Runs ingestion jobs concurrently, bounded per upstream host.
+
+Each Job names the host it talks to; at most PER_HOST jobs (HOST_LIMITS
+overrides) hit one host at a time and at most MAX_WORKERS run overall, so a
+slow host only delays its own products. A job with `after` starts once the
+jobs it names have finished (successfully or not), which keeps the order
+where one output feeds another.
+
+run_jobs() returns {name: {"seconds": wall time, "error": message or None}}
+in completion order; format_report() renders it for the cycle log.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get("INGEST_WORKERS", "8"))
+PER_HOST = int(os.environ.get("INGEST_PER_HOST", "2"))
+# Hosts that want gentler treatment than PER_HOST
+HOST_LIMITS = {"api.open-meteo.com": 1}
+
+
+class Job:
+    __slots__ = ("name", "run", "host", "after")
+
+    def __init__(self, name, run, host=None, after=()):
+        self.name = name
+        self.run = run
+        self.host = host
+        self.after = tuple(after)
+
+
+def _timed(job):
+    started = time.perf_counter()
+    error = None
+    try:
+        job.run()
+    except Exception as e:
+        logger.error(f"Job {job.name} failed: {e}", exc_info=True)
+        error = str(e) or type(e).__name__
+    return {"seconds": round(time.perf_counter() - started, 3), "error": error}
+
+
+def run_jobs(jobs, max_workers=MAX_WORKERS, per_host=PER_HOST, host_limits=None):
+    host_limits = HOST_LIMITS if host_limits is None else host_limits
+    names = {job.name for job in jobs}
+    for job in jobs:
+        unknown = [dep for dep in job.after if dep not in names]
+        if unknown:
+            raise ValueError(f"Job {job.name} waits for unknown jobs: {', '.join(unknown)}")
+    pending = list(jobs)
+    running = {}  # future -> job
+    busy = {}     # host -> running jobs
+    done = set()
+    report = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest") as pool:
+        while pending or running:
+            for job in list(pending):
+                if len(running) >= max_workers:
+                    break
+                if any(dep not in done for dep in job.after):
+                    continue
+                if job.host is not None and busy.get(job.host, 0) >= host_limits.get(job.host, per_host):
+                    continue
+                pending.remove(job)
+                busy[job.host] = busy.get(job.host, 0) + 1
+                running[pool.submit(_timed, job)] = job
+            if not running:
+                raise ValueError(f"Circular job dependencies: {', '.join(j.name for j in pending)}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                busy[job.host] -= 1
+                done.add(job.name)
+                report[job.name] = future.result()
+    return report
+
+
+def format_report(report, wall_s=None):
+    lines = [f"{'source':20} {'seconds':>9}  error"]
+    for name, entry in report.items():
+        lines.append(f"{name:20} {entry['seconds']:>9.3f}  {entry['error'] or ''}")
+    if wall_s is not None:
+        busy = sum(entry["seconds"] for entry in report.values())
+        lines.append(f"{'cycle':20} {wall_s:>9.3f}  (sum of sources {busy:.3f}s)")
+    return "\n".join(lines)
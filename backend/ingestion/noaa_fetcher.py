@@ -1,15 +1,16 @@
-import requests
 import os
 import json
 import logging
 import time
 import datetime
 import re
+import urllib.parse
 import xml.etree.ElementTree as ET
+import numpy as np
 try:
-    from ingestion import onta_service, dxped_service, drap_service, weather_grid_service, cty_service
+    from ingestion import onta_service, dxped_service, drap_service, weather_grid_service, cty_service, gzip_publisher, snapshot_store, job_runner, upstream, resample
 except ImportError:
-    import onta_service, dxped_service, drap_service, weather_grid_service, cty_service
+    import onta_service, dxped_service, drap_service, weather_grid_service, cty_service, gzip_publisher, snapshot_store, job_runner, upstream, resample
 
 # NOAA SWPC endpoints
 SOLAR_INDICES_URL = "https://services.swpc.noaa.gov/text/daily-solar-indices.txt"
@@ -36,11 +37,14 @@ def fetch_and_parse_solar_indices():
     """Fetch and format SSN and Solar Flux data"""
     print(f"Fetching solar indices from {SOLAR_INDICES_URL}...")
     try:
-        resp = requests.get(SOLAR_INDICES_URL, timeout=10)
+        resp = upstream.get(SOLAR_INDICES_URL, timeout=10)
         resp.raise_for_status()
     except Exception as e:
         print(f"Error fetching solar indices: {e}")
         return
+    if not resp.changed and snapshot_store.confirm("ssn/ssn-31.txt", "solar-flux/solarflux-99.txt"):
+        print("Solar indices unchanged")
+        return
 
     lines = resp.text.splitlines()
     data_lines = [l for l in lines if not l.startswith(':') and not l.startswith('#')]
@@ -67,28 +71,20 @@ def fetch_and_parse_solar_indices():
     # Save SSN (last 31 days)
     # Ensure we have at least 31 records and take the most recent ones.
     # HamClock usually shows the current month clearly.
-    ssn_file = os.path.join(OUTPUT_DIR, "ssn", "ssn-31.txt")
-    with open(ssn_file, "w") as f:
-        # Pad if we have less than 31
-        final_ssn = ssn_records
-        while len(final_ssn) < 31:
-            final_ssn.insert(0, final_ssn[0] if final_ssn else "0")
-        
-        for record in final_ssn[-31:]:
-            f.write(f"{record}\n")
+    # Pad if we have less than 31
+    final_ssn = ssn_records
+    while len(final_ssn) < 31:
+        final_ssn.insert(0, final_ssn[0] if final_ssn else "0")
+    ssn_file = snapshot_store.publish("ssn/ssn-31.txt", "".join(f"{record}\n" for record in final_ssn[-31:]))
     print(f"Saved {len(final_ssn[-31:])} SSN records to {ssn_file}")
 
     # Save Solar Flux (last 99 values - matching SFLUX_NV)
     # Original expects 3 samples per day for 33 days.
-    flux_file = os.path.join(OUTPUT_DIR, "solar-flux", "solarflux-99.txt")
-    with open(flux_file, "w") as f:
-        # If we have less than 99, pad by repeating oldest
-        final_flux = flux_records
-        while len(final_flux) < 99:
-            final_flux.insert(0, final_flux[0] if final_flux else "0")
-        
-        for record in final_flux[-99:]:
-            f.write(f"{record}\n")
+    # If we have less than 99, pad by repeating oldest
+    final_flux = flux_records
+    while len(final_flux) < 99:
+        final_flux.insert(0, final_flux[0] if final_flux else "0")
+    flux_file = snapshot_store.publish("solar-flux/solarflux-99.txt", "".join(f"{record}\n" for record in final_flux[-99:]))
     print(f"Saved {len(final_flux[-99:])} flux records to {flux_file}")
 
 def fetch_and_parse_kp():
@@ -96,11 +92,29 @@ def fetch_and_parse_kp():
     Needs 7 days historical (56 values) + 2 days predicted (16 values) = 72 values.
     """
     print(f"Fetching historical KP from {GEO_INDICES_URL}...")
+    try:
+        history_resp = upstream.get(GEO_INDICES_URL, timeout=10)
+        history_resp.raise_for_status()
+    except Exception as e:
+        print(f"Error fetching historical KP: {e}")
+        history_resp = None
+    print(f"Fetching predicted KP from {FORECAST_URL}...")
+    try:
+        forecast_resp = upstream.get(FORECAST_URL, timeout=10)
+        forecast_resp.raise_for_status()
+    except Exception as e:
+        print(f"Error fetching predicted KP: {e}")
+        forecast_resp = None
+    if (history_resp and forecast_resp and not history_resp.changed and not forecast_resp.changed
+            and snapshot_store.confirm("geomag/kindex.txt")):
+        print("KP sources unchanged")
+        return
+
     kp_history = []
     try:
-        resp = requests.get(GEO_INDICES_URL, timeout=10)
-        resp.raise_for_status()
-        lines = resp.text.splitlines()
+        if history_resp is None:
+            raise ValueError("no historical KP data")
+        lines = history_resp.text.splitlines()
         for line in lines:
             if not line.startswith((':', '#')) and len(line) > 60:
                 # Planetary K-indices are in the last columns
@@ -109,14 +123,13 @@ def fetch_and_parse_kp():
                 if match:
                     kp_history.extend([float(v) for v in match.groups()])
     except Exception as e:
-        print(f"Error fetching historical KP: {e}")
+        print(f"Error parsing historical KP: {e}")
 
-    print(f"Fetching predicted KP from {FORECAST_URL}...")
     kp_predicted = []
     try:
-        resp = requests.get(FORECAST_URL, timeout=10)
-        resp.raise_for_status()
-        lines = resp.text.splitlines()
+        if forecast_resp is None:
+            raise ValueError("no predicted KP data")
+        lines = forecast_resp.text.splitlines()
         in_kp_section = False
         for line in lines:
             if "NOAA Kp index breakdown" in line:
@@ -137,7 +150,7 @@ def fetch_and_parse_kp():
         day2 = [p[1] for p in kp_predicted]
         kp_predicted = day1[:8] + day2[:8] # Ensure exactly 8 per day
     except Exception as e:
-        print(f"Error fetching predicted KP: {e}")
+        print(f"Error parsing predicted KP: {e}")
 
     # Combine: last 56 historical (7 days) + 16 predicted (2 days)
     total_kp = kp_history[-56:] + kp_predicted[:16]
@@ -150,173 +163,113 @@ def fetch_and_parse_kp():
         while len(total_kp) < 72:
             total_kp.append(total_kp[-1] if total_kp else 0.0)
 
-    kp_file = os.path.join(OUTPUT_DIR, "geomag", "kindex.txt")
-    with open(kp_file, "w") as f:
-        for val in total_kp:
-            f.write(f"{val:.2f}\n")
+    kp_file = snapshot_store.publish("geomag/kindex.txt", "".join(f"{val:.2f}\n" for val in total_kp))
     print(f"Saved {len(total_kp)} KP records to {kp_file}")
 
+XRAY_BANDS = ('0.05-0.4nm', '0.1-0.8nm')
+
+def render_xray(data, now=None):
+    """xrays-3-day.json -> xray.txt: 150 slots (XRAY_NV) 10 minutes apart, nearest sample within 10 minutes"""
+    # We target the nearest 10-minute slot ending in 5 to match HamClock convention
+    now_ts = int(time.time() if now is None else now)
+    latest_sample_uts = (now_ts // 600) * 600 + 300
+    if latest_sample_uts > now_ts:
+        latest_sample_uts -= 600
+    targets = resample.slots(latest_sample_uts, 150, 600)
+
+    times = resample.parse_times([entry.get('time_tag') for entry in data])
+    energies = np.array([entry.get('energy') or '' for entry in data])
+    flux = resample.to_float([entry.get('flux') for entry in data])
+    bands = []
+    for energy in XRAY_BANDS:
+        band = energies == energy
+        _, cols = resample.Series.from_columns(times[band], {'flux': flux[band]}).at(targets, 600)
+        bands.append(np.nan_to_num(cols['flux'], nan=0.0).tolist())
+
+    # Format: 2026  2  1  1105   00000  00000     1.99e-06    1.72e-05
+    rows = []
+    for uts, short, long in zip(targets.tolist(), *bands):
+        t = time.gmtime(uts)
+        rows.append(f"{t.tm_year:4} {t.tm_mon:>2} {t.tm_mday:>2}  {t.tm_hour:02}{t.tm_min:02}"
+                    f"   00000  00000     {short:8.2e}    {long:8.2e}\n")
+    return "".join(rows)
+
 def fetch_xray():
     """Fetch X-Ray data and format it to match HamClock's expectation (10-min intervals)"""
     print(f"Fetching X-Ray from {XRAY_URL}...")
     try:
-        resp = requests.get(XRAY_URL, timeout=10)
+        # Resampled onto slots ending now, so parsed even when unchanged
+        resp = upstream.get(XRAY_URL, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-        
-        # Group by energy and then by timestamp
-        # { 'energy' : { uts: flux } }
-        flux_data = {'0.05-0.4nm': {}, '0.1-0.8nm': {}}
-        
-        for entry in data:
-            time_tag = entry['time_tag'].replace('Z', '')
-            dt = datetime.datetime.strptime(time_tag, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
-            uts = int(dt.timestamp())
-            energy = entry.get('energy')
-            if energy in flux_data:
-                flux_data[energy][uts] = entry['flux']
-        
-        # Generate 150 target points (XRAY_NV), 10 minutes apart, ending "now"
-        # We target the nearest 10-minute slot ending in 5 to match HamClock convention
-        now_ts = int(time.time())
-        latest_sample_uts = (now_ts // 600) * 600 + 300
-        if latest_sample_uts > now_ts:
-            latest_sample_uts -= 600
-            
-        records = []
-        for i in range(150):
-            target_uts = latest_sample_uts - (149 - i) * 600
-            
-            # Find closest available flux for both energy levels
-            vals = []
-            for energy in ['0.05-0.4nm', '0.1-0.8nm']:
-                best_uts = None
-                min_diff = 601 # Max diff 10 mins
-                for av_uts in flux_data[energy].keys():
-                    diff = abs(av_uts - target_uts)
-                    if diff < min_diff:
-                        min_diff = diff
-                        best_uts = av_uts
-                
-                if best_uts is not None:
-                    vals.append(flux_data[energy][best_uts])
-                else:
-                    vals.append(0.0)
-            
-            # Format: 2026  2  1  1105   00000  00000     1.99e-06    1.72e-05
-            dt = datetime.datetime.fromtimestamp(target_uts, tz=datetime.timezone.utc)
-            y, m, d = dt.year, dt.month, dt.day
-            hm = dt.strftime("%H%M")
-            formatted = f"{y:4} {m:>2} {d:>2}  {hm:04}   00000  00000     {vals[0]:8.2e}    {vals[1]:8.2e}"
-            records.append(formatted)
-        
-        xray_file = os.path.join(OUTPUT_DIR, "xray", "xray.txt")
-        with open(xray_file, "w") as f:
-            for record in records:
-                f.write(f"{record}\n")
-        print(f"Saved {len(records)} X-Ray records to {xray_file}")
+        text = render_xray(resp.json())
+        xray_file = snapshot_store.publish("xray/xray.txt", text)
+        records = text.count("\n")
+        print(f"Saved {records} X-Ray records to {xray_file}")
     except Exception as e:
         print(f"Error fetching X-Ray: {e}")
         import traceback
         traceback.print_exc()
 
+def _trim(value, spec):
+    # Density/speed rounding: strip trailing zeros and the point
+    return format(value, spec).rstrip('0').rstrip('.')
+
+def render_solar_wind(plasma_json, mag_json, now=None):
+    """
+    plasma-1-day.json + mag-1-day.json -> (swind-24hr.txt, Bz.txt).
+    Each slot takes the nearest time of either feed (1440 x 1 min within 30 s
+    for solar wind, 150 x 10 min within 300 s for Bz) and that time's record,
+    padding when the record is missing or has nulls.
+    """
+    plasma_rows, mag_rows = plasma_json[1:], mag_json[1:]
+    plasma = resample.Series.from_columns(
+        resample.parse_times([r[0] for r in plasma_rows]),
+        {'density': resample.to_float([r[1] for r in plasma_rows]),
+         'speed': resample.to_float([r[2] for r in plasma_rows])})
+    mag = resample.Series.from_columns(
+        resample.parse_times([r[0] for r in mag_rows]),
+        {name: resample.to_float([r[i] for r in mag_rows]) for name, i in (('bx', 1), ('by', 2), ('bz', 3), ('bt', 6))})
+    all_times = np.union1d(plasma.times, mag.times)
+
+    # Last point timestamped at a 60-second boundary
+    now_ts = (int(time.time() if now is None else now) // 60) * 60
+
+    # 1. Solar Wind (1440 points for 24h, 1-min interval)
+    targets = resample.slots(now_ts, 1440, 60)
+    _, cols = plasma.at(resample.snap(all_times, targets, 30), 0)
+    swind = "".join(
+        f"{ts} {_trim(d, '.2f')} {_trim(v, '.1f')}\n" if d == d and v == v else f"{ts} 0.00 0.0\n"  # NaN != NaN: padding
+        for ts, d, v in zip(targets.tolist(), cols['density'].tolist(), cols['speed'].tolist()))
+
+    # 2. Bz (150 points, 10-min interval)
+    targets = resample.slots(now_ts, 150, 600)
+    _, cols = mag.at(resample.snap(all_times, targets, 300), 0)
+    complete = ~(np.isnan(cols['bx']) | np.isnan(cols['by']) | np.isnan(cols['bz']) | np.isnan(cols['bt']))
+    # Spacing: UNIX(10) + 3 + Bx(4) + 3 + By(4) + 3 + Bz(4) + 4 + Bt(4), precision .1f
+    bz = "# UNIX        Bx     By     Bz     Bt\n" + "".join(
+        f"{ts}   {bx:>4.1f}   {by:>4.1f}   {bz_:>4.1f}    {bt:>4.1f}\n" if ok else f"{ts}    0.0   0.0   0.0    0.0\n"
+        for ts, ok, bx, by, bz_, bt in zip(targets.tolist(), complete.tolist(), cols['bx'].tolist(),
+                                          cols['by'].tolist(), cols['bz'].tolist(), cols['bt'].tolist()))
+    return swind, bz
+
 def fetch_solar_wind_and_bz():
     """Fetch Solar Wind (Plasma) and Bz/Bt (Mag) data"""
     print(f"Fetching Solar Wind and Mag data...")
     try:
-        plasma_resp = requests.get(SW_PLASMA_URL, timeout=10)
-        mag_resp = requests.get(SW_MAG_URL, timeout=10)
+        # Resampled onto slots ending now, so parsed even when unchanged
+        plasma_resp = upstream.get(SW_PLASMA_URL, timeout=10)
+        mag_resp = upstream.get(SW_MAG_URL, timeout=10)
         plasma_resp.raise_for_status()
         mag_resp.raise_for_status()
+        swind, bz = render_solar_wind(plasma_resp.json(), mag_resp.json())
+
+        # Publish both products together
+        with snapshot_store.batch():
+            snapshot_store.publish("solar-wind/swind-24hr.txt", swind)
+            snapshot_store.publish("Bz/Bz.txt", bz)
         
-        plasma_json = plasma_resp.json()
-        mag_json = mag_resp.json()
-        
-        plasma_data = {e[0]: e for e in plasma_json[1:]} # time_tag: record
-        mag_data = {e[0]: e for e in mag_json[1:]}
-        
-        # Pre-calculate UTS for all available times
-        all_times = sorted(set(plasma_data.keys()) | set(mag_data.keys()))
-        uts_map = {}
-        for t_str in all_times:
-            try:
-                # 2026-02-02 23:25:00.000
-                dt = datetime.datetime.strptime(t_str.replace('Z', ''), "%Y-%m-%d %H:%M:%S.%f")
-                uts_map[t_str] = int(dt.replace(tzinfo=datetime.timezone.utc).timestamp())
-            except: pass
-        
-        # Last point timestamped at a 60-second boundary
-        now_ts = (int(time.time()) // 60) * 60
-        sorted_times = sorted(uts_map.items(), key=lambda x: x[1])
-
-        # 1. Solar Wind (1440 points for 24h, 1-min interval)
-        swind_final = []
-        for i in range(1440):
-            target_ts = now_ts - (1439 - i) * 60
-            closest_t = None
-            min_diff = 31 
-            # Linear search is fine for 1300 items
-            for t_str, t_uts in sorted_times:
-                diff = abs(t_uts - target_ts)
-                if diff < min_diff:
-                    min_diff = diff
-                    closest_t = t_str
-            
-            if closest_t:
-                p = plasma_data.get(closest_t)
-                if p and p[1] is not None and p[2] is not None:
-                    # Density rounding: strip trailing .0
-                    d_val = float(p[1])
-                    d_str = f"{d_val:.2f}".rstrip('0').rstrip('.')
-                    # Speed rounding: strip trailing .0
-                    s_val = float(p[2])
-                    s_str = f"{s_val:.1f}".rstrip('0').rstrip('.')
-                    swind_final.append(f"{target_ts} {d_str} {s_str}")
-                else:
-                    swind_final.append(f"{target_ts} 0.00 0.0") # Padding
-            else:
-                swind_final.append(f"{target_ts} 0.00 0.0")
-
-        # 2. Bz (150 points, 10-min interval)
-        bz_final = []
-        for i in range(150):
-            target_ts = now_ts - (149 - i) * 600
-            closest_t = None
-            min_diff = 301
-            for t_str, t_uts in sorted_times:
-                diff = abs(t_uts - target_ts)
-                if diff < min_diff:
-                    min_diff = diff
-                    closest_t = t_str
-            
-            if closest_t:
-                m = mag_data.get(closest_t)
-                if m and m[1] is not None and m[2] is not None and m[3] is not None and m[6] is not None:
-                    # Spacing: UNIX(10) + 3 + Bx(4) + 3 + By(4) + 3 + Bz(4) + 4 + Bt(4)
-                    # Precision: .1f
-                    bz_final.append(f"{target_ts}   {float(m[1]):>4.1f}   {float(m[2]):>4.1f}   {float(m[3]):>4.1f}    {float(m[6]):>4.1f}")
-                else:
-                    bz_final.append(f"{target_ts}    0.0   0.0   0.0    0.0")
-            else:
-                bz_final.append(f"{target_ts}    0.0   0.0   0.0    0.0")
-
-        # Write files
-        sw_dir = os.path.join(OUTPUT_DIR, "solar-wind")
-        if not os.path.exists(sw_dir): os.makedirs(sw_dir)
-        swind_file = os.path.join(sw_dir, "swind-24hr.txt")
-        with open(swind_file, "w") as f:
-            for r in swind_final:
-                f.write(f"{r}\n")
-        
-        bz_dir = os.path.join(OUTPUT_DIR, "Bz")
-        if not os.path.exists(bz_dir): os.makedirs(bz_dir)
-        bz_file = os.path.join(bz_dir, "Bz.txt")
-        with open(bz_file, "w") as f:
-            f.write("# UNIX        Bx     By     Bz     Bt\n")
-            for r in bz_final:
-                f.write(f"{r}\n")
-        
-        print(f"Saved {len(swind_final)} SWind and {len(bz_final)} Bz records.")
+        swind_records, bz_records = swind.count("\n"), bz.count("\n") - 1
+        print(f"Saved {swind_records} SWind and {bz_records} Bz records.")
     except Exception as e:
         print(f"Error fetching Solar Wind/Mag: {e}")
         import traceback
@@ -326,8 +279,11 @@ def fetch_noaa_scales():
     """Fetch current R, S, G scales and forecasts for 4-day coverage"""
     print(f"Fetching NOAA scales from {NOAA_SCALES_URL}...")
     try:
-        resp = requests.get(NOAA_SCALES_URL, timeout=10)
+        resp = upstream.get(NOAA_SCALES_URL, timeout=10)
         resp.raise_for_status()
+        if not resp.changed and snapshot_store.confirm("NOAASpaceWX/noaaswx.txt", "NOAASpaceWX/rank2_coeffs.txt"):
+            print("NOAA scales unchanged")
+            return
         data = resp.json()
         
         # We need current + 3 days forecast = 4 values per row
@@ -345,17 +301,14 @@ def fetch_noaa_scales():
             s_vals.append(get_val(day_data, "S"))
             g_vals.append(get_val(day_data, "G"))
             
-        scales_file = os.path.join(OUTPUT_DIR, "NOAASpaceWX", "noaaswx.txt")
-        with open(scales_file, "w") as f:
-            # Format: Letter  Val0 Val1 Val2 Val3
-            f.write(f"R  {' '.join(map(str, r_vals))}\n")
-            f.write(f"S  {' '.join(map(str, s_vals))}\n")
-            f.write(f"G  {' '.join(map(str, g_vals))}\n")
-            
+        # Format: Letter  Val0 Val1 Val2 Val3
+        scales_file = snapshot_store.publish("NOAASpaceWX/noaaswx.txt",
+                                             f"R  {' '.join(map(str, r_vals))}\n"
+                                             f"S  {' '.join(map(str, s_vals))}\n"
+                                             f"G  {' '.join(map(str, g_vals))}\n")
         print(f"Saved NOAA scales (4 days) to {scales_file}")
         
         # Populate authentic rank2_coeffs.txt
-        rank_file = os.path.join(OUTPUT_DIR, "NOAASpaceWX", "rank2_coeffs.txt")
         coeffs = [
             "0       0        0.05    -6              // Sunspot_N      60 => -3       200 => 4",
             "1       0        1e6     -2              // X-Ray          (C)1e-6 => -2  (M)1e-5 => 8",
@@ -368,13 +321,12 @@ def fetch_noaa_scales():
             "8       0        0.16    -6              // AURORA         50 => 2         100 => 10",
             "9   -0.04       -0.2      3              // DST           -10 => 1  0 => 3  5 => 1"
         ]
-        with open(rank_file, "w") as f:
-            f.write("# y = ax^2 + bx + c, where x = raw space weather value, y = small integer for ranking roughly -10..5\n")
-            f.write("# N.B. column 1 is SPCWX_t index and must be in this order.\n")
-            f.write("# hint: https://www.analyzemath.com/parabola/three_points_para_calc.html\n")
-            f.write("#       a        b       c\n")
-            for c in coeffs:
-                f.write(f"{c}\n")
+        rank_file = snapshot_store.publish("NOAASpaceWX/rank2_coeffs.txt",
+            "# y = ax^2 + bx + c, where x = raw space weather value, y = small integer for ranking roughly -10..5\n"
+            "# N.B. column 1 is SPCWX_t index and must be in this order.\n"
+            "# hint: https://www.analyzemath.com/parabola/three_points_para_calc.html\n"
+            "#       a        b       c\n"
+            + "".join(f"{c}\n" for c in coeffs))
         print(f"Saved authentic coefficients to {rank_file}")
     except Exception as e:
         print(f"Error fetching NOAA scales: {e}")
@@ -383,8 +335,12 @@ def fetch_aurora():
     """Fetch Aurora probability and maintain history"""
     print(f"Fetching Aurora from {AURORA_URL}...")
     try:
-        resp = requests.get(AURORA_URL, timeout=10)
+        resp = upstream.get(AURORA_URL, timeout=10)
         resp.raise_for_status()
+        # Same forecast time again: the history would not change
+        if not resp.changed and snapshot_store.confirm("aurora/aurora.txt"):
+            print("Aurora forecast unchanged")
+            return
         data = resp.json()
         
         ts = data.get('Forecast Time', datetime.datetime.now(datetime.timezone.utc).isoformat())
@@ -394,10 +350,7 @@ def fetch_aurora():
             probs = [c[2] for c in coords]
             max_prob = max(probs) if probs else 0
             
-        aurora_dir = os.path.join(OUTPUT_DIR, "aurora")
-        if not os.path.exists(aurora_dir):
-            os.makedirs(aurora_dir)
-        aurora_file = os.path.join(aurora_dir, "aurora.txt")
+        aurora_file = os.path.join(OUTPUT_DIR, "aurora", "aurora.txt")
         
         # Load existing
         history = {}
@@ -431,9 +384,7 @@ def fetch_aurora():
         # Keep last 48 points
         recent_uts = sorted_uts[-48:]
         
-        with open(aurora_file, "w") as f:
-            for u in recent_uts:
-                f.write(f"{u} {history[u]}\n")
+        snapshot_store.publish("aurora/aurora.txt", "".join(f"{u} {history[u]}\n" for u in recent_uts))
         print(f"Updated Aurora history with {len(recent_uts)} points")
     except Exception as e:
         print(f"Error fetching Aurora: {e}")
@@ -443,11 +394,7 @@ def fetch_onta():
     print("Fetching live ONTA spots...")
     try:
         data = onta_service.get_onta_data()
-        onta_dir = os.path.join(OUTPUT_DIR, "ONTA")
-        if not os.path.exists(onta_dir):
-            os.makedirs(onta_dir)
-        with open(os.path.join(onta_dir, "onta.txt"), "w") as f:
-            f.write(data)
+        snapshot_store.publish("ONTA/onta.txt", data)
         print("Updated ONTA/onta.txt with live spots")
     except Exception as e:
         print(f"Error updating ONTA: {e}")
@@ -457,15 +404,11 @@ def fetch_dxpeds():
     print("Fetching live DXPeditions...")
     try:
         data = dxped_service.get_dxped_data()
-        dxped_dir = os.path.join(OUTPUT_DIR, "dxpeds")
-        if not os.path.exists(dxped_dir):
-            os.makedirs(dxped_dir)
         # Note: HamClock looks for both dxpeds/dxpeditions.txt and processed_data/dxpeditions.txt 
         # based on server.py routing.
-        with open(os.path.join(OUTPUT_DIR, "dxpeditions.txt"), "w") as f:
-            f.write(data)
-        with open(os.path.join(dxped_dir, "dxpeditions.txt"), "w") as f:
-            f.write(data)
+        with snapshot_store.batch():
+            snapshot_store.publish("dxpeditions.txt", data)
+            snapshot_store.publish("dxpeds/dxpeditions.txt", data)
         print("Updated dxpeditions.txt with live data")
     except Exception as e:
         print(f"Error updating DXPeditions: {e}")
@@ -480,14 +423,17 @@ def fetch_dst():
     print(f"Fetching Dst index from {url}...")
     
     try:
-        resp = requests.get(url, timeout=15)
+        resp = upstream.get(url, timeout=15)
         if resp.status_code != 200:
             # Try specific month folder as fallback
             url = f"{KYOTO_DST_BASE_URL}/{yyyymm}/dst{yymm}.for.request"
             print(f"Retrying Dst from {url}...")
-            resp = requests.get(url, timeout=15)
+            resp = upstream.get(url, timeout=15)
         
         resp.raise_for_status()
+        if not resp.changed and snapshot_store.confirm("dst/dst.txt"):
+            print("Dst index unchanged")
+            return
         lines = resp.text.splitlines()
         
         # Kyoto format: 120-byte records
@@ -518,15 +464,10 @@ def fetch_dst():
         # Sort by time and take last 24 records (HamClock typically expects ~24-48 hours)
         dst_values.sort(key=lambda x: x[0])
         
-        dst_dir = os.path.join(OUTPUT_DIR, "dst")
-        if not os.path.exists(dst_dir): os.makedirs(dst_dir)
-        dst_file = os.path.join(dst_dir, "dst.txt")
+        # Format: 2026-02-01T03:00:00 0
+        dst_file = snapshot_store.publish("dst/dst.txt", "".join(
+            f"{ts.strftime('%Y-%m-%dT%H:%M:%S')} {val}\n" for ts, val in dst_values[-24:]))
         
-        with open(dst_file, "w") as f:
-            for ts, val in dst_values[-24:]:
-                # Format: 2026-02-01T03:00:00 0
-                f.write(f"{ts.strftime('%Y-%m-%dT%H:%M:%S')} {val}\n")
-                
         print(f"Saved {len(dst_values[-24:])} Dst records to {dst_file}")
         
     except Exception as e:
@@ -536,11 +477,12 @@ def fetch_dst():
         if not os.path.exists(dst_file):
             # Create minimal dummy data to prevent client crash
             now = datetime.datetime.now(datetime.timezone.utc)
-            with open(dst_file, "w") as f:
-                for h in range(24):
-                    ts = now - datetime.timedelta(hours=23-h)
-                    ts = ts.replace(minute=0, second=0, microsecond=0)
-                    f.write(f"{ts.strftime('%Y-%m-%dT%H:%M:%S')} 0\n")
+            lines = []
+            for h in range(24):
+                ts = now - datetime.timedelta(hours=23-h)
+                ts = ts.replace(minute=0, second=0, microsecond=0)
+                lines.append(f"{ts.strftime('%Y-%m-%dT%H:%M:%S')} 0\n")
+            snapshot_store.publish("dst/dst.txt", "".join(lines))
             print("Created dummy Dst data as fallback")
 
 def fetch_contests():
@@ -550,7 +492,8 @@ def fetch_contests():
         # Use headers to avoid 403/Forbidden
         headers = {'User-Agent': 'HamClock/1.0'}
         print("Sending request to WA7BNM...")
-        resp = requests.get(CONTEST_RSS_URL, headers=headers, timeout=20)
+        # Filtered against the current time, so parsed even when unchanged
+        resp = upstream.get(CONTEST_RSS_URL, headers=headers, timeout=20)
         print(f"Response status: {resp.status_code}")
         resp.raise_for_status()
         
@@ -631,15 +574,8 @@ def fetch_contests():
 
         contests.sort(key=lambda x: x[0])
         
-        contests_dir = os.path.join(OUTPUT_DIR, "contests")
-        if not os.path.exists(contests_dir): os.makedirs(contests_dir)
-        contests_file = os.path.join(contests_dir, "contests311.txt")
-        
-        with open(contests_file, "w") as f:
-            f.write("WA7BNM Weekend Contests\n")
-            for start, end, title, link in contests:
-                f.write(f"{start} {end} {title}\n")
-                f.write(f"{link}\n")
+        contests_file = snapshot_store.publish("contests/contests311.txt", "WA7BNM Weekend Contests\n" + "".join(
+            f"{start} {end} {title}\n{link}\n" for start, end, title, link in contests))
         
         print(f"Saved {len(contests)} contests to {contests_file}")
         
@@ -669,76 +605,43 @@ def fetch_contests():
             except: pass
         
         if not os.path.exists(contests_file):
-            with open(contests_file, "w") as f:
-                f.write("WA7BNM Weekend Contests\n")
+            snapshot_store.publish("contests/contests311.txt", "WA7BNM Weekend Contests\n")
             print("Created empty placeholder contests311.txt")
 
 def fetch_static_file(url, filename):
     """Fetch a static file and save it to the output directory"""
     print(f"Fetching static file from {url}...")
     try:
-        resp = requests.get(url, timeout=10)
+        resp = upstream.get(url, timeout=10)
         resp.raise_for_status()
-        filepath = os.path.join(OUTPUT_DIR, filename)
-        # Ensure directory exists for the static file
-        file_dir = os.path.dirname(filepath)
-        if not os.path.exists(file_dir):
-            os.makedirs(file_dir)
-        with open(filepath, "wb") as f:
-            f.write(resp.content)
+        snapshot_store.publish(filename, resp.content)
         print(f"Saved {filename}")
     except Exception as e:
         print(f"Error fetching {filename}: {e}")
 
-def fetch_all():
-    """Run all fetchers and update local data files"""
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-        
-    # Ensure all required subdirectories exist
-    subdirs = ["ssn", "solar-flux", "geomag", "xray", "solar-wind", "Bz", 
-               "aurora", "NOAASpaceWX", "drap", "cty", "ONTA", "dxpeds", "contests", "dst", "worldwx"]
-    for sd in subdirs:
-        path = os.path.join(OUTPUT_DIR, sd)
-        if not os.path.exists(path):
-            os.makedirs(path)
-
-    fetch_and_parse_solar_indices()
-    fetch_and_parse_kp()
-    fetch_xray()
-    fetch_solar_wind_and_bz()
-    fetch_noaa_scales()
-    fetch_aurora()
-    fetch_onta()
-    fetch_dxpeds()
-    fetch_dst()
-    fetch_contests()
-    
-    # Update DRAP (New dynamic service)
+def fetch_drap():
+    """Update DRAP (New dynamic service)"""
     print("Fetching DRAP absorption data...")
     try:
         drap_service.fetch_and_process_drap()
     except Exception as e:
         print(f"Error updating DRAP: {e}")
-    
-    # Fetch additional static resources into specific paths
-    # fetch_static_file(DRAP_URL, "drap/stats.txt") # Handled by drap_service.py now
-    
-    # Generate world weather grid locally
+
+def fetch_weather_grid():
+    """Generate world weather grid locally"""
     print("Generating local world weather grid...")
     try:
         grid_data = weather_grid_service.generate_weather_grid()
         if grid_data:
-            grid_file = os.path.join(OUTPUT_DIR, "worldwx", "wx.txt")
-            with open(grid_file, "w") as f:
-                f.write(grid_data)
+            snapshot_store.publish("worldwx/wx.txt", grid_data)
             print("Successfully updated worldwx/wx.txt")
         else:
             print("Weather grid generation yielded no data, keeping existing file")
     except Exception as e:
         print(f"Error generating weather grid: {e}")
 
-    # Derive DXCC file locally
+def fetch_cty():
+    """Derive DXCC file locally"""
     print("Deriving local DXCC data...")
     try:
         cty_service.fetch_and_process_cty()
@@ -747,7 +650,68 @@ def fetch_all():
         # Fallback to static if derivation fails completely (though cty_service has its own fallbacks)
         fetch_static_file(DXCC_FALLBACK_URL, "cty/cty_wt_mod-ll-dxcc.txt")
 
+def publish_gzip():
+    """Precompress large text products for clients sending Accept-Encoding: gzip"""
+    print("Publishing gzip variants...")
+    try:
+        report = gzip_publisher.publish_gzip_variants(OUTPUT_DIR)
+        print(gzip_publisher.format_report(report))
+    except Exception as e:
+        print(f"Error publishing gzip variants: {e}")
+
+def prepare_output_dirs():
+    """Create processed_data and the per-product directories"""
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+        
+    # Ensure all required subdirectories exist
+    subdirs = ["ssn", "solar-flux", "geomag", "xray", "solar-wind", "Bz", 
+               "aurora", "NOAASpaceWX", "drap", "cty", "ONTA", "dxpeds", "contests", "dst", "worldwx"]
+    for sd in subdirs:
+        path = os.path.join(OUTPUT_DIR, sd)
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+def _host(url):
+    return urllib.parse.urlparse(url).hostname
+
+# (source, fetcher, upstream host) for fetch_all() and scheduler.py. They are
+# independent of each other; jobs that consume another's output go after it.
+FETCHERS = [
+    ("solar_indices", fetch_and_parse_solar_indices, _host(SOLAR_INDICES_URL)),
+    ("kp", fetch_and_parse_kp, _host(GEO_INDICES_URL)),
+    ("xray", fetch_xray, _host(XRAY_URL)),
+    ("solar_wind", fetch_solar_wind_and_bz, _host(SW_PLASMA_URL)),
+    ("noaa_scales", fetch_noaa_scales, _host(NOAA_SCALES_URL)),
+    ("aurora", fetch_aurora, _host(AURORA_URL)),
+    ("onta", fetch_onta, _host(onta_service.POTA_URL)),
+    ("dxpeds", fetch_dxpeds, _host(dxped_service.ADXO_URL)),
+    ("dst", fetch_dst, _host(KYOTO_DST_BASE_URL)),
+    ("contests", fetch_contests, _host(CONTEST_RSS_URL)),
+    ("drap", fetch_drap, _host(drap_service.DRAP_DATA_URL)),
+    ("weather_grid", fetch_weather_grid, "api.open-meteo.com"),
+    ("cty", fetch_cty, _host(cty_service.CTY_WT_MOD_URL)),
+]
+
+def fetch_all():
+    """Run all fetchers concurrently (bounded per host) and update local data files.
+    Returns {source: {"seconds", "error"}} for the cycle."""
+    prepare_output_dirs()
+    started = time.perf_counter()
+
+    jobs = [job_runner.Job(name, fn, host) for name, fn, host in FETCHERS]
+    # Precompress the text products once every fetcher has written them
+    jobs.append(job_runner.Job("gzip", publish_gzip, after=[name for name, _, _ in FETCHERS]))
+
+    # One snapshot generation per cycle: readers never see half a cycle
+    with snapshot_store.batch():
+        report = job_runner.run_jobs(jobs)
+
     print("\nFetch cycle complete.")
+    print(job_runner.format_report(report, time.perf_counter() - started))
+    print(upstream.format_report(upstream.take_report()))
+    print(snapshot_store.format_report(snapshot_store.STORE.take_report()))
+    return report
 
 if __name__ == "__main__":
     fetch_all()
@@ -1,9 +1,12 @@
-import requests
 import json
 import os
 import datetime
 import logging
 import time
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +22,7 @@ HEADERS = {
 def fetch_sota_spots():
     """Fetch recent SOTA spots"""
     try:
-        resp = requests.get(SOTA_URL, headers=HEADERS, timeout=10)
+        resp = upstream.fetch(SOTA_URL, headers=HEADERS, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         spots = []
@@ -53,7 +56,7 @@ def fetch_sota_spots():
 def fetch_pota_spots():
     """Fetch recent POTA spots"""
     try:
-        resp = requests.get(POTA_URL, headers=HEADERS, timeout=10)
+        resp = upstream.fetch(POTA_URL, headers=HEADERS, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         spots = []
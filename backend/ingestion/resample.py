@@ -0,0 +1,113 @@
+"""
+Nearest-sample resampling of upstream time series onto fixed slots.
+
+A feed becomes a Series: sorted, de-duplicated unix times (int64) and a
+float64 value column per field, NaN where the feed had no usable value.
+Series.at() aligns it to a slot grid with np.searchsorted, so each slot
+costs O(log samples) instead of a scan over every sample:
+
+    series = Series.from_columns(times, {"flux": fluxes})
+    found, cols = series.at(slots(end, 150, 600), tolerance=600)
+
+A slot takes the sample closest to it if that sample is at most `tolerance`
+seconds away; on a tie the earlier sample wins. found is False where no
+sample is close enough; a found sample can still hold NaN for a field.
+"""
+import numpy as np
+
+
+def slots(end, count, step):
+    """`count` slot times `step` seconds apart, the last one at `end`."""
+    return end - step * np.arange(count - 1, -1, -1, dtype=np.int64)
+
+
+def parse_times(strings):
+    """ISO-8601 UTC strings ("2026-02-02 23:25:00.000", "...T...Z") -> int64 unix seconds; -1 if unparsable."""
+    cleaned = [s.replace("Z", "") if isinstance(s, str) else "" for s in strings]
+    try:
+        parsed = np.array(cleaned, dtype="datetime64[s]")
+        out = parsed.astype(np.int64)
+        out[np.isnat(parsed)] = -1  # "" / None parse as NaT, which is INT64_MIN
+        return out
+    except ValueError:
+        out = np.full(len(cleaned), -1, dtype=np.int64)
+        for i, s in enumerate(cleaned):
+            try:
+                t = np.datetime64(s, "s")
+            except ValueError:
+                continue
+            if not np.isnat(t):
+                out[i] = t.astype(np.int64)
+        return out
+
+
+def to_float(values):
+    """Feed values (numbers, numeric strings or None) -> float64 array with NaN for missing."""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if v is not None:
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+    return out
+
+
+def nearest(times, targets, tolerance):
+    """Index into sorted `times` of the sample nearest each target, -1 if none within `tolerance`."""
+    targets = np.asarray(targets, dtype=np.int64)
+    if len(times) == 0:
+        return np.full(len(targets), -1, dtype=np.int64)
+    right = np.searchsorted(times, targets)
+    left = np.clip(right - 1, 0, len(times) - 1)
+    right = np.clip(right, 0, len(times) - 1)
+    d_left = np.abs(targets - times[left])
+    d_right = np.abs(times[right] - targets)
+    index = np.where(d_left <= d_right, left, right)
+    index[np.minimum(d_left, d_right) > tolerance] = -1
+    return index
+
+
+def snap(times, targets, tolerance):
+    """The time in sorted `times` nearest each target, -1 where none is within `tolerance`."""
+    index = nearest(times, targets, tolerance)
+    return np.where(index >= 0, times[index] if len(times) else -1, -1)
+
+
+class Series:
+    __slots__ = ("times", "columns")
+
+    def __init__(self, times, columns):
+        self.times = times
+        self.columns = columns
+
+    @classmethod
+    def from_columns(cls, times, columns):
+        """
+        Sort by time and keep the last sample of each repeated time (as a dict
+        keyed by time would). Times < 0 (unparsable) are dropped.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        columns = {name: np.asarray(col, dtype=np.float64) for name, col in columns.items()}
+        keep = times >= 0
+        times = times[keep]
+        columns = {name: col[keep] for name, col in columns.items()}
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        last = np.ones(len(times), dtype=bool)
+        last[:-1] = times[1:] != times[:-1]
+        return cls(times[last], {name: col[order][last] for name, col in columns.items()})
+
+    def __len__(self):
+        return len(self.times)
+
+    def at(self, targets, tolerance):
+        """(found mask, {field: values at targets}); values are NaN where not found."""
+        index = nearest(self.times, targets, tolerance)
+        found = index >= 0
+        safe = np.where(found, index, 0)
+        columns = {}
+        for name, col in self.columns.items():
+            values = col[safe] if len(col) else np.full(len(index), np.nan)
+            columns[name] = np.where(found, values, np.nan)
+        return found, columns
@@ -1,32 +1,295 @@
-import time
-import subprocess
+"""
+In-process ingestion scheduler.
+
+Replaces the loop that started a fresh interpreter for noaa_fetcher.py every
+600 s. Every source now runs on its own cadence inside one long-lived
+process, so the imported services, the upstream validators and bodies
+(upstream.py) and the parsed products in the snapshot store stay warm
+between runs.
+
+    interval        seconds between runs, +/- JITTER of itself
+    max_staleness   SLA (default 3 x interval): a source whose last success is
+                    older is reported stale and logged once per breach
+    backoff         a failed source is retried after BACKOFF_BASE seconds
+                    (at most its interval), doubling per consecutive failure
+                    up to BACKOFF_MAX
+
+Sources that are due together run concurrently through job_runner, at most
+a few per upstream host.
+
+A run fails when the job raises or neither publishes nor confirms (upstream
+unchanged) all of its products; the fetchers log and swallow their own
+errors. On start each source's age is taken from its files on disk, so a
+restart doesn't refetch daily products. Each round logs the bytes fetched
+and saved by conditional requests and the writes skipped; status() keeps
+the last round's numbers under "transfer".
+
+    run_now(name=None)   make a source (default: all) due immediately
+    SIGUSR1              run_now() for the standalone process
+    status()             per-source state; /admin/fetch on the server
+
+Intervals can be overridden with INGEST_INTERVALS=xray:60,cty:43200.
+
+    python3 backend/ingestion/scheduler.py          # as started by run_stack.sh
+    python3 backend/ingestion/scheduler.py --once   # every source once, then exit
+"""
 import os
 import sys
+import time
+import random
+import signal
+import logging
+import argparse
+import threading
+try:
+    from ingestion import noaa_fetcher, snapshot_store, job_runner, upstream
+except ImportError:
+    import noaa_fetcher, snapshot_store, job_runner, upstream
 
-# Path to the fetcher script
-FETCH_SCRIPT = os.path.join(os.path.dirname(__file__), "noaa_fetcher.py")
+logger = logging.getLogger(__name__)
+
+JITTER = 0.1
+BACKOFF_BASE = 60.0
+BACKOFF_MAX = 1800.0
+# Longest the loop sleeps, so SLA breaches are noticed without a due source
+IDLE_WAIT = 30.0
+
+
+def parse_intervals(spec):
+    """"xray:60,cty:43200" -> {source: seconds}"""
+    intervals = {}
+    for item in spec.split(","):
+        name, sep, seconds = item.strip().partition(":")
+        if sep and name:
+            intervals[name] = float(seconds)
+    return intervals
+
+
+INTERVALS = parse_intervals(os.environ.get("INGEST_INTERVALS", ""))
+
+
+class Source:
+    def __init__(self, name, run, interval, products=(), max_staleness=None, files=None, host=None):
+        self.name = name
+        self.run = run
+        self.interval = interval
+        self.host = host  # upstream host, for job_runner's per-host limit
+        self.products = tuple(products)  # snapshot_store products a run must publish
+        self.files = tuple(files) if files is not None else self.products  # their age is the source's age
+        self.max_staleness = max_staleness if max_staleness is not None else 3 * interval
+        self.next_run = 0.0          # time.monotonic() when due
+        self.last_success = None     # time.time() of the last successful run
+        self.last_attempt = None
+        self.last_error = None
+        self.last_duration_s = None
+        self.failures = 0            # consecutive
+        self.runs = 0
+        self.errors = 0
+        self.stale = False
+
+
+# source -> (interval s, products it publishes, files giving its age if not the products)
+SCHEDULE = {
+    "solar_wind": (120, ("solar-wind/swind-24hr.txt", "Bz/Bz.txt"), None),
+    "xray": (300, ("xray/xray.txt",), None),
+    "onta": (300, ("ONTA/onta.txt",), None),
+    "drap": (600, (), ("drap/stats.txt",)),
+    "kp": (900, ("geomag/kindex.txt",), None),
+    "noaa_scales": (900, ("NOAASpaceWX/noaaswx.txt",), None),
+    "aurora": (1800, ("aurora/aurora.txt",), None),
+    "solar_indices": (3600, ("ssn/ssn-31.txt", "solar-flux/solarflux-99.txt"), None),
+    "dst": (3600, ("dst/dst.txt",), None),
+    "weather_grid": (3600, ("worldwx/wx.txt",), None),
+    "dxpeds": (6 * 3600, ("dxpeds/dxpeditions.txt",), None),
+    "contests": (6 * 3600, ("contests/contests311.txt",), None),
+    "cty": (24 * 3600, (), ("cty/cty_wt_mod-ll-dxcc.txt",)),
+}
+
+
+def default_sources():
+    """noaa_fetcher.FETCHERS at the cadence their upstream products change."""
+    sources = []
+    for name, run, host in noaa_fetcher.FETCHERS:
+        interval, products, files = SCHEDULE[name]
+        interval = INTERVALS.get(name) or interval
+        sources.append(Source(name, run, interval, products, files=files, host=host))
+    return sources
+
+
+class IngestScheduler:
+    def __init__(self, sources, store=None, jitter=JITTER, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, after_run=None):
+        self.sources = {s.name: s for s in sources}
+        self.store = store or snapshot_store.STORE
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.after_run = after_run  # called once after each round that ran a source
+        self.transfer = None  # upstream and snapshot-store counters of the last round
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+    def _jittered(self, seconds):
+        return seconds * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def prime(self):
+        """Schedule each source from the age of its products on disk (due now if missing)."""
+        now, mono = time.time(), time.monotonic()
+        for source in self.sources.values():
+            try:
+                mtimes = [os.stat(self.store.path(p)).st_mtime for p in source.files]
+            except OSError:
+                mtimes = []
+            if mtimes:
+                source.last_success = min(mtimes)
+                source.next_run = mono + max(0.0, source.last_success + self._jittered(source.interval) - now)
+            else:
+                source.next_run = mono
+
+    def run_now(self, name=None):
+        """Make `name` (or every source) due now. Safe from signal handlers and other threads."""
+        if name is not None and name not in self.sources:
+            raise KeyError(name)
+        for source in self.sources.values():
+            if name is None or source.name == name:
+                source.next_run = 0.0
+        self._wake.set()
+
+    def run_source(self, source):
+        mark = self.store.mark()
+        started = time.perf_counter()
+        source.last_attempt = time.time()
+        source.runs += 1
+        error = None
+        try:
+            source.run()
+            missing = [p for p in source.products if not self.store.published_since(p, mark)]
+            if missing:
+                error = f"not published: {', '.join(missing)}"
+        except Exception as e:
+            logger.error(f"Ingest source {source.name} failed: {e}", exc_info=True)
+            error = str(e) or type(e).__name__
+        source.last_duration_s = round(time.perf_counter() - started, 3)
+        mono = time.monotonic()
+        if error is None:
+            source.failures = 0
+            source.last_error = None
+            source.last_success = time.time()
+            source.next_run = mono + self._jittered(source.interval)
+        else:
+            source.failures += 1
+            source.errors += 1
+            source.last_error = error
+            delay = min(self.backoff_max, min(self.backoff_base, source.interval) * 2 ** (source.failures - 1))
+            source.next_run = mono + self._jittered(delay)
+            logger.warning(f"Ingest source {source.name}: {error}; retry in {delay:.0f}s "
+                           f"(failure {source.failures})")
+        return error is None
+
+    def run_pending(self):
+        """Run every due source concurrently (job_runner), most overdue first. Returns how many ran."""
+        with self._run_lock:
+            mono = time.monotonic()
+            due = sorted((s for s in self.sources.values() if s.next_run <= mono), key=lambda s: s.next_run)
+            if due:
+                started = time.perf_counter()
+                report = job_runner.run_jobs(
+                    [job_runner.Job(s.name, lambda s=s: self._stopping or self.run_source(s), s.host) for s in due])
+                for name, entry in report.items():
+                    entry["error"] = self.sources[name].last_error
+                if self.after_run is not None:
+                    self.after_run()
+                self.transfer = {"upstream": upstream.take_report(), "store": self.store.take_report()}
+                logger.info("Ingest round:\n" + job_runner.format_report(report, time.perf_counter() - started)
+                            + "\n" + upstream.format_report(self.transfer["upstream"])
+                            + "\n" + snapshot_store.format_report(self.transfer["store"]))
+            self.check_staleness()
+            return len(due)
+
+    def run_all(self):
+        self.run_now()
+        return self.run_pending()
+
+    def check_staleness(self):
+        now = time.time()
+        for source in self.sources.values():
+            age = None if source.last_success is None else now - source.last_success
+            stale = age is None or age > source.max_staleness
+            if stale and not source.stale and source.last_attempt is not None:
+                logger.error(f"Ingest source {source.name} is stale: last success "
+                             f"{'never' if age is None else f'{age:.0f}s ago'} (SLA {source.max_staleness:.0f}s)")
+            source.stale = stale
+
+    def loop(self):
+        while not self._stopping:
+            self.run_pending()
+            self._wake.clear()
+            wait = min((s.next_run for s in self.sources.values()), default=IDLE_WAIT) - time.monotonic()
+            if wait > 0:
+                self._wake.wait(min(wait, IDLE_WAIT))
+
+    def start(self):
+        """prime() and loop() on a daemon thread."""
+        self.prime()
+        self._thread = threading.Thread(target=self.loop, name="ingest", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def status(self):
+        now, mono = time.time(), time.monotonic()
+        return {
+            "generation": self.store.current().generation,
+            "transfer": self.transfer,
+            "sources": {s.name: {
+                "interval_s": s.interval, "max_staleness_s": s.max_staleness,
+                "age_s": None if s.last_success is None else round(now - s.last_success, 1),
+                "stale": s.last_success is None or now - s.last_success > s.max_staleness, "next_in_s": round(max(0.0, s.next_run - mono), 1),
+                "runs": s.runs, "errors": s.errors, "failures": s.failures,
+                "last_error": s.last_error, "last_duration_s": s.last_duration_s,
+            } for s in self.sources.values()},
+        }
+
+    def prometheus_lines(self):
+        status = self.status()["sources"]
+        lines = []
+        for name, field in (("hamclock_ingest_age_seconds", "age_s"), ("hamclock_ingest_stale", "stale"),
+                            ("hamclock_ingest_errors_total", "errors"),
+                            ("hamclock_ingest_duration_seconds", "last_duration_s")):
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            for source, entry in status.items():
+                value = entry[field]
+                if value is not None:
+                    lines.append(f'{name}{{source="{source}"}} {int(value) if isinstance(value, bool) else value}')
+        return lines
+
+
+def build_scheduler():
+    noaa_fetcher.prepare_output_dirs()
+    return IngestScheduler(default_sources(), after_run=noaa_fetcher.publish_gzip)
 
-def run_fetcher():
-    print(f"[{time.ctime()}] Running NOAA fetcher...")
-    try:
-        # Run with current python interpreter
-        subprocess.run([sys.executable, FETCH_SCRIPT], check=True)
-        print(f"[{time.ctime()}] NOAA fetcher completed successfully.")
-    except subprocess.CalledProcessError as e:
-        print(f"[{time.ctime()}] Error running fetcher: {e}")
 
 def main():
-    # Initial fetch
-    run_fetcher()
-    
-    # Run every 10 minutes (600 seconds)
-    interval = 600
-    print(f"Scheduler started. Will run every {interval} seconds.")
-    
+    parser = argparse.ArgumentParser(description="HamClock backend ingestion scheduler")
+    parser.add_argument("--once", action="store_true", help="run every source once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    scheduler = build_scheduler()
+    if args.once:
+        scheduler.run_all()
+        sys.exit(0 if all(s.failures == 0 for s in scheduler.sources.values()) else 1)
+
+    signal.signal(signal.SIGUSR1, lambda *_: scheduler.run_now())
+    scheduler.prime()
+    print(f"[{time.ctime()}] Scheduler started with {len(scheduler.sources)} sources.")
     try:
-        while True:
-            time.sleep(interval)
-            run_fetcher()
+        scheduler.loop()
     except KeyboardInterrupt:
         print("Scheduler stopped by user.")
 
@@ -1,10 +1,14 @@
 import os
-import requests
 import subprocess
 import zlib
 import re
 import logging
 import time
+import threading
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +39,18 @@ def get_sdo_image(path):
     Fetches and processes an SDO image based on the requested filename.
     Filenames like f_304_170.bmp or latest_170_HMIIC.bmp.z
     """
+    cache_path = get_sdo_image_path(path)
+    if cache_path is None:
+        return None
+    with open(cache_path, "rb") as f:
+        return f.read()
+
+def get_sdo_image_path(path):
+    """
+    Like get_sdo_image, but returns the path of the fresh disk cache file
+    (fetching and processing the image first if needed) so the server can
+    stream it. Cache files are replaced atomically. None on failure.
+    """
     filename = os.path.basename(path)
     
     # 1. Determine resolution
@@ -66,14 +82,13 @@ def get_sdo_image(path):
     if os.path.exists(cache_path):
         if time.time() - os.path.getmtime(cache_path) < 1800:
             logger.debug(f"Serving SDO {cache_id} from cache")
-            with open(cache_path, "rb") as f:
-                return f.read()
+            return cache_path
 
     logger.info(f"Fetching fresh SDO image for {wavelength} at {resolution}x{resolution}")
     img_url = f"https://sdo.gsfc.nasa.gov/assets/img/latest/{sdo_filename}"
     
     try:
-        resp = requests.get(img_url, timeout=15)
+        resp = upstream.fetch(img_url, timeout=15)
         resp.raise_for_status()
         
         # Process using ImageMagick
@@ -109,15 +124,17 @@ def get_sdo_image(path):
         # Compress with level 6 (standard) as it matched HMIIC closely
         compressed = zlib.compress(bmp_data, level=6)
         
-        # Save to cache
-        with open(cache_path, "wb") as f:
+        # Save to cache; replace atomically since readers may be streaming the old file
+        temp_cache = f"{cache_path}.{pid}.{threading.get_ident()}.tmp"
+        with open(temp_cache, "wb") as f:
             f.write(compressed)
+        os.replace(temp_cache, cache_path)
             
         # Cleanup temp files
         if os.path.exists(temp_jpg): os.remove(temp_jpg)
         if os.path.exists(temp_bmp): os.remove(temp_bmp)
             
-        return compressed
+        return cache_path
     except Exception as e:
         logger.error(f"Error processing SDO image {wavelength}: {e}")
         return None
@@ -0,0 +1,365 @@
+"""
+Snapshot store for the products under processed_data.
+
+Fetchers hand each product to publish() once per cycle: the rendered bytes
+are written atomically (temp file + os.replace, so a reader never sees a
+half-written file) and the parsed structure is kept in memory next to them.
+Every publish bumps a store-wide generation and rewrites MANIFEST, which
+records the generation and each product's (mtime_ns, size).
+
+Readers call current() and get an immutable Snapshot: every product as of
+one generation, so a handler combining Kp, solar wind and SSN never mixes two
+fetch cycles and a cache can key on Snapshot.generation. The manifest is
+checked at most every CHECK_INTERVAL seconds; when a fetcher in another
+process has published, the changed products are loaded and parsed once and a
+new Snapshot replaces the old one. Without a manifest (nothing published yet)
+the PARSERS products are picked up from whatever is on disk.
+
+batch() groups the publishes of one fetch cycle into a single generation.
+Publishing bytes identical to the current ones writes nothing, and confirm()
+lets a fetcher whose upstream is unchanged skip parsing altogether; both
+still count as fresh for published_since() (the scheduler's success check).
+
+Raw bodies are only kept up to MAX_BODY (the static cache's per-entry limit);
+larger products (CTY, the weather grid) keep their parsed form and a digest,
+and the server streams their files from disk.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "processed_data")
+MANIFEST = ".snapshot.json"
+CHECK_INTERVAL = float(os.environ.get("SNAPSHOT_CHECK_INTERVAL", "1.0"))
+MAX_BODY = int(os.environ.get("STATIC_CACHE_ENTRY_BYTES", 64 * 1024))
+
+
+def _lines(body):
+    return [l.strip() for l in body.decode("utf-8", "replace").splitlines()
+            if l.strip() and not l.startswith("#")]
+
+
+def parse_rows(body):
+    """Whitespace separated numeric rows -> tuple of float tuples (bad rows skipped)."""
+    rows = []
+    for line in _lines(body):
+        try:
+            rows.append(tuple(float(p) for p in line.split()))
+        except ValueError:
+            continue
+    return tuple(rows)
+
+
+def parse_grid(body):
+    """
+    worldwx/wx.txt -> tuple of (lat, lng, fields) with fields the full split line.
+    Rows need 8 fields (through the condition); the TZ column is optional here.
+    """
+    rows = []
+    for line in _lines(body):
+        parts = line.split()
+        if len(parts) < 8:
+            continue
+        try:
+            rows.append((float(parts[0]), float(parts[1]), tuple(parts)))
+        except ValueError:
+            continue
+    return tuple(rows)
+
+
+# Products read by the services; everything else is published as bytes only
+PARSERS = {
+    "ssn/ssn-31.txt": parse_rows,
+    "geomag/kindex.txt": parse_rows,
+    "solar-wind/swind-24hr.txt": parse_rows,
+    "Bz/Bz.txt": parse_rows,
+    "worldwx/wx.txt": parse_grid,
+}
+
+
+class Dataset:
+    __slots__ = ("name", "body", "digest", "parsed", "stamp", "generation")
+
+    def __init__(self, name, body, digest, parsed, stamp, generation):
+        self.name = name
+        self.body = body  # None above MAX_BODY
+        self.digest = digest
+        self.parsed = parsed
+        self.stamp = stamp  # (mtime_ns, size) of the published file
+        self.generation = generation
+
+
+class Snapshot:
+    """All products as of one generation. Never modified once built."""
+    __slots__ = ("generation", "datasets")
+
+    def __init__(self, generation, datasets):
+        self.generation = generation
+        self.datasets = datasets
+
+    def get(self, name):
+        return self.datasets.get(name)
+
+    def body(self, name):
+        """Raw bytes of `name`; None if unpublished or larger than MAX_BODY."""
+        dataset = self.datasets.get(name)
+        return dataset.body if dataset is not None else None
+
+    def parsed(self, name, default=None):
+        dataset = self.datasets.get(name)
+        return dataset.parsed if dataset is not None and dataset.parsed is not None else default
+
+
+class SnapshotStore:
+    def __init__(self, root=OUTPUT_DIR, check_interval=CHECK_INTERVAL, max_body=MAX_BODY):
+        self.root = root
+        self.max_body = max_body
+        self.manifest_path = os.path.join(root, MANIFEST)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = Snapshot(0, {})
+        self._manifest_stamp = None
+        self._checked = None
+        self._pending = None
+        self._batch_depth = 0
+        self._seq = itertools.count(1)
+        self._confirmed = {}  # name -> sequence number of its last publish() or confirm()
+        self._report = self._new_report()
+
+    @staticmethod
+    def _new_report():
+        return {"written": 0, "bytes_written": 0, "unchanged_writes": 0, "confirmed": 0}
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def _dataset(self, name, body, parsed, stamp, generation, digest=None):
+        kept = body if len(body) <= self.max_body else None
+        return Dataset(name, kept, digest or hashlib.sha256(body).digest(), parsed, stamp, generation)
+
+    def publish(self, name, body, parsed=None):
+        """
+        Atomically write `body` (bytes or str) to processed_data/`name` and make
+        it, with `parsed` (default: PARSERS[name](body)), part of the next generation.
+        """
+        if isinstance(body, str):
+            body = body.encode()
+        path = self.path(name)
+        digest = hashlib.sha256(body).digest()
+        with self._lock:
+            current = self._current_locked(name)
+            if current is not None and current.digest == digest and (parsed is None or parsed == current.parsed):
+                # Same bytes as already published: no write, no new generation
+                self._confirmed[name] = next(self._seq)
+                self._report["unchanged_writes"] += 1
+                return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        st = os.stat(path)
+        if parsed is None and name in PARSERS:
+            parsed = PARSERS[name](body)
+        dataset = self._dataset(name, body, parsed, (st.st_mtime_ns, st.st_size), None, digest)
+        with self._lock:
+            self._confirmed[name] = next(self._seq)
+            self._report["written"] += 1
+            self._report["bytes_written"] += len(body)
+            if self._pending is not None:
+                self._pending[name] = dataset
+            else:
+                self._commit({name: dataset})
+        return path
+
+    def _current_locked(self, name):
+        if self._pending is not None and name in self._pending:
+            return self._pending[name]
+        return self._snapshot.datasets.get(name)
+
+    def confirm(self, *names):
+        """
+        Record that the published `names` are still current (their upstream is
+        unchanged), so the caller can skip re-parsing and re-writing them.
+        False, and nothing recorded, if any of them has not been published.
+        """
+        self.current()
+        with self._lock:
+            if any(self._current_locked(name) is None for name in names):
+                return False
+            seq = next(self._seq)
+            for name in names:
+                self._confirmed[name] = seq
+            self._report["confirmed"] += len(names)
+            return True
+
+    def mark(self):
+        """A point in the publish/confirm sequence, for published_since()."""
+        with self._lock:
+            return next(self._seq)
+
+    def published_since(self, name, mark):
+        """True if `name` was published or confirmed after mark() returned `mark`."""
+        return self._confirmed.get(name, 0) > mark
+
+    def take_report(self):
+        """Write counters since the last call, then reset."""
+        with self._lock:
+            report, self._report = self._report, self._new_report()
+        return report
+
+    @contextmanager
+    def batch(self):
+        """Publishes inside the block (from any thread) become one generation on exit."""
+        with self._lock:
+            self._batch_depth += 1
+            if self._pending is None:
+                self._pending = {}
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    pending, self._pending = self._pending, None
+                    if pending:
+                        self._commit(pending)
+
+    def _commit(self, changed):
+        # Fold in anything another process published first, so its products stay listed
+        self._refresh_locked(scan=False)
+        generation = self._snapshot.generation + 1
+        datasets = dict(self._snapshot.datasets)
+        for name, dataset in changed.items():
+            dataset.generation = generation
+            datasets[name] = dataset
+        self._snapshot = Snapshot(generation, datasets)
+        manifest = {"generation": generation,
+                    "datasets": {name: list(d.stamp) for name, d in sorted(datasets.items())}}
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+            st = os.stat(self.manifest_path)
+            self._manifest_stamp = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.error(f"Error writing snapshot manifest: {e}")
+
+    def current(self):
+        """The latest Snapshot, re-checking the manifest at most every check_interval seconds."""
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.check_interval:
+            self._checked = now
+            self.refresh()
+        return self._snapshot
+
+    @property
+    def generation(self):
+        return self.current().generation
+
+    def refresh(self):
+        with self._lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self, scan=True):
+        try:
+            st = os.stat(self.manifest_path)
+        except OSError:
+            st = None
+        if st is not None:
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._manifest_stamp:
+                return
+            try:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                generation = int(manifest["generation"])
+                wanted = {name: tuple(s) for name, s in manifest["datasets"].items()}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable snapshot manifest: {e}")
+                return
+            self._manifest_stamp = stamp
+        elif not scan:
+            return
+        else:
+            generation = None
+            wanted = {}
+            for name in PARSERS:
+                try:
+                    file_st = os.stat(self.path(name))
+                except OSError:
+                    continue
+                wanted[name] = (file_st.st_mtime_ns, file_st.st_size)
+
+        old = self._snapshot
+        datasets = {}
+        changed = False
+        for name, file_stamp in wanted.items():
+            dataset = old.datasets.get(name)
+            if dataset is None or dataset.stamp != file_stamp:
+                dataset = self._load(name, generation)
+                changed = True
+                if dataset is None:
+                    continue
+            datasets[name] = dataset
+        changed = changed or len(datasets) != len(old.datasets)
+        if generation is None:
+            generation = old.generation + 1 if changed else old.generation
+        if changed or generation != old.generation:
+            generation = max(generation, old.generation)
+            for dataset in datasets.values():
+                if dataset.generation is None:
+                    dataset.generation = generation
+            self._snapshot = Snapshot(generation, datasets)
+
+    def _load(self, name, generation):
+        try:
+            with open(self.path(name), "rb") as f:
+                st = os.fstat(f.fileno())
+                body = f.read()
+        except OSError:
+            return None
+        parser = PARSERS.get(name)
+        try:
+            parsed = parser(body) if parser is not None else None
+        except Exception as e:
+            logger.error(f"Error parsing {name}: {e}")
+            parsed = None
+        return self._dataset(name, body, parsed, (st.st_mtime_ns, st.st_size), generation)
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {"generation": snapshot.generation, "datasets": len(snapshot.datasets),
+                "bytes": sum(len(d.body) for d in snapshot.datasets.values() if d.body is not None)}
+
+
+STORE = SnapshotStore()
+
+
+def publish(name, body, parsed=None):
+    return STORE.publish(name, body, parsed)
+
+
+def batch():
+    return STORE.batch()
+
+
+def current():
+    return STORE.current()
+
+
+def confirm(*names):
+    return STORE.confirm(*names)
+
+
+def format_report(report):
+    return (f"snapshot: {report['written']} written ({report['bytes_written']} bytes), "
+            f"{report['unchanged_writes']} identical writes skipped, {report['confirmed']} confirmed unchanged")
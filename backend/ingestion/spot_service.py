@@ -1,8 +1,11 @@
-import requests
 import xml.etree.ElementTree as ET
 import time
 import sys
 import logging
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 logger = logging.getLogger(__name__)
 
 def fetch_pskreporter(callsign=None, grid=None, maxage_sec=1800, mode_filter=None, is_receiver=False):
@@ -30,48 +33,41 @@ def fetch_pskreporter(callsign=None, grid=None, maxage_sec=1800, mode_filter=Non
     else:
         return "Error: callsign or grid required"
 
-    max_retries = 2
-    for attempt in range(max_retries + 1):
-        try:
-            logger.debug(f"Fetching from {url} with {params} (attempt {attempt+1})...")
-            resp = requests.get(url, params=params, timeout=15)
-            if resp.status_code == 503 and attempt < max_retries:
-                logger.warning("PSKReporter returned 503, retrying in 2s...")
-                time.sleep(2)
-                continue
-            resp.raise_for_status()
+    try:
+        # 503s (PSKReporter is often busy) are retried by the upstream client
+        logger.debug(f"Fetching from {url} with {params}...")
+        resp = upstream.fetch(url, params=params, timeout=15)
+        resp.raise_for_status()
+        
+        logger.debug(f"Received XML ({len(resp.text)} bytes): {resp.text[:200]}...")
+        root = ET.fromstring(resp.text)
+        spots = []
+        
+        all_reports = root.findall('receptionReport')
+        logger.debug(f"Found {len(all_reports)} receptionReport elements")
+
+        for report in all_reports:
+            tx_call = report.get('senderCallsign')
+            tx_grid = report.get('senderLocator', '')
+            rx_call = report.get('receiverCallsign')
+            rx_grid = report.get('receiverLocator', '')
+            freq = report.get('frequency', '0')
+            mode = report.get('mode', '')
+            snr = report.get('sNR', '0')
+            timestamp = report.get('flowStartSeconds', str(int(time.time())))
             
-            logger.debug(f"Received XML ({len(resp.text)} bytes): {resp.text[:200]}...")
-            root = ET.fromstring(resp.text)
-            spots = []
+            # HamClock CSV: posting_time, de_grid, de_call, dx_grid, dx_call, mode, Hz, snr
+            if is_receiver:
+                line = f"{timestamp},{rx_grid},{rx_call},{tx_grid},{tx_call},{mode},{freq},{snr}"
+            else:
+                line = f"{timestamp},{tx_grid},{tx_call},{rx_grid},{rx_call},{mode},{freq},{snr}"
+            spots.append(line)
             
-            all_reports = root.findall('receptionReport')
-            logger.debug(f"Found {len(all_reports)} receptionReport elements")
-
-            for report in all_reports:
-                tx_call = report.get('senderCallsign')
-                tx_grid = report.get('senderLocator', '')
-                rx_call = report.get('receiverCallsign')
-                rx_grid = report.get('receiverLocator', '')
-                freq = report.get('frequency', '0')
-                mode = report.get('mode', '')
-                snr = report.get('sNR', '0')
-                timestamp = report.get('flowStartSeconds', str(int(time.time())))
-                
-                # HamClock CSV: posting_time, de_grid, de_call, dx_grid, dx_call, mode, Hz, snr
-                if is_receiver:
-                    line = f"{timestamp},{rx_grid},{rx_call},{tx_grid},{tx_call},{mode},{freq},{snr}"
-                else:
-                    line = f"{timestamp},{tx_grid},{tx_call},{rx_grid},{rx_call},{mode},{freq},{snr}"
-                spots.append(line)
-                
-            return "\n".join(spots)
+        return "\n".join(spots)
 
-        except Exception as e:
-            logger.error(f"Error in PSKReporter request (attempt {attempt+1}): {e}")
-            if attempt == max_retries:
-                return f"Error: {e}"
-            time.sleep(1)
+    except Exception as e:
+        logger.error(f"Error in PSKReporter request: {e}")
+        return f"Error: {e}"
 
 if __name__ == "__main__":
     # Test: python3 spot_service.py grid PM95 3600
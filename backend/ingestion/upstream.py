@@ -0,0 +1,342 @@
+"""
+Shared upstream HTTP client for the ingestion fetchers and services.
+
+Every request goes through request(), which per upstream host keeps
+
+    a pooled requests.Session    connections stay alive between requests
+    a concurrency limit          UPSTREAM_PER_HOST (HOST_LIMITS overrides)
+    a token bucket               UPSTREAM_RATE requests/s up to UPSTREAM_BURST
+                                 (HOST_RATES overrides); callers wait for a token
+    a retry policy               connection errors, timeouts and RETRY_STATUSES
+                                 are retried UPSTREAM_RETRIES times after
+                                 RETRY_BASE * 2^attempt seconds, jittered +/-50%
+                                 (a 429/503 Retry-After is honoured up to RETRY_MAX)
+
+fetch(url) is a plain GET through it; stats() has the per-host counters.
+Interactive callers pass wait=<seconds> to bound the time spent queueing for
+a token and a slot behind ingestion; past it request() raises HostBusy
+instead of waiting, so the caller can answer from local data.
+UPSTREAM_RECORD=<dir> saves every response to a fixture store and
+UPSTREAM_REPLAY=<url> sends every request to the local stand-in instead of
+the real host (see upstream_replay.py), for offline, reproducible runs.
+
+get(url) remembers each URL's ETag / Last-Modified and sends them back as
+If-None-Match / If-Modified-Since; a 304 is answered with the body kept from
+the previous fetch. Every 200 body is hashed as well, so hosts that ignore
+conditional requests still show up as unchanged: FetchResult.changed is False
+whenever the body is what that URL returned last time, and the fetcher can
+skip parsing and writing (see snapshot_store.confirm()).
+
+take_report() returns and resets the counters of the current cycle:
+
+    requests         GETs sent
+    bytes_fetched    body bytes received
+    not_modified     304 answers; bytes_saved is the size of the bodies they stood for
+    unchanged        200 answers identical to the previous body (bytes_unchanged)
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    from ingestion import upstream_replay
+except ImportError:
+    import upstream_replay
+
+logger = logging.getLogger(__name__)
+
+# Larger bodies are not kept, so their URLs are always fetched in full
+MAX_CACHED_BODY = 16 * 1024 * 1024
+
+PER_HOST = int(os.environ.get("UPSTREAM_PER_HOST", "4"))
+RATE = float(os.environ.get("UPSTREAM_RATE", "5.0"))
+BURST = float(os.environ.get("UPSTREAM_BURST", "10"))
+RETRIES = int(os.environ.get("UPSTREAM_RETRIES", "2"))
+RETRY_BASE = 1.0
+RETRY_MAX = 30.0
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Hosts that want gentler treatment than the defaults
+HOST_LIMITS = {"api.open-meteo.com": 1}
+HOST_RATES = {"api.open-meteo.com": (0.5, 1.0),  # (requests/s, burst)
+              "ip-api.com": (0.75, 5.0)}          # free tier: 45 requests/min
+# Base URL of the replay stand-in ("" = the real hosts) and the FixtureStore
+# recording responses (None = off); see upstream_replay.py
+REPLAY = os.environ.get("UPSTREAM_REPLAY", "")
+RECORD = upstream_replay.FixtureStore(os.environ["UPSTREAM_RECORD"]) if os.environ.get("UPSTREAM_RECORD") else None
+
+
+class HostBusy(requests.RequestException):
+    """No token or slot for the host within the caller's `wait`."""
+
+
+class _Host:
+    __slots__ = ("name", "session", "slots", "rate", "burst", "tokens", "stamp", "lock",
+                 "requests", "retries", "errors", "busy", "in_flight", "wait_s")
+
+    def __init__(self, name):
+        limit = HOST_LIMITS.get(name, PER_HOST)
+        self.name = name
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limit)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = threading.BoundedSemaphore(limit)
+        self.rate, self.burst = HOST_RATES.get(name, (RATE, BURST))
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.busy = 0
+        self.in_flight = 0
+        self.wait_s = 0.0
+
+    def take_token(self, deadline=None):
+        """
+        Block until the bucket has a token for one request. With a deadline
+        (time.monotonic()), return False instead if it would come later.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                delay = (1.0 - self.tokens) / self.rate
+                if deadline is not None and now + delay > deadline:
+                    return False
+                self.wait_s += delay
+            time.sleep(delay)
+
+
+_hosts_lock = threading.Lock()
+_hosts = {}
+
+
+def _host(url):
+    name = urllib.parse.urlsplit(url).hostname or ""
+    with _hosts_lock:
+        host = _hosts.get(name)
+        if host is None:
+            host = _hosts[name] = _Host(name)
+        return host
+
+
+def _retry_delay(attempt, resp=None):
+    if resp is not None:
+        try:
+            retry_after = float(resp.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        if retry_after is not None and 0 <= retry_after <= RETRY_MAX:
+            return retry_after
+    return min(RETRY_MAX, RETRY_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _recorded(method, url, resp):
+    if RECORD is not None and resp.status_code != 304 and not REPLAY:
+        RECORD.save(method, url, resp.status_code, resp.headers, resp.content)
+    return resp
+
+
+def request(method, url, retries=None, session=None, wait=None, **kwargs):
+    """
+    Send one request through the host's pool, limit and bucket, retrying
+    transient failures. Returns the last response (any status); raises the
+    last exception when every attempt failed to connect. With `wait`, raises
+    HostBusy when a token and a slot aren't free within that many seconds.
+    """
+    host = _host(url)
+    retries = RETRIES if retries is None else retries
+    if REPLAY or RECORD is not None:
+        # Fixtures are keyed by the full URL, query included
+        url = requests.Request(method, url, params=kwargs.pop("params", None)).prepare().url
+        target = upstream_replay.replay_url(REPLAY, url) if REPLAY else url
+    else:
+        target = url
+    for attempt in range(retries + 1):
+        deadline = None if wait is None else time.monotonic() + wait
+        if not host.take_token(deadline) or not host.slots.acquire(
+                timeout=-1 if deadline is None else max(0.0, deadline - time.monotonic())):
+            with host.lock:
+                host.busy += 1
+            raise HostBusy(f"{method} {url}: {host.name} busy for more than {wait}s")
+        error = resp = None
+        try:
+            with host.lock:
+                host.requests += 1
+                host.in_flight += 1
+            try:
+                resp = (session or host.session).request(method, target, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                with host.lock:
+                    host.in_flight -= 1
+        finally:
+            host.slots.release()
+        if error is None and resp.status_code not in RETRY_STATUSES:
+            return _recorded(method, url, resp)
+        if attempt == retries:
+            with host.lock:
+                host.errors += 1
+            if error is not None:
+                raise error
+            return _recorded(method, url, resp)
+        delay = _retry_delay(attempt, resp)
+        with host.lock:
+            host.retries += 1
+        logger.warning(f"{method} {url}: {error or resp.status_code}; retry {attempt + 1}/{retries} in {delay:.1f}s")
+        if resp is not None:
+            resp.close()
+        time.sleep(delay)
+
+
+class _Entry:
+    __slots__ = ("etag", "last_modified", "digest", "content", "encoding")
+
+    def __init__(self, etag, last_modified, digest, content, encoding):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.content = content
+        self.encoding = encoding
+
+
+class FetchResult:
+    """The parts of a requests.Response the fetchers use, plus whether the body changed."""
+    __slots__ = ("url", "status_code", "content", "encoding", "changed", "not_modified", "response")
+
+    def __init__(self, url, status_code, content, encoding, changed, not_modified, response):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.changed = changed
+        self.not_modified = not_modified
+        self.response = response
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", "replace")
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+
+_lock = threading.Lock()
+_entries = {}
+
+
+def _new_report():
+    return {"requests": 0, "bytes_fetched": 0, "not_modified": 0, "bytes_saved": 0,
+            "unchanged": 0, "bytes_unchanged": 0}
+
+
+_report = _new_report()
+
+
+def _key(url, params):
+    if not params:
+        return url
+    return url + ("&" if "?" in url else "?") + urllib.parse.urlencode(sorted(params.items()))
+
+
+def fetch(url, params=None, headers=None, timeout=10, retries=None, wait=None):
+    """Plain GET through request(); counted in take_report() but not cached."""
+    resp = request("GET", url, retries=retries, wait=wait, params=params, headers=headers, timeout=timeout)
+    with _lock:
+        _report["requests"] += 1
+        _report["bytes_fetched"] += len(resp.content)
+    return resp
+
+
+def get(url, params=None, headers=None, timeout=10, retries=None, session=None):
+    """Conditional GET of `url`. Never raises for HTTP status; call raise_for_status()."""
+    key = _key(url, params)
+    with _lock:
+        entry = _entries.get(key)
+    send = dict(headers or {})
+    if entry is not None:
+        if entry.etag:
+            send["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            send["If-Modified-Since"] = entry.last_modified
+    resp = request("GET", url, retries=retries, session=session, params=params, headers=send, timeout=timeout)
+
+    if resp.status_code == 304 and entry is not None:
+        with _lock:
+            _report["requests"] += 1
+            _report["not_modified"] += 1
+            _report["bytes_saved"] += len(entry.content)
+        return FetchResult(url, 200, entry.content, entry.encoding, False, True, resp)
+
+    content = resp.content
+    with _lock:
+        _report["requests"] += 1
+        _report["bytes_fetched"] += len(content)
+    if resp.status_code != 200:
+        return FetchResult(url, resp.status_code, content, resp.encoding, True, False, resp)
+
+    digest = hashlib.sha256(content).digest()
+    changed = entry is None or entry.digest != digest
+    encoding = resp.encoding or (entry.encoding if entry is not None else None)
+    with _lock:
+        if not changed:
+            _report["unchanged"] += 1
+            _report["bytes_unchanged"] += len(content)
+        if len(content) <= MAX_CACHED_BODY:
+            _entries[key] = _Entry(resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                                   digest, content, encoding)
+        else:
+            _entries.pop(key, None)
+    return FetchResult(url, 200, content, encoding, changed, False, resp)
+
+
+def forget(url=None):
+    """Drop the remembered validators and body of `url` (all URLs when None)."""
+    with _lock:
+        if url is None:
+            _entries.clear()
+        else:
+            _entries.pop(url, None)
+
+
+def take_report():
+    """Counters since the last call, then reset."""
+    global _report
+    with _lock:
+        report, _report = _report, _new_report()
+    return report
+
+
+def stats():
+    """Per-host counters for /metrics.json."""
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return {host.name: {"requests": host.requests, "retries": host.retries, "errors": host.errors,
+                        "busy": host.busy, "in_flight": host.in_flight, "rate_wait_s": round(host.wait_s, 3)}
+            for host in hosts}
+
+
+def format_report(report):
+    return (f"upstream: {report['requests']} requests, {report['bytes_fetched']} bytes fetched, "
+            f"{report['not_modified']} not modified ({report['bytes_saved']} bytes saved), "
+            f"{report['unchanged']} unchanged ({report['bytes_unchanged']} bytes)")
@@ -0,0 +1,232 @@
+"""
+Record/replay stand-in for the upstream services.
+
+Recording: with UPSTREAM_RECORD=<dir>, upstream.request() saves every
+response it gets (except 304s) to a FixtureStore under <dir>: per host, one
+.json with the URL, status and headers and one .body, keyed by method + full
+URL (query included). Recording the same URL again replaces its fixture.
+
+Replay: this module's server answers from a FixtureStore, and with
+UPSTREAM_REPLAY=http://127.0.0.1:8765 upstream.request() sends every request
+to it as /<scheme>/<host>/<path>?<query> instead of to the real host. The
+recorded ETag / Last-Modified are honoured with 304s, so conditional
+fetches behave as they do live. For load and failure testing the server can
+add latency and answer a fraction of requests with an error or a 429:
+
+    python3 backend/ingestion/upstream_replay.py --port 8765 \\
+        --latency-ms 80 --jitter-ms 40 --error-rate 0.02 --throttle-rate 0.05
+
+    UPSTREAM_RECORD=debug/upstream_fixtures python3 backend/ingestion/scheduler.py --once
+    UPSTREAM_REPLAY=http://127.0.0.1:8765 python3 backend/ingestion/scheduler.py --once
+
+Faults are drawn from a seeded generator, so a run's sequence of answers is
+reproducible for a given request order. A request without a fixture gets a
+404 (counted as "missing"), so a run shows which feeds were never recorded.
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "debug", "upstream_fixtures")
+# Response headers worth replaying; the body is stored decoded, so no Content-Encoding
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+
+class FixtureStore:
+    def __init__(self, root=DEFAULT_FIXTURES):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _paths(self, method, url):
+        host = urllib.parse.urlsplit(url).hostname or "_"
+        digest = hashlib.sha1(f"{method} {url}".encode()).hexdigest()[:20]
+        base = os.path.join(self.root, host, digest)
+        return base + ".json", base + ".body"
+
+    def save(self, method, url, status, headers, body):
+        meta_path, body_path = self._paths(method, url)
+        meta = {"method": method, "url": url, "status": status, "recorded": int(time.time()),
+                "headers": {k: headers[k] for k in KEPT_HEADERS if k in headers}}
+        with self._lock:
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            for path, data in ((body_path, body), (meta_path, json.dumps(meta, indent=1).encode())):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+    def load(self, method, url):
+        """(status, headers, body) or None."""
+        meta_path, body_path = self._paths(method, url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        return meta["status"], meta["headers"], body
+
+    def entries(self):
+        """Metadata of every fixture, sorted by URL."""
+        metas = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".json"):
+                    with open(os.path.join(dirpath, name)) as f:
+                        metas.append(json.load(f))
+        return sorted(metas, key=lambda m: (m["url"], m["method"]))
+
+
+def replay_url(base, url):
+    """https://host/path?q -> <base>/https/host/path?q"""
+    parts = urllib.parse.urlsplit(url)
+    return f"{base.rstrip('/')}/{parts.scheme}/{parts.netloc}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+
+
+def original_url(path):
+    """Inverse of replay_url() for the request path the stand-in receives; None if malformed."""
+    scheme, _, rest = path.lstrip("/").partition("/")
+    if scheme not in ("http", "https") or not rest:
+        return None
+    return f"{scheme}://{rest}"
+
+
+class ReplayServer:
+    """The stand-in: answers from `store`, with optional latency and faults."""
+
+    def __init__(self, store, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0,
+                 error_rate=0.0, error_status=503, throttle_rate=0.0, retry_after=1, seed=1):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"served": 0, "not_modified": 0, "missing": 0, "errors": 0, "throttled": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self):
+        """(delay s, fault) for one request; fault is None, "error" or "throttle"."""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return delay, "throttle"
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, "error"
+        return delay, None
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                delay, fault = server._draw()
+                if delay:
+                    time.sleep(delay)
+                url = original_url(self.path)
+                if fault == "throttle":
+                    server._count("throttled")
+                    return self._send(429, {"Retry-After": str(server.retry_after)}, b"")
+                if fault == "error":
+                    server._count("errors")
+                    return self._send(server.error_status, {}, b"")
+                fixture = server.store.load(self.command, url) if url else None
+                if fixture is None:
+                    server._count("missing")
+                    return self._send(404, {"Content-Type": "text/plain"}, f"no fixture for {url}\n".encode())
+                status, headers, body = fixture
+                etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+                if status == 200 and ((etag and self.headers.get("If-None-Match") == etag) or
+                                      (last_modified and self.headers.get("If-Modified-Since") == last_modified)):
+                    server._count("not_modified")
+                    return self._send(304, {k: v for k, v in headers.items() if k in ("ETag", "Last-Modified")}, b"")
+                server._count("served")
+                self._send(status, headers, body)
+
+            def _send(self, status, headers, body):
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt % args)
+
+        return Handler
+
+    def start(self):
+        """Serve on a daemon thread; returns self."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="upstream-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded upstream responses")
+    parser.add_argument("--fixtures", default=os.environ.get("UPSTREAM_FIXTURES", DEFAULT_FIXTURES))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--list", action="store_true", help="list the fixtures and exit")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures)
+    if args.list:
+        for meta in store.entries():
+            print(f"{meta['status']}  {meta['method']:4} {meta['url']}")
+        return 0
+    server = ReplayServer(store, args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                          args.error_status, args.throttle_rate, args.retry_after, args.seed)
+    print(f"Replaying {len(store.entries())} fixtures from {args.fixtures} on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.counts))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
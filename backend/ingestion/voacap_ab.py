@@ -0,0 +1,246 @@
+"""
+In-process A/B harness for the VOACAP engines.
+
+A sampled fraction of live map requests is replayed in the background against
+both voacap_service (served) and voacap_service_orig (reference). Each sample
+records per-engine latency and peak RSS growth plus pixel-difference
+statistics between the two maps, so model changes can be judged on production
+traffic rather than only on the offline benchmark matrix.
+
+The served response is never delayed: sampling is a random() draw and a
+non-blocking submit to a single spawned worker process. When a comparison is
+already queued the sample is dropped.
+
+    VOACAP_AB_RATE=0.02        # fraction of requests to replay (0 = off)
+    VOACAP_AB_DIR=logs/        # where voacap_ab.jsonl / voacap_ab_summary.json go
+
+voacap_ab.jsonl is rotated like the access log: past AB_RECORDS_MAX_BYTES it
+becomes voacap_ab.jsonl.1 (up to AB_RECORDS_BACKUPS old files are kept). The
+summary's latency and RSS means count only runs that produced a map.
+"""
+import os
+import json
+import time
+import zlib
+import random
+import logging
+import threading
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+AB_SAMPLE_RATE = float(os.environ.get("VOACAP_AB_RATE", "0"))
+AB_DIR = os.environ.get("VOACAP_AB_DIR", os.path.join(PROJECT_ROOT, "logs"))
+AB_RECORDS = os.path.join(AB_DIR, "voacap_ab.jsonl")
+AB_SUMMARY = os.path.join(AB_DIR, "voacap_ab_summary.json")
+AB_RECORDS_MAX_BYTES = 10 * 1024 * 1024
+AB_RECORDS_BACKUPS = 2
+MAX_PENDING = 1
+HEADER_SIZE = 122
+ENGINES = ("current", "orig")
+RSS_POLL_S = 0.005
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024
+
+_executor = None
+_pending = 0
+_lock = threading.Lock()
+_summary = None
+
+# --- Worker process -------------------------------------------------------
+
+def _decode_maps(results):
+    """Both zlib streams of a response -> list of (H, W) RGB565 arrays."""
+    maps = []
+    for blob in results:
+        bmp = zlib.decompress(blob)
+        w = int.from_bytes(bmp[18:22], "little", signed=True)
+        h = abs(int.from_bytes(bmp[22:26], "little", signed=True))
+        maps.append(np.frombuffer(bmp, dtype='<u2', count=w * h, offset=HEADER_SIZE).reshape(h, w))
+    return maps
+
+def _rgb(pix):
+    r = ((pix >> 11) & 0x1F).astype(np.float32) * (255.0 / 31.0)
+    g = ((pix >> 5) & 0x3F).astype(np.float32) * (255.0 / 63.0)
+    b = (pix & 0x1F).astype(np.float32) * (255.0 / 31.0)
+    return np.stack([r, g, b], axis=-1)
+
+def pixel_diff(a, b):
+    """Difference statistics between two RGB565 maps of the same shape."""
+    if a.shape != b.shape:
+        return {"error": f"shape {a.shape} != {b.shape}"}
+    abs_err = np.abs(_rgb(a) - _rgb(b)).mean(axis=-1)
+    return {
+        "changed": round(float((a != b).mean()), 5),
+        "mae": round(float(abs_err.mean()), 3),
+        "max": round(float(abs_err.max()), 1),
+    }
+
+def _rss_kb():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * PAGE_KB
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _run_engine(module, query, map_type):
+    """Time one render while a sampler thread tracks peak RSS growth.
+
+    tracemalloc would make the pure-Python reference engine several times
+    slower; polling RSS costs the same for both engines.
+    """
+    # The reference engine memoises whole responses; a hit would time the cache
+    cache = getattr(module, "VOACAP_MAP_CACHE", None)
+    if cache is not None:
+        cache.clear()
+
+    base = _rss_kb()
+    peak = [base]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(RSS_POLL_S):
+            peak[0] = max(peak[0], _rss_kb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t = time.perf_counter()
+    try:
+        results = module.generate_voacap_response(query, map_type)
+    finally:
+        ms = (time.perf_counter() - t) * 1000.0
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], _rss_kb())
+    return results, {"ms": round(ms, 2), "rss_peak_kb": peak[0] - base}
+
+def compare_engines(query, map_type):
+    """Render `query` with both engines and return one comparison record."""
+    logging.disable(logging.INFO)
+    import voacap_service
+    import voacap_service_orig
+
+    record = {"ts": int(time.time()), "map_type": map_type,
+              "query": {k: v[0] for k, v in query.items()}}
+    outputs = {}
+    for name, module in (("current", voacap_service), ("orig", voacap_service_orig)):
+        results, stats = _run_engine(module, query, map_type)
+        record[name] = stats
+        if not results or len(results) != 2:
+            record[name]["error"] = "no map"
+        else:
+            outputs[name] = _decode_maps(results)
+
+    if len(outputs) == 2:
+        record["diff"] = [pixel_diff(a, b) for a, b in zip(outputs["current"], outputs["orig"])]
+    return record
+
+# --- Server side ----------------------------------------------------------
+
+def _load_summary():
+    try:
+        with open(AB_SUMMARY, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _update_summary(summary, record):
+    """Fold one record into running per-map-type aggregates."""
+    s = summary.setdefault(record["map_type"], {"samples": 0, "errors": 0})
+    s["samples"] += 1
+    for name in ENGINES:
+        stats = record.get(name, {})
+        e = s.setdefault(name, {"runs": 0, "ms_mean": 0.0, "ms_max": 0.0, "rss_peak_kb_mean": 0.0})
+        # Failed runs would drag the means towards 0
+        if "ms" not in stats or "error" in stats:
+            continue
+        e["runs"] = e.get("runs", s["samples"] - 1) + 1  # summaries written before runs was kept
+        n = e["runs"]
+        e["ms_mean"] = round(e["ms_mean"] + (stats.get("ms", 0.0) - e["ms_mean"]) / n, 2)
+        e["ms_max"] = max(e["ms_max"], stats.get("ms", 0.0))
+        e["rss_peak_kb_mean"] = round(e["rss_peak_kb_mean"] + (stats.get("rss_peak_kb", 0) - e["rss_peak_kb_mean"]) / n, 1)
+    diff = record.get("diff")
+    if not diff or "error" in diff[0]:
+        s["errors"] += 1
+        return
+    d = s.setdefault("diff", {"compared": 0, "changed_mean": 0.0, "mae_mean": 0.0, "mae_max": 0.0})
+    d["compared"] += 1
+    m = d["compared"]
+    d["changed_mean"] = round(d["changed_mean"] + (diff[0]["changed"] - d["changed_mean"]) / m, 5)
+    d["mae_mean"] = round(d["mae_mean"] + (diff[0]["mae"] - d["mae_mean"]) / m, 3)
+    d["mae_max"] = max(d["mae_max"], diff[0]["mae"])
+
+def _rotate_records():
+    """voacap_ab.jsonl -> .1 -> .2 ..., once it has grown past AB_RECORDS_MAX_BYTES."""
+    try:
+        if os.path.getsize(AB_RECORDS) < AB_RECORDS_MAX_BYTES:
+            return
+    except OSError:
+        return
+    for i in range(AB_RECORDS_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{AB_RECORDS}.{i}"):
+            os.replace(f"{AB_RECORDS}.{i}", f"{AB_RECORDS}.{i + 1}")
+    if AB_RECORDS_BACKUPS > 0:
+        os.replace(AB_RECORDS, f"{AB_RECORDS}.1")
+    else:
+        os.remove(AB_RECORDS)
+
+def _store(record):
+    global _summary
+    with _lock:
+        try:
+            os.makedirs(AB_DIR, exist_ok=True)
+            _rotate_records()
+            with open(AB_RECORDS, "a") as f:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            if _summary is None:
+                _summary = _load_summary()
+            _update_summary(_summary, record)
+            tmp = AB_SUMMARY + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(_summary, f, indent=2)
+            os.replace(tmp, AB_SUMMARY)
+        except OSError as e:
+            logger.warning(f"Failed to store VOACAP A/B record: {e}")
+
+def _done(future):
+    global _pending
+    with _lock:
+        _pending -= 1
+    try:
+        record = future.result()
+    except Exception as e:
+        logger.warning(f"VOACAP A/B comparison failed: {e}")
+        return
+    _store(record)
+    cur, orig = record["current"], record["orig"]
+    logger.info(f"VOACAP A/B {record['map_type']}: current {cur['ms']}ms / orig {orig['ms']}ms, "
+                f"diff {record.get('diff', [{}])[0]}")
+
+def maybe_shadow(query, map_type, rate=None):
+    """Queue a background comparison for a sampled fraction of requests. Never blocks."""
+    global _executor, _pending
+    rate = AB_SAMPLE_RATE if rate is None else rate
+    if rate <= 0 or random.random() >= rate:
+        return False
+    with _lock:
+        if _pending >= MAX_PENDING:
+            return False
+        _pending += 1
+        if _executor is None:
+            # spawn: forking a threaded server can deadlock on held locks
+            _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        future = _executor.submit(compare_engines, {k: list(v) for k, v in query.items()}, map_type)
+    except RuntimeError as e:
+        with _lock:
+            _pending -= 1
+        logger.warning(f"VOACAP A/B submit failed: {e}")
+        return False
+    future.add_done_callback(_done)
+    return True
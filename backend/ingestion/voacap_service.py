@@ -3,8 +3,14 @@ import math
 import time
 import struct
 import zlib
+import json
 import logging
+import threading
 import numpy as np
+try:
+    from ingestion import snapshot_store
+except ImportError:
+    import snapshot_store
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +21,16 @@ MUF_CACHE = np.zeros(501, dtype=np.uint16)
 REL_CACHE = np.zeros(1001, dtype=np.uint16)
 TOA_CACHE = np.zeros(401, dtype=np.uint16)
 
+# Tunable model coefficients (see backend/scripts/calibrate_voacap.py).
+#   path_loss:   per-km path loss term in path_loss_factor
+#   rel_slope / rel_center: logistic mapping of SNR margin to reliability,
+#                           p_rel = 1 / (1 + exp(-rel_slope * (snr - rel_center)))
+MODEL_COEFFS = {
+    'path_loss': 0.000065,
+    'rel_slope': 25.0,
+    'rel_center': 0.70,
+}
+
 # Simple result cache
 VOACAP_MAP_CACHE = {}
 MAX_CACHE_SIZE = 100
@@ -30,16 +46,27 @@ RX_LNG_RADS_GRID = None
 SIN_RX_LATS_GRID = None
 COS_RX_LATS_GRID = None
 
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+COUNTRIES_BMP = os.path.join(DATA_DIR, "processed_data", "map-D-660x330-Countries.bmp")
+TERRAIN_BMP = os.path.join(DATA_DIR, "processed_data", "map-D-660x330-Terrain.bmp")
+MASK_BIN = os.path.join(DATA_DIR, "countries_mask.bin")
+
+# Precomputed asset bundle (see build_asset_bundle). Each array is a plain .npy
+# so it can be memory-mapped read-only and shared between worker processes.
+ASSET_DIR = os.environ.get("VOACAP_ASSET_DIR", os.path.join(DATA_DIR, "voacap_assets"))
+ASSET_VERSION = 1
+ASSET_ARRAYS = [
+    "COUNTRIES_MAP", "TERRAIN_MAP", "COUNTRIES_MASK",
+    "MUF_CACHE", "REL_CACHE", "TOA_CACHE",
+    "RX_LAT_RADS_GRID", "RX_LNG_RADS_GRID", "SIN_RX_LATS_GRID", "COS_RX_LATS_GRID",
+]
+
 def load_base_maps():
     global COUNTRIES_MAP, TERRAIN_MAP, COUNTRIES_MASK
     try:
-        base_dir = os.path.dirname(os.path.dirname(__file__))
-        data_dir = os.path.join(base_dir, "data")
-        processed_data = os.path.join(data_dir, "processed_data")
-        
-        c_path = os.path.join(processed_data, "map-D-660x330-Countries.bmp")
-        t_path = os.path.join(processed_data, "map-D-660x330-Terrain.bmp")
-        mask_path = os.path.join(data_dir, "countries_mask.bin")
+        c_path = COUNTRIES_BMP
+        t_path = TERRAIN_BMP
+        mask_path = MASK_BIN
         
         if os.path.exists(c_path):
             with open(c_path, "rb") as f:
@@ -60,8 +87,6 @@ def load_base_maps():
     except Exception as e:
         logger.error(f"Error loading base maps: {e}")
 
-load_base_maps()
-
 def blend_rgb565_vectorized(fg, bg, alpha):
     """Vectorized blend of RGB565 arrays."""
     # Expand FG
@@ -105,8 +130,15 @@ def interpolate_color_value(val, scale):
     return ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
 
 def precompute_scales():
+    global MUF_CACHE, REL_CACHE, TOA_CACHE
     global RX_LAT_RADS_GRID, RX_LNG_RADS_GRID, SIN_RX_LATS_GRID, COS_RX_LATS_GRID
     
+    # Fresh arrays rather than in-place writes: the module-level caches may be
+    # read-only memory maps from the asset bundle.
+    MUF_CACHE = np.zeros(501, dtype=np.uint16)
+    REL_CACHE = np.zeros(1001, dtype=np.uint16)
+    TOA_CACHE = np.zeros(401, dtype=np.uint16)
+
     m_scale = [(0, 0), (4, 0x4E138A), (9, 0x001EF5), (15, 0x78FBD6), (20, 0x78FA4D), (27, 0xFEFD54), (30, 0xEC6F2D), (35, 0xE93323)]
     r_scale = [(0, 0x666666), (21, 0xEE6766), (40, 0xEEEE44), (60, 0xEEEE44), (83, 0x44CC44), (100, 0x44CC44)]
     t_scale = [(0, 0x44CC44), (5, 0x44CC44), (15, 0xEEEE44), (25, 0xEE6766), (40, 0x666666)]
@@ -126,7 +158,87 @@ def precompute_scales():
     SIN_RX_LATS_GRID = np.sin(RX_LAT_RADS_GRID)
     COS_RX_LATS_GRID = np.cos(RX_LAT_RADS_GRID)
 
-precompute_scales()
+def _asset_sources():
+    """Stamp (size, mtime_ns) of every source file the bundle is derived from."""
+    stamps = {}
+    for path in [COUNTRIES_BMP, TERRAIN_BMP, MASK_BIN]:
+        try:
+            st = os.stat(path)
+            stamps[os.path.basename(path)] = [st.st_size, st.st_mtime_ns]
+        except OSError:
+            stamps[os.path.basename(path)] = None
+    return stamps
+
+def build_asset_bundle(asset_dir=None):
+    """
+    Compute base maps, colour caches and trig grids once and write them as .npy
+    files plus a manifest. Arrays missing from the sources (e.g. no Terrain BMP)
+    are simply left out of the bundle.
+    """
+    asset_dir = asset_dir or ASSET_DIR
+    load_base_maps()
+    precompute_scales()
+    os.makedirs(asset_dir, exist_ok=True)
+
+    g = globals()
+    written = []
+    for name in ASSET_ARRAYS:
+        arr = g.get(name)
+        if arr is None:
+            continue
+        final_path = os.path.join(asset_dir, f"{name}.npy")
+        tmp_path = final_path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(tmp_path, final_path)
+        written.append(name)
+
+    manifest = {"version": ASSET_VERSION, "map": [MAP_W, MAP_H],
+                "sources": _asset_sources(), "arrays": written}
+    tmp_manifest = os.path.join(asset_dir, f"manifest.json.{os.getpid()}.tmp")
+    with open(tmp_manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, os.path.join(asset_dir, "manifest.json"))
+    logger.info(f"Wrote VOACAP asset bundle ({len(written)} arrays) to {asset_dir}")
+    return written
+
+def load_asset_bundle(asset_dir=None):
+    """
+    Memory-map a previously built bundle. Returns False (leaving globals
+    untouched) when the bundle is missing or its sources have changed.
+    """
+    asset_dir = asset_dir or ASSET_DIR
+    manifest_path = os.path.join(asset_dir, "manifest.json")
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    if manifest.get("version") != ASSET_VERSION or manifest.get("map") != [MAP_W, MAP_H]:
+        logger.info("VOACAP asset bundle is from a different version, ignoring")
+        return False
+    if manifest.get("sources") != _asset_sources():
+        logger.info("VOACAP asset bundle is stale, ignoring")
+        return False
+
+    loaded = {}
+    try:
+        for name in manifest.get("arrays", []):
+            arr = np.load(os.path.join(asset_dir, f"{name}.npy"), mmap_mode='r')
+            # Plain ndarray view over the shared mapping (avoids memmap subclass
+            # propagation into every derived array).
+            loaded[name] = arr.view(np.ndarray)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to load VOACAP asset bundle: {e}")
+        return False
+
+    globals().update(loaded)
+    return True
+
+if not load_asset_bundle():
+    load_base_maps()
+    precompute_scales()
 
 def create_bmp_565_header(w, h):
     core_size = 14
@@ -146,23 +258,24 @@ def create_bmp_565_header(w, h):
     return header
 
 
-def get_ssn():
-    try:
-        base_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-        ssn_path = os.path.join(base_data, "processed_data", "ssn", "ssn-31.txt")
-        if os.path.exists(ssn_path):
-            with open(ssn_path, "r") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip()]
-                if lines:
-                    last_line = lines[-1]
-                    parts = last_line.split()
-                    if len(parts) >= 4:
-                        return float(parts[3])
-    except: pass
+def get_ssn(snapshot=None):
+    snapshot = snapshot or snapshot_store.current()
+    rows = snapshot.parsed("ssn/ssn-31.txt", ())
+    if rows and len(rows[-1]) >= 4:
+        return rows[-1][3]
     return 70.0
 
-def get_current_space_wx():
-    """Read current space weather from processed data files"""
+# (generation, swx) of the last get_current_space_wx() call
+_SPACE_WX = (None, None)
+
+def get_current_space_wx(snapshot=None):
+    """Current space weather from the latest processed data snapshot (parsed once per generation)"""
+    global _SPACE_WX
+    snapshot = snapshot or snapshot_store.current()
+    generation, swx = _SPACE_WX
+    if generation == snapshot.generation:
+        return dict(swx)
+
     swx = {
         'kp': 3.0,
         'sw_speed': 400.0,
@@ -171,51 +284,33 @@ def get_current_space_wx():
     }
     
     try:
-        base_data = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-        processed = os.path.join(base_data, "processed_data")
-        
         # 1. SSN
-        ssn_val = get_ssn()
-        swx['ssn'] = ssn_val
+        swx['ssn'] = get_ssn(snapshot)
 
         # 2. Kp Index (geomag/kindex.txt) - last line is usually prediction or latest
-        kp_path = os.path.join(processed, "geomag", "kindex.txt")
-        if os.path.exists(kp_path):
-             with open(kp_path, "r") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip()]
-                if lines:
-                    # History is 56 lines, Forecast is 16. The "current" is roughly at end of history
-                    # For simplicity, we take the last value of history (roughly 'now') 
-                    # OR just the very last value if we trust the prediction for "now"
-                    # Let's take the 56th value if available (latest observed), else last
-                    idx = 55 if len(lines) > 55 else -1
-                    swx['kp'] = float(lines[idx])
+        kp = snapshot.parsed("geomag/kindex.txt", ())
+        if kp:
+            # History is 56 lines, Forecast is 16. The "current" is roughly at end of history
+            # Let's take the 56th value if available (latest observed), else last
+            idx = 55 if len(kp) > 55 else -1
+            swx['kp'] = kp[idx][0]
 
         # 3. Solar Wind Speed (solar-wind/swind-24hr.txt) - format: unix density speed
-        sw_path = os.path.join(processed, "solar-wind", "swind-24hr.txt")
-        if os.path.exists(sw_path):
-            with open(sw_path, "r") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip()]
-                if lines:
-                    # Last line is most recent
-                    parts = lines[-1].split()
-                    if len(parts) >= 3:
-                        swx['sw_speed'] = float(parts[2])
+        sw = snapshot.parsed("solar-wind/swind-24hr.txt", ())
+        if sw and len(sw[-1]) >= 3:
+            # Last line is most recent
+            swx['sw_speed'] = sw[-1][2]
 
         # 4. Bz (Bz/Bz.txt) - format: unix bx by bz bt
-        bz_path = os.path.join(processed, "Bz", "Bz.txt")
-        if os.path.exists(bz_path):
-            with open(bz_path, "r") as f:
-                lines = [l.strip() for l in f.readlines() if l.strip() and not l.startswith("#")]
-                if lines:
-                    parts = lines[-1].split()
-                    if len(parts) >= 4:
-                        swx['bz'] = float(parts[3])
+        bz = snapshot.parsed("Bz/Bz.txt", ())
+        if bz and len(bz[-1]) >= 4:
+            swx['bz'] = bz[-1][3]
 
     except Exception as e:
         logger.error(f"Error reading space weather: {e}")
 
-    return swx
+    _SPACE_WX = (snapshot.generation, swx)
+    return dict(swx)
 
 def get_solar_pos(year, month, day, utc):
     days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
@@ -358,8 +453,7 @@ def calculate_point_propagation_core(tx_lat_rad, tx_lng_rad, rlat_rad, rlng_rad,
         reflection_eff = math.pow(math.cos(math.pi/2.0 - ele_angle), 0.3)
         abs_p = math.exp(-5.0 * terminator_h * zenith_layer * (10.0 / m_mhz)**2.2)
         # Tuned path loss from 0.00006 to 0.000065
-        # Tuned path loss from 0.00006 to 0.000065
-        path_loss_factor = 1.0 / (1.0 + 0.000065 * dist_km * (1.0 / max(0.2, combo_f)))
+        path_loss_factor = 1.0 / (1.0 + MODEL_COEFFS['path_loss'] * dist_km * (1.0 / max(0.2, combo_f)))
 
         snr_margin = (p_muf / m_mhz) * res_total * abs_p * reflection_eff * path_loss_factor * pca_loss
 
@@ -375,7 +469,7 @@ def calculate_point_propagation_core(tx_lat_rad, tx_lng_rad, rlat_rad, rlng_rad,
             sw_penalty = 0.8 if mag_lat_abs > 70 else 1.0
             snr_margin *= sw_penalty
 
-        exponent = -25.0 * (snr_margin - 0.70)
+        exponent = -MODEL_COEFFS['rel_slope'] * (snr_margin - MODEL_COEFFS['rel_center'])
         p_rel = 1.0 / (1.0 + math.exp(max(-50, min(50, exponent))))
         sum_rel += p_rel * sample_weights[i]
         
@@ -558,7 +652,7 @@ def calculate_grid_propagation_vectorized(tx_lat_rad, tx_lng_rad, m_mhz, toa_par
         # Let's restore a heavily damped ducting factor for now.
         g_duct = 0.05 # Conservative baseline
         
-        path_loss_factor = 1.0 / (1.0 + 0.000065 * dist_km * (1.0 / np.maximum(0.2, combo_f)))
+        path_loss_factor = 1.0 / (1.0 + MODEL_COEFFS['path_loss'] * dist_km * (1.0 / np.maximum(0.2, combo_f)))
         
         # Main SNR Margin Calculation
         snr_margin = (p_muf / m_mhz) * res_total * abs_p * reflection_eff * path_loss_factor * pca_loss
@@ -575,34 +669,51 @@ def calculate_grid_propagation_vectorized(tx_lat_rad, tx_lng_rad, m_mhz, toa_par
             sw_penalty = np.where(mag_lat_abs > 70, 0.8, 1.0)
             snr_margin *= sw_penalty
 
-        exponent = -25.0 * (snr_margin - 0.70)
+        exponent = -MODEL_COEFFS['rel_slope'] * (snr_margin - MODEL_COEFFS['rel_center'])
         exponent = np.clip(exponent, -50, 50) 
         p_rel = 1.0 / (1.0 + np.exp(exponent))
         sum_rel += p_rel * sample_weights[i]
 
     return sum_muf, sum_rel, dist_km
 
-def generate_voacap_response(query, map_type="REL"):
+def parse_voacap_query(query):
+    """Extract the HamClock VOACAP request parameters (parse_qs style dict) with defaults."""
+    now = time.gmtime()
+    return {
+        'width': int(query.get('WIDTH', [660])[0]),
+        'height': int(query.get('HEIGHT', [330])[0]),
+        'tx_lat': float(query.get('TXLAT', [0])[0]),
+        'tx_lng': float(query.get('TXLNG', [0])[0]),
+        'mhz': float(query.get('MHZ', [14.0])[0]),
+        'toa': float(query.get('TOA', [3.0])[0]),
+        'year': int(query.get('YEAR', [now.tm_year])[0]),
+        'month': int(query.get('MONTH', [now.tm_mon])[0]),
+        'utc': float(query.get('UTC', [now.tm_hour])[0]),
+        'path': int(query.get('PATH', [0])[0]),
+    }
+
+def generate_voacap_response(query, map_type="REL", space_wx=None):
     try:
         t_start = time.time()
         
-        target_w = int(query.get('WIDTH', [660])[0])
-        target_h = int(query.get('HEIGHT', [330])[0])
+        params = parse_voacap_query(query)
+        target_w = params['width']
+        target_h = params['height']
         
-        tx_lat_d = float(query.get('TXLAT', [0])[0])
-        tx_lng_d = float(query.get('TXLNG', [0])[0])
-        m_mhz = float(query.get('MHZ', [14.0])[0])
-        toa_param = float(query.get('TOA', [3.0])[0])
-        year = int(query.get('YEAR', [time.gmtime().tm_year])[0])
-        month = int(query.get('MONTH', [time.gmtime().tm_mon])[0])
-        utc = float(query.get('UTC', [time.gmtime().tm_hour])[0])
-        path = int(query.get('PATH', [0])[0])
+        tx_lat_d = params['tx_lat']
+        tx_lng_d = params['tx_lng']
+        m_mhz = params['mhz']
+        toa_param = params['toa']
+        year = params['year']
+        month = params['month']
+        utc = params['utc']
+        path = params['path']
         
         is_muf = (m_mhz == 0) or (map_type == "MUF")
         is_toa = (map_type == "TOA")
         
-        # Enhanced Data Ingestion
-        swx = get_current_space_wx()
+        # Enhanced Data Ingestion (callers may pin space weather, e.g. calibration)
+        swx = space_wx if space_wx is not None else get_current_space_wx()
         logger.info(f"VOACAP SpcWx: {swx}")
         
         ssn = swx['ssn']
@@ -703,3 +814,103 @@ def generate_voacap_response(query, map_type="REL"):
     except Exception as e:
         logger.error(f"Error in VOACAP service: {e}", exc_info=True)
         return None
+
+# Raw (quantized) export
+#
+# Layout, all little-endian, whole payload zlib-compressed:
+#   magic "VCRW", version u8, nfields u8, width u16, height u16,
+#   lat0 f32, lng0 f32, dlat f32, dlng f32        (pixel (x, y) is at lat0 + y*dlat, lng0 + x*dlng)
+#   per field: name 4s, dtype u8 (1=u8, 2=u16), pad u8, scale f32, offset f32
+#   then each field's pixels row-major, top row (lat0) first.
+# Physical value = raw * scale + offset.
+RAW_MAGIC = b"VCRW"
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct('<4sBBHHffff')
+RAW_FIELD = struct.Struct('<4sBBff')
+RAW_DTYPES = {1: np.dtype('<u1'), 2: np.dtype('<u2')}
+# name, dtype code, scale, offset
+RAW_FIELDS = [
+    (b"REL\0", 1, 1.0 / 255.0, 0.0),   # reliability 0..1
+    (b"MUF\0", 2, 0.01, 0.0),          # MHz, 10 kHz steps
+]
+VOACAP_RAW_CACHE = {}
+_raw_cache_lock = threading.Lock()  # raw exports run on concurrent worker threads
+
+def encode_voacap_raw(fields, width, height):
+    """Pack float grids {b"REL\0": arr, ...} into the compressed raw format."""
+    out = bytearray(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, len(RAW_FIELDS), width, height,
+                                    90.0, -180.0, -180.0 / height, 360.0 / width))
+    for name, code, scale, offset in RAW_FIELDS:
+        out += RAW_FIELD.pack(name, code, 0, scale, offset)
+    for name, code, scale, offset in RAW_FIELDS:
+        dt = RAW_DTYPES[code]
+        q = np.rint((fields[name] - offset) / scale)
+        q = np.clip(q, 0, np.iinfo(dt).max).astype(dt)
+        out += q.tobytes()
+    return zlib.compress(bytes(out))
+
+def decode_voacap_raw(blob):
+    """Inverse of encode_voacap_raw; returns (header dict, {name: float32 array})."""
+    data = zlib.decompress(blob)
+    magic, version, nfields, w, h, lat0, lng0, dlat, dlng = RAW_HEADER.unpack_from(data, 0)
+    if magic != RAW_MAGIC or version != RAW_VERSION:
+        raise ValueError(f"Not a VOACAP raw export (magic={magic!r}, version={version})")
+    pos = RAW_HEADER.size
+    specs = []
+    for _ in range(nfields):
+        specs.append(RAW_FIELD.unpack_from(data, pos))
+        pos += RAW_FIELD.size
+    fields = {}
+    for name, code, _, scale, offset in specs:
+        dt = RAW_DTYPES[code]
+        n = w * h * dt.itemsize
+        raw = np.frombuffer(data, dtype=dt, count=w * h, offset=pos).reshape(h, w)
+        fields[name.rstrip(b"\0").decode()] = raw.astype(np.float32) * scale + offset
+        pos += n
+    header = {'width': w, 'height': h, 'lat0': lat0, 'lng0': lng0, 'dlat': dlat, 'dlng': dlng}
+    return header, fields
+
+def generate_voacap_raw(query):
+    """
+    Return the unblended REL/MUF grids for a HamClock VOACAP query in the
+    compressed quantized format above. Results are cached like the maps.
+    """
+    try:
+        t_start = time.time()
+        params = parse_voacap_query(query)
+        snapshot = snapshot_store.current()
+        swx = get_current_space_wx(snapshot)
+
+        # Space weather only changes with the snapshot generation
+        key = tuple(sorted(params.items())) + (snapshot.generation,)
+        cached = VOACAP_RAW_CACHE.get(key)
+        if cached is not None:
+            return cached
+
+        s_dec_rad, s_lng_rad = get_solar_pos(params['year'], params['month'], 15, params['utc'])
+        muf_base = 5.0 + 0.1 * swx['ssn']
+        grid_muf, grid_rel, _ = calculate_grid_propagation_vectorized(
+            math.radians(params['tx_lat']), math.radians(params['tx_lng']),
+            params['mhz'], params['toa'], s_dec_rad, s_lng_rad, muf_base,
+            path=params['path'], space_wx=swx
+        )
+
+        target_w, target_h = params['width'], params['height']
+        if target_w != MAP_W or target_h != MAP_H:
+            row_ind = (np.arange(target_h) * MAP_H // target_h).astype(int)
+            col_ind = (np.arange(target_w) * MAP_W // target_w).astype(int)
+            grid_rel = grid_rel[row_ind[:, None], col_ind]
+            grid_muf = grid_muf[row_ind[:, None], col_ind]
+
+        blob = encode_voacap_raw({b"REL\0": grid_rel, b"MUF\0": grid_muf}, target_w, target_h)
+
+        with _raw_cache_lock:
+            if key not in VOACAP_RAW_CACHE and len(VOACAP_RAW_CACHE) >= MAX_CACHE_SIZE:
+                VOACAP_RAW_CACHE.pop(next(iter(VOACAP_RAW_CACHE)))
+            VOACAP_RAW_CACHE[key] = blob
+
+        logger.info(f"VOACAP raw export took {time.time()-t_start:.3f}s ({len(blob)} bytes)")
+        return blob
+    except Exception as e:
+        logger.error(f"Error in VOACAP raw export: {e}", exc_info=True)
+        return None
@@ -1,11 +1,13 @@
-import requests
 import os
-import time
 import logging
 import json
 from datetime import datetime
 from timezonefinder import TimezoneFinder
 import pytz
+try:
+    from ingestion import upstream
+except ImportError:
+    import upstream
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +21,15 @@ CACHE_DIR = os.path.join(BASE_DIR, "data", "processed_data", "worldwx")
 CACHE_FILE = os.path.join(CACHE_DIR, "grid_cache.json")
 STATE_FILE = os.path.join(CACHE_DIR, "fetch_state.json")
 
+_timezone_finder = None
+
+def get_timezone_finder():
+    """Shared TimezoneFinder; building one per grid point reloaded the polygon index each time."""
+    global _timezone_finder
+    if _timezone_finder is None:
+        _timezone_finder = TimezoneFinder()
+    return _timezone_finder
+
 def get_grid_coords():
     """Generate the list of coordinates for the HamClock weather grid."""
     coords = []
@@ -54,7 +65,7 @@ def fetch_batch_weather(coords_batch):
     }
     
     try:
-        resp = requests.get(url, params=params, timeout=30)
+        resp = upstream.fetch(url, params=params, timeout=30)
         if resp.status_code == 429:
             logger.error("429 Client Error: Too Many Requests for Open-Meteo. Throttling active.")
             return None
@@ -146,7 +157,6 @@ def generate_weather_grid():
             for p in points:
                 key = f"{p['lat']},{p['lng']}"
                 cache[key] = p
-        time.sleep(2) # Be very nice to Open-Meteo
         
     save_cache(cache)
     
@@ -172,7 +182,7 @@ def generate_weather_grid():
             
             # Use TimezoneFinder for accurate offset if not in cache
             try:
-                tf = TimezoneFinder()
+                tf = get_timezone_finder()
                 tz_name = tf.timezone_at(lng=lng, lat=lat)
                 if not tz_name:
                     # Fallback for coastal points
@@ -1,4 +1,3 @@
-import requests
 import os
 import json
 import logging
@@ -6,6 +5,10 @@ import time
 from datetime import datetime
 from timezonefinder import TimezoneFinder
 import pytz
+try:
+    from ingestion import snapshot_store, upstream
+except ImportError:
+    import snapshot_store, upstream
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,20 @@ logger = logging.getLogger(__name__)
 
 BASE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 WEATHER_DATA_DIR = os.path.join(BASE_DATA_DIR, "processed_data", "weather")
+# Longest a /wx.pl request waits for an Open-Meteo token and slot (seconds)
+OPEN_METEO_WAIT = 1.0
+
+_timezone_finder = None
+
+def get_timezone_finder():
+    """
+    Shared TimezoneFinder. Building one loads the timezone polygon index, so
+    do it once (the prefork master does it before forking so workers share it).
+    """
+    global _timezone_finder
+    if _timezone_finder is None:
+        _timezone_finder = TimezoneFinder()
+    return _timezone_finder
 
 def fetch_weather(lat, lng):
     """
@@ -40,7 +57,7 @@ def fetch_weather(lat, lng):
     try:
         # Using wttr.in format that provides JSON
         url = f"https://wttr.in/{lat},{lng}?format=j1"
-        resp = requests.get(url, timeout=10)
+        resp = upstream.fetch(url, timeout=10)
         resp.raise_for_status()
         data = resp.json()
         
@@ -54,7 +71,9 @@ def fetch_weather(lat, lng):
         try:
             # Fallback to Open-Meteo
             url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lng}&current=temperature_2m,relative_humidity_2m,wind_speed_10m,wind_direction_10m,pressure_msl,weather_code&timezone=GMT"
-            resp = requests.get(url, timeout=10)
+            # Shares the host's limits with the weather grid ingestion: rather than
+            # queue behind a grid refresh, give up quickly and use the local grid
+            resp = upstream.fetch(url, timeout=10, retries=0, wait=OPEN_METEO_WAIT)
             resp.raise_for_status()
             om_data = resp.json()
             
@@ -90,33 +109,25 @@ def fetch_weather(lat, lng):
 def fetch_from_grid(lat, lng):
     """Fallback: Find nearest point in local worldwx/wx.txt grid."""
     try:
-        grid_file = os.path.join(BASE_DATA_DIR, "processed_data", "worldwx", "wx.txt")
-        if not os.path.exists(grid_file):
+        rows = snapshot_store.current().parsed("worldwx/wx.txt")
+        if not rows:
             return None
             
         best_dist = float('inf')
         best_p = None
         
-        with open(grid_file, 'r') as f:
-            for line in f:
-                if line.startswith('#') or not line.strip():
-                    continue
-                parts = line.split()
-                if len(parts) >= 9:
-                    try:
-                        p_lat = float(parts[0])
-                        p_lng = float(parts[1])
-                        dist = (lat - p_lat)**2 + (lng - p_lng)**2
-                        if dist < best_dist:
-                            best_dist = dist
-                            best_p = {
-                                'temp': parts[2], 'hum': parts[3],
-                                'wind_spd': parts[4], 'wind_dir': parts[5],
-                                'press': parts[6], 'cond': parts[7], 'tz': parts[8]
-                            }
-                        if dist == 0: break # Exact match
-                    except (ValueError, IndexError):
-                        continue
+        for p_lat, p_lng, parts in rows:
+            if len(parts) < 9:
+                continue  # needs the TZ column
+            dist = (lat - p_lat)**2 + (lng - p_lng)**2
+            if dist < best_dist:
+                best_dist = dist
+                best_p = {
+                    'temp': parts[2], 'hum': parts[3],
+                    'wind_spd': parts[4], 'wind_dir': parts[5],
+                    'press': parts[6], 'cond': parts[7], 'tz': parts[8]
+                }
+            if dist == 0: break # Exact match
         
         if best_p:
             # Map grid condition back to wttr.in-like structure (very simplified)
@@ -151,11 +162,15 @@ def code_to_desc(code):
          95: "Thunderstorm"}
     return m.get(code, "Clear")
 
+# (generation, text) of the last prevailing stats computed from the grid
+_PREVAILING = (None, None)
+
 def get_prevailing_stats():
     """
     Fetches global weather summary or aggregates from wttr.in.
     Returns string format for HamClock.
     """
+    global _PREVAILING
     try:
         # For prevailing stats, HamClock originally might have aggregated its grid.
         # But if the user wants "via wttr.in", we can try to get a global summary
@@ -166,27 +181,25 @@ def get_prevailing_stats():
         # Given the 0% parity in worldwx/wx.txt, let's first ensure we aggregate the grid correctly
         # but also provide a way to hook into wttr.in if a specific summary is needed.
         
-        grid_file = os.path.join(BASE_DATA_DIR, "processed_data", "worldwx", "wx.txt")
-        if not os.path.exists(grid_file):
-            logger.warning(f"Grid file {grid_file} not found for prevailing stats")
+        snapshot = snapshot_store.current()
+        rows = snapshot.parsed("worldwx/wx.txt")
+        if not rows:
+            logger.warning("Grid worldwx/wx.txt not available for prevailing stats")
             return "No data available"
+        if _PREVAILING[0] == snapshot.generation:
+            return _PREVAILING[1]
 
         temps = []
         conditions = {}
         
-        with open(grid_file, 'r') as f:
-            for line in f:
-                if line.startswith('#') or not line.strip():
-                    continue
-                parts = line.split()
-                if len(parts) >= 8:
-                    try:
-                        temp = float(parts[2])
-                        cond = parts[7]
-                        temps.append(temp)
-                        conditions[cond] = conditions.get(cond, 0) + 1
-                    except (ValueError, IndexError):
-                        continue
+        for _, _, parts in rows:
+            try:
+                temp = float(parts[2])
+                cond = parts[7]
+                temps.append(temp)
+                conditions[cond] = conditions.get(cond, 0) + 1
+            except ValueError:
+                continue
         
         if not temps:
             return "No valid data in grid"
@@ -201,7 +214,9 @@ def get_prevailing_stats():
         # Format matching what HamClock might expect or common summary format
         # Note: We need to verify if the client expects a specific label-value format.
         # Based on the handle_word_wx handler, it's just raw text.
-        return f"MinTemp: {min_temp:.1f}C\nMaxTemp: {max_temp:.1f}C\nAvgTemp: {avg_temp:.1f}C\nPrevailing: {prevailing_cond}"
+        stats = f"MinTemp: {min_temp:.1f}C\nMaxTemp: {max_temp:.1f}C\nAvgTemp: {avg_temp:.1f}C\nPrevailing: {prevailing_cond}"
+        _PREVAILING = (snapshot.generation, stats)
+        return stats
     except Exception as e:
         logger.error(f"Error calculating prevailing stats: {e}")
         return "Error calculating stats"
@@ -260,7 +275,7 @@ def format_for_hamclock(data, lat, lng):
         
         # Calculate timezone offset
         try:
-            tf = TimezoneFinder()
+            tf = get_timezone_finder()
             tz_name = tf.timezone_at(lng=lng, lat=lat)
             if not tz_name:
                 # Fallback for coastal points
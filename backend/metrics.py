@@ -0,0 +1,317 @@
+"""
+In-process request and service metrics for the backend.
+
+Recording is lock-free: every thread writes to its own shard (plain dicts
+reached through a threading.local), so the common path is a dict update
+and a bisect, a few microseconds. Shards are only walked when /metrics is
+scraped; shards of threads that have exited are folded into a retired
+shard so per-connection threads don't accumulate.
+
+Exposed by the server at /metrics (Prometheus text format) and
+/metrics.json. In prefork mode every worker also publishes its totals to a
+shared directory (see share()) and a scrape merges all workers.
+"""
+import os
+import glob
+import time
+import pickle
+import logging
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (prometheus type, help)
+METRICS = {
+    "hamclock_requests_total": ("counter", "Requests by route and status"),
+    "hamclock_request_errors_total": ("counter", "Requests answered with status >= 500"),
+    "hamclock_response_bytes_total": ("counter", "Response body bytes by route"),
+    "hamclock_requests_in_flight": ("gauge", "Requests currently being handled"),
+    "hamclock_request_duration_seconds": ("histogram", "Request latency by route"),
+    "hamclock_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "hamclock_service_calls_total": ("counter", "Service function calls"),
+    "hamclock_service_errors_total": ("counter", "Service function calls that raised"),
+    "hamclock_service_duration_seconds": ("histogram", "Service function latency"),
+}
+
+
+class _Shard:
+    __slots__ = ("thread", "counters", "hists")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}   # (name, labels) -> number
+        self.hists = {}      # (name, labels) -> [bucket counts, sum, count]
+
+
+_local = threading.local()
+_shards = []
+_retired = _Shard(None)
+_registry_lock = threading.Lock()
+_started = time.time()
+_shared = None  # (directory, this worker's file) once share() is called
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_INTERVAL = 5.0
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        shard = _local.shard = _Shard(threading.current_thread())
+        with _registry_lock:  # once per thread
+            _shards.append(shard)
+        return shard
+
+
+def inc(name, labels=(), value=1):
+    counters = _shard().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, seconds):
+    hists = _shard().hists
+    key = (name, labels)
+    h = hists.get(key)
+    if h is None:
+        h = hists[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+    h[0][bisect_left(BUCKETS, seconds)] += 1
+    h[1] += seconds
+    h[2] += 1
+
+
+# --- Request / cache / service helpers -------------------------------------
+
+def request_started(route):
+    inc("hamclock_requests_in_flight", (("route", route),))
+
+
+def request_finished(route):
+    inc("hamclock_requests_in_flight", (("route", route),), -1)
+
+
+def observe_request(route, status, nbytes, seconds, cache=None):
+    labels = (("route", route),)
+    inc("hamclock_requests_total", (("route", route), ("status", str(status))))
+    if status is not None and status >= 500:
+        inc("hamclock_request_errors_total", labels)
+    if nbytes:
+        inc("hamclock_response_bytes_total", labels, nbytes)
+    observe("hamclock_request_duration_seconds", labels, seconds)
+    if cache:
+        record_cache("static", cache)
+
+
+def record_cache(cache, result):
+    inc("hamclock_cache_requests_total", (("cache", cache), ("result", result)))
+
+
+def instrument(name, fn):
+    """Wrap a service function with call/error counters and a latency histogram."""
+    labels = (("function", name),)
+
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            inc("hamclock_service_errors_total", labels)
+            raise
+        finally:
+            inc("hamclock_service_calls_total", labels)
+            observe("hamclock_service_duration_seconds", labels, time.perf_counter() - t)
+
+    wrapper.__name__ = getattr(fn, "__name__", name)
+    wrapper.__doc__ = getattr(fn, "__doc__", None)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+# --- Aggregation and exposition ---------------------------------------------
+
+def _merge(dst_counters, dst_hists, shard):
+    # list() of a dict's items is taken without releasing the GIL, so a shard
+    # can be read while its owner thread keeps writing
+    for key, value in list(shard.counters.items()):
+        dst_counters[key] = dst_counters.get(key, 0) + value
+    for key, (counts, total, n) in list(shard.hists.items()):
+        h = dst_hists.get(key)
+        if h is None:
+            h = dst_hists[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        for i, c in enumerate(list(counts)):
+            h[0][i] += c
+        h[1] += total
+        h[2] += n
+
+
+def collect_local():
+    """Sum this process's shards -> (counters, histograms)."""
+    with _registry_lock:
+        live = []
+        for shard in _shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                _merge(_retired.counters, _retired.hists, shard)
+        _shards[:] = live
+        shards = [_retired] + live
+        counters, hists = {}, {}
+        for shard in shards:
+            _merge(counters, hists, shard)
+    return counters, hists
+
+
+def collect():
+    """Totals for this process plus, when shared, the other workers' last published totals."""
+    counters, hists = collect_local()
+    if _shared is None:
+        return counters, hists
+    directory, own = _shared
+    total = _Shard(None)
+    total.counters, total.hists = counters, hists
+    for path in glob.glob(os.path.join(directory, "metrics.*.pickle")):
+        if path == own:
+            continue
+        peer = _Shard(None)
+        try:
+            with open(path, "rb") as f:
+                peer.counters, peer.hists = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue
+        _merge(total.counters, total.hists, peer)
+    return total.counters, total.hists
+
+
+def publish():
+    """Write this worker's totals for its peers (atomic replace)."""
+    directory, own = _shared
+    tmp = f"{own}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(collect_local(), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, own)
+
+
+def share(directory, worker, interval=PUBLISH_INTERVAL):
+    """
+    Prefork mode: publish this worker's totals to `directory` every
+    `interval` seconds and merge peers' totals into scrapes.
+    """
+    global _shared
+    os.makedirs(directory, exist_ok=True)
+    _shared = (directory, os.path.join(directory, f"metrics.{worker}.pickle"))
+
+    def loop():
+        while True:
+            try:
+                publish()
+            except OSError as e:
+                logger.warning(f"Failed to publish metrics: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=loop, name="metrics-publish", daemon=True).start()
+
+
+def _labels_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                          for k, v in items) + "}"
+
+
+def render_prometheus():
+    counters, hists = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (n, labels), (counts, total, count) in sorted(hists.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(BUCKETS + (float("inf"),), counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels_text(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels_text(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels_text(labels)} {count}")
+        else:
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_labels_text(labels)} {value}")
+    lines.append("# TYPE hamclock_uptime_seconds gauge")
+    lines.append(f"hamclock_uptime_seconds {time.time() - _started:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(counts, count, q):
+    """Upper bucket bound containing quantile q (Prometheus-style estimate)."""
+    if not count:
+        return None
+    rank = q * count
+    cumulative = 0
+    for bound, c in zip(BUCKETS + (float("inf"),), counts):
+        cumulative += c
+        if cumulative >= rank:
+            return bound if bound != float("inf") else BUCKETS[-1]
+    return BUCKETS[-1]
+
+
+def _latency_summary(h):
+    counts, total, count = h
+    return {
+        "count": count,
+        "mean_ms": round(total / count * 1000.0, 3) if count else None,
+        "p50_ms": _ms(_quantile(counts, count, 0.50)),
+        "p95_ms": _ms(_quantile(counts, count, 0.95)),
+        "p99_ms": _ms(_quantile(counts, count, 0.99)),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000.0, 3)
+
+
+def render_json():
+    """Per-route, per-service and per-cache summary as a dict."""
+    counters, hists = collect()
+    routes, services, caches = {}, {}, {}
+
+    def route_entry(route):
+        return routes.setdefault(route, {"requests": 0, "errors": 0, "bytes_out": 0, "in_flight": 0, "status": {}})
+
+    for (name, labels), value in counters.items():
+        d = dict(labels)
+        if name == "hamclock_requests_total":
+            r = route_entry(d["route"])
+            r["requests"] += value
+            r["status"][d["status"]] = r["status"].get(d["status"], 0) + value
+        elif name == "hamclock_request_errors_total":
+            route_entry(d["route"])["errors"] += value
+        elif name == "hamclock_response_bytes_total":
+            route_entry(d["route"])["bytes_out"] += value
+        elif name == "hamclock_requests_in_flight":
+            route_entry(d["route"])["in_flight"] += value
+        elif name == "hamclock_cache_requests_total":
+            caches.setdefault(d["cache"], {})[d["result"]] = value
+        elif name in ("hamclock_service_calls_total", "hamclock_service_errors_total"):
+            s = services.setdefault(d["function"], {"calls": 0, "errors": 0})
+            s["calls" if name == "hamclock_service_calls_total" else "errors"] += value
+
+    for (name, labels), h in hists.items():
+        d = dict(labels)
+        if name == "hamclock_request_duration_seconds":
+            route_entry(d["route"])["latency"] = _latency_summary(h)
+        elif name == "hamclock_service_duration_seconds":
+            services.setdefault(d["function"], {"calls": 0, "errors": 0})["latency"] = _latency_summary(h)
+
+    for c in caches.values():
+        lookups = sum(c.values())
+        c["hit_ratio"] = round(c.get("hit", 0) / lookups, 4) if lookups else None
+
+    return {"uptime_s": round(time.time() - _started), "routes": routes, "services": services, "caches": caches}
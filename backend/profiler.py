@@ -0,0 +1,115 @@
+"""
+Sampled request profiling for the backend.
+
+A sampled fraction of requests to selected routes runs under cProfile (and
+optionally between two tracemalloc snapshots). Dumps go to debug/profiles/
+(see RULES.md), one directory per route:
+
+    debug/profiles/<route>/<timestamp>.pstats       cProfile stats
+    debug/profiles/<route>/<timestamp>.alloc.txt    top allocation deltas
+
+    PROFILE_ROUTES=/fetchVOACAPArea.pl,/SDO/   route names to profile ("*" = all)
+    PROFILE_RATE=0.1                           fraction of matching requests profiled
+    PROFILE_TRACEMALLOC=0                      1 to also record allocations
+    PROFILE_DIR=debug/profiles
+
+The same settings can be changed at runtime through /admin/profile (see
+server.py). Only one request is profiled at a time: cProfile and tracemalloc
+are process-wide, so concurrent requests to the route run unprofiled.
+
+Aggregate dumps with backend/scripts/profile_report.py.
+"""
+import os
+import time
+import random
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(PROJECT_ROOT, "debug", "profiles"))
+ALLOC_TOP_N = 25
+TRACEMALLOC_FRAMES = 5
+
+
+def route_slug(route):
+    """Directory name for a route name: "/SDO/" -> "SDO", "*.txt" -> "_txt"."""
+    slug = route.strip("/").replace("/", "_").replace("*", "").replace(".", "_")
+    return slug or "root"
+
+
+class Profiler:
+    def __init__(self, routes=(), rate=0.0, trace_malloc=False, out_dir=PROFILE_DIR):
+        self.out_dir = out_dir
+        self._busy = threading.Lock()
+        self.configure(routes, rate, trace_malloc)
+
+    @classmethod
+    def from_env(cls):
+        routes = [r for r in os.environ.get("PROFILE_ROUTES", "").split(",") if r]
+        return cls(routes,
+                   float(os.environ.get("PROFILE_RATE", "0.1" if routes else "0")),
+                   os.environ.get("PROFILE_TRACEMALLOC", "0") == "1")
+
+    def configure(self, routes=None, rate=None, trace_malloc=None):
+        if routes is not None:
+            self.routes = frozenset(routes)
+        if rate is not None:
+            self.rate = max(0.0, min(1.0, float(rate)))
+        if trace_malloc is not None:
+            self.trace_malloc = bool(trace_malloc)
+        if self.routes:
+            logger.info("Profiling %s", self.describe())
+
+    def describe(self):
+        return {"routes": sorted(self.routes), "rate": self.rate,
+                "tracemalloc": self.trace_malloc, "dir": self.out_dir}
+
+    def wants(self, route):
+        """Cheap check for the request path: is this request sampled?"""
+        if not self.routes or (route not in self.routes and "*" not in self.routes):
+            return False
+        return self.rate >= 1.0 or random.random() < self.rate
+
+    def run(self, route, fn, *args):
+        """Call fn(*args), profiling it unless another profile is in progress."""
+        if not self._busy.acquire(blocking=False):
+            return fn(*args)
+        try:
+            stamp = time.strftime("%Y%m%d_%H%M%S") + f"_{int(time.time() * 1000) % 1000:03d}_{os.getpid()}"
+            base = os.path.join(self.out_dir, route_slug(route), stamp)
+            trace = self.trace_malloc and not tracemalloc.is_tracing()
+            if trace:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                before = tracemalloc.take_snapshot()
+            prof = cProfile.Profile()
+            started = time.perf_counter()
+            try:
+                return prof.runcall(fn, *args)
+            finally:
+                elapsed = time.perf_counter() - started
+                after = tracemalloc.take_snapshot() if trace else None
+                peak = tracemalloc.get_traced_memory()[1] if trace else None
+                if trace:
+                    tracemalloc.stop()
+                self._write(base, route, prof, elapsed, before if trace else None, after, peak)
+        finally:
+            self._busy.release()
+
+    def _write(self, base, route, prof, elapsed, before, after, peak):
+        try:
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            prof.dump_stats(base + ".pstats")
+            if after is not None:
+                stats = after.compare_to(before, "lineno")
+                lines = [f"route {route}  elapsed {elapsed * 1000.0:.1f} ms  peak traced {peak / 1024:.0f} KiB",
+                         f"top {ALLOC_TOP_N} allocation deltas by line:"]
+                lines += [str(s) for s in stats[:ALLOC_TOP_N]]
+                with open(base + ".alloc.txt", "w") as f:
+                    f.write("\n".join(lines) + "\n")
+            logger.info("Profiled %s in %.1f ms -> %s.pstats", route, elapsed * 1000.0, base)
+        except OSError as e:
+            logger.warning(f"Failed to write profile for {route}: {e}")
@@ -0,0 +1,78 @@
+"""
+Route table for the backend.
+
+Exact paths are a dict lookup; static directories live in a trie keyed by
+path segment, so matching costs one lookup per segment regardless of how
+many routes are registered. File-extension routes are checked last.
+
+Each Route carries metadata used outside dispatch:
+    content_type  what the handler serves (informational / metrics)
+    cacheable     True for file-backed routes served from the static cache
+    executor      "loop", "io" or "cpu": where async mode runs the handler
+    cost          fair-scheduler tokens per request; 0 = never throttled (see fair_scheduler.py)
+"""
+
+EXECUTORS = ("loop", "io", "cpu")
+
+
+class Route:
+    __slots__ = ("name", "handler", "content_type", "cacheable", "executor", "cost")
+
+    def __init__(self, name, handler, content_type="text/plain", cacheable=False, executor="loop", cost=0):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor class {executor!r} for route {name}")
+        self.name = name
+        self.handler = handler
+        self.content_type = content_type
+        self.cacheable = cacheable
+        self.executor = executor
+        self.cost = cost
+
+    def __repr__(self):
+        return f"Route({self.name!r}, executor={self.executor!r})"
+
+
+class RouteTable:
+    def __init__(self):
+        self.exact = {}
+        self.trie = {}
+        self.suffixes = []
+
+    def add(self, path, handler, **meta):
+        """Register an exact path. `handler(request_handler, path, query)`."""
+        self.exact[path] = Route(path, handler, **meta)
+
+    def add_prefix(self, prefix, handler, **meta):
+        """Register a directory prefix such as "/geomag/" (matches everything below it)."""
+        node = self.trie
+        for seg in prefix.strip("/").split("/"):
+            node = node.setdefault(seg, {})
+        node[None] = Route(prefix, handler, **meta)
+
+    def add_suffix(self, suffix, handler, **meta):
+        """Register a file extension such as ".txt", checked after exact and prefix routes."""
+        self.suffixes.append((suffix, Route(f"*{suffix}", handler, **meta)))
+        # Longest suffix first so ".bmp.z" wins over ".z"
+        self.suffixes.sort(key=lambda item: -len(item[0]))
+
+    def match(self, path):
+        """Return the Route for a normalized path, or None."""
+        route = self.exact.get(path)
+        if route is not None:
+            return route
+
+        # Deepest registered directory containing the path
+        node = self.trie
+        segments = path.split("/")
+        for seg in segments[1:-1]:
+            node = node.get(seg)
+            if node is None:
+                break
+            route = node.get(None, route)
+        if route is not None:
+            return route
+
+        for suffix, route in self.suffixes:
+            if path.endswith(suffix):
+                return route
+        return None
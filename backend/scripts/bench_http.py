@@ -0,0 +1,81 @@
+"""
+HTTP throughput benchmark for the backend and the shadow proxy.
+
+Each client thread issues GETs for the given paths in a loop, either over a
+single keep-alive connection or over a new connection per request, and the
+aggregate requests/second and body throughput are reported.
+
+    python3 backend/scripts/bench_http.py                         # backend, keep-alive
+    python3 backend/scripts/bench_http.py --port 9085 --no-keepalive
+    python3 backend/scripts/bench_http.py --clients 16 --duration 10 --path /geomag/kindex.txt
+    python3 backend/scripts/bench_http.py --clients 64 --path /maps/map-D-DRAP.bmp --path /SDO/f_304_680.bmp.z
+"""
+import sys
+import time
+import argparse
+import threading
+import http.client
+
+DEFAULT_PATHS = ["/version.pl", "/ham/HamClock/RSS/web15rss.pl"]
+
+def client(host, port, paths, keepalive, deadline, counts, idx):
+    conn = None
+    done = errors = nbytes = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        try:
+            if conn is None:
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+            conn.request("GET", path, headers={} if keepalive else {"Connection": "close"})
+            resp = conn.getresponse()
+            nbytes += len(resp.read())
+            if resp.status >= 400:
+                errors += 1
+            done += 1
+            if not keepalive or resp.will_close:
+                conn.close()
+                conn = None
+        except (http.client.HTTPException, OSError):
+            errors += 1
+            if conn is not None:
+                conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    counts[idx] = (done, errors, nbytes)
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP requests/second benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9086)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--path", action="append", help="path to request (repeatable)")
+    parser.add_argument("--no-keepalive", action="store_true", help="new connection per request")
+    args = parser.parse_args()
+
+    paths = args.path or DEFAULT_PATHS
+    keepalive = not args.no_keepalive
+    counts = [(0, 0, 0)] * args.clients
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=client, args=(args.host, args.port, paths, keepalive, deadline, counts, i))
+               for i in range(args.clients)]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t
+
+    done = sum(c[0] for c in counts)
+    errors = sum(c[1] for c in counts)
+    nbytes = sum(c[2] for c in counts)
+    mode = "keep-alive" if keepalive else "close"
+    print(f"{args.host}:{args.port} {mode:10} clients={args.clients} requests={done} errors={errors} "
+          f"-> {done / elapsed:.0f} req/s, {nbytes / elapsed / 1e6:.1f} MB/s")
+    sys.exit(1 if errors and not done else 0)
+
+if __name__ == "__main__":
+    main()
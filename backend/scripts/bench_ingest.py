@@ -0,0 +1,78 @@
+"""
+Offline ingestion benchmark against the upstream replay stand-in.
+
+Starts ingestion/upstream_replay.py's server on the recorded fixtures, points
+the shared upstream client at it and runs noaa_fetcher.fetch_all() for a
+number of cycles, reporting per-source and per-cycle wall time and what the
+stand-in answered. No network is needed once the fixtures are recorded:
+
+    UPSTREAM_RECORD=debug/upstream_fixtures python3 backend/ingestion/noaa_fetcher.py
+    python3 backend/scripts/bench_ingest.py --cycles 5
+    python3 backend/scripts/bench_ingest.py --latency-ms 150 --jitter-ms 50 --error-rate 0.05 --throttle-rate 0.05
+
+Like any fetch cycle this rewrites backend/data/processed_data.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend", "ingestion"))
+
+import upstream
+import upstream_replay
+import noaa_fetcher
+
+DEFAULT_RESULTS = os.path.join(PROJECT_ROOT, "debug", "bench", "ingest_latest.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmark")
+    parser.add_argument("--fixtures", default=os.environ.get("UPSTREAM_FIXTURES", upstream_replay.DEFAULT_FIXTURES))
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=DEFAULT_RESULTS)
+    args = parser.parse_args()
+
+    store = upstream_replay.FixtureStore(args.fixtures)
+    if not store.entries():
+        print(f"No fixtures in {args.fixtures}; record some first (UPSTREAM_RECORD=...)")
+        return 1
+    server = upstream_replay.ReplayServer(store, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                          error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                                          retry_after=0, seed=args.seed).start()
+    upstream.REPLAY = server.url
+    upstream.RECORD = None
+    upstream.forget()
+
+    cycles = []
+    try:
+        for cycle in range(args.cycles):
+            before = dict(server.counts)
+            started = time.perf_counter()
+            report = noaa_fetcher.fetch_all()
+            wall = time.perf_counter() - started
+            answered = {k: server.counts[k] - before[k] for k in server.counts}
+            cycles.append({"wall_s": round(wall, 3), "sources": report, "stand_in": answered})
+    finally:
+        server.stop()
+
+    print(f"\n{'cycle':>5} {'wall s':>8}  stand-in answers")
+    for i, entry in enumerate(cycles):
+        answered = ", ".join(f"{k}={v}" for k, v in entry["stand_in"].items() if v)
+        print(f"{i + 1:>5} {entry['wall_s']:>8.3f}  {answered}")
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"fixtures": args.fixtures, "settings": vars(args), "cycles": cycles}, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Benchmark of the X-ray / solar wind / Bz resampling on recorded payloads.
+
+Times noaa_fetcher.render_xray and render_solar_wind (np.searchsorted, see
+ingestion/resample.py) against the linear scans they replaced, kept below as
+the reference, and checks that both produce identical files.
+
+Payloads are read from debug/bench/payloads/ (xrays-3-day.json,
+plasma-1-day.json, mag-1-day.json); --record saves the live SWPC feeds there
+first. Failing that, the three feeds are taken from the upstream fixture
+store (see ingestion/upstream_replay.py) if they were recorded there, and
+otherwise synthetic ones of the same shape and size are generated (one
+sample a minute, with gaps and nulls).
+
+    python3 backend/scripts/bench_resample.py --record     # fetch, save, run
+    python3 backend/scripts/bench_resample.py --repeats 20
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend", "ingestion"))
+
+import noaa_fetcher
+import upstream
+import upstream_replay
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "debug", "bench")
+PAYLOAD_DIR = os.path.join(BENCH_DIR, "payloads")
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "resample_latest.json")
+FEEDS = {"xrays-3-day.json": noaa_fetcher.XRAY_URL,
+         "plasma-1-day.json": noaa_fetcher.SW_PLASMA_URL,
+         "mag-1-day.json": noaa_fetcher.SW_MAG_URL}
+
+
+def legacy_xray(data, now_ts):
+    flux_data = {'0.05-0.4nm': {}, '0.1-0.8nm': {}}
+    for entry in data:
+        time_tag = entry['time_tag'].replace('Z', '')
+        dt = datetime.datetime.strptime(time_tag, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+        energy = entry.get('energy')
+        if energy in flux_data:
+            flux_data[energy][int(dt.timestamp())] = entry['flux']
+    latest_sample_uts = (now_ts // 600) * 600 + 300
+    if latest_sample_uts > now_ts:
+        latest_sample_uts -= 600
+    records = []
+    for i in range(150):
+        target_uts = latest_sample_uts - (149 - i) * 600
+        vals = []
+        for energy in ['0.05-0.4nm', '0.1-0.8nm']:
+            best_uts = None
+            min_diff = 601
+            for av_uts in flux_data[energy].keys():
+                diff = abs(av_uts - target_uts)
+                if diff < min_diff:
+                    min_diff = diff
+                    best_uts = av_uts
+            vals.append(flux_data[energy][best_uts] if best_uts is not None else 0.0)
+        dt = datetime.datetime.fromtimestamp(target_uts, tz=datetime.timezone.utc)
+        hm = dt.strftime("%H%M")
+        records.append(f"{dt.year:4} {dt.month:>2} {dt.day:>2}  {hm:04}   00000  00000     {vals[0]:8.2e}    {vals[1]:8.2e}")
+    return "".join(f"{record}\n" for record in records)
+
+
+def legacy_solar_wind(plasma_json, mag_json, now):
+    plasma_data = {e[0]: e for e in plasma_json[1:]}
+    mag_data = {e[0]: e for e in mag_json[1:]}
+    uts_map = {}
+    for t_str in sorted(set(plasma_data.keys()) | set(mag_data.keys())):
+        try:
+            dt = datetime.datetime.strptime(t_str.replace('Z', ''), "%Y-%m-%d %H:%M:%S.%f")
+            uts_map[t_str] = int(dt.replace(tzinfo=datetime.timezone.utc).timestamp())
+        except Exception:
+            pass
+    now_ts = (now // 60) * 60
+    sorted_times = sorted(uts_map.items(), key=lambda x: x[1])
+
+    def closest(target_ts, limit):
+        closest_t, min_diff = None, limit
+        for t_str, t_uts in sorted_times:
+            diff = abs(t_uts - target_ts)
+            if diff < min_diff:
+                min_diff, closest_t = diff, t_str
+        return closest_t
+
+    swind_final = []
+    for i in range(1440):
+        target_ts = now_ts - (1439 - i) * 60
+        p = plasma_data.get(closest(target_ts, 31))
+        if p and p[1] is not None and p[2] is not None:
+            d_str = f"{float(p[1]):.2f}".rstrip('0').rstrip('.')
+            s_str = f"{float(p[2]):.1f}".rstrip('0').rstrip('.')
+            swind_final.append(f"{target_ts} {d_str} {s_str}")
+        else:
+            swind_final.append(f"{target_ts} 0.00 0.0")
+    bz_final = []
+    for i in range(150):
+        target_ts = now_ts - (149 - i) * 600
+        m = mag_data.get(closest(target_ts, 301))
+        if m and m[1] is not None and m[2] is not None and m[3] is not None and m[6] is not None:
+            bz_final.append(f"{target_ts}   {float(m[1]):>4.1f}   {float(m[2]):>4.1f}   {float(m[3]):>4.1f}    {float(m[6]):>4.1f}")
+        else:
+            bz_final.append(f"{target_ts}    0.0   0.0   0.0    0.0")
+    return ("".join(f"{r}\n" for r in swind_final),
+            "# UNIX        Bx     By     Bz     Bt\n" + "".join(f"{r}\n" for r in bz_final))
+
+
+def synthetic_payloads(now):
+    """SWPC-shaped feeds ending at `now`: one sample a minute, a 25-minute gap, ~1% nulls."""
+    rng = random.Random(1)
+    end = (now // 60) * 60
+    gap = range(end - 5 * 3600, end - 5 * 3600 + 25 * 60)
+
+    def minutes(span):
+        return [t for t in range(end - span, end + 1, 60) if t not in gap]
+
+    def tag(t, fmt):
+        return datetime.datetime.fromtimestamp(t, tz=datetime.timezone.utc).strftime(fmt)
+
+    xrays = [{"time_tag": tag(t, "%Y-%m-%dT%H:%M:%SZ"), "satellite": 16, "energy": energy,
+              "flux": rng.uniform(1e-8, 1e-5), "observed_flux": 0.0, "electron_correction": 0.0,
+              "electron_contaminaton": False}
+             for t in minutes(3 * 86400) for energy in ("0.05-0.4nm", "0.1-0.8nm")]
+
+    def maybe(value):
+        return None if rng.random() < 0.01 else value
+
+    plasma = [["time_tag", "density", "speed", "temperature"]] + [
+        [tag(t, "%Y-%m-%d %H:%M:%S.000"), maybe(f"{rng.uniform(1, 20):.2f}"),
+         maybe(f"{rng.uniform(300, 800):.1f}"), f"{rng.randint(10000, 500000)}"] for t in minutes(86400)]
+    mag = [["time_tag", "bx_gsm", "by_gsm", "bz_gsm", "lon_gsm", "lat_gsm", "bt"]] + [
+        [tag(t, "%Y-%m-%d %H:%M:%S.000")] + [maybe(f"{rng.uniform(-15, 15):.2f}") for _ in range(3)]
+        + [f"{rng.uniform(0, 360):.2f}", f"{rng.uniform(-90, 90):.2f}", maybe(f"{rng.uniform(0, 20):.2f}")]
+        for t in minutes(86400)]
+    return {"xrays-3-day.json": xrays, "plasma-1-day.json": plasma, "mag-1-day.json": mag}
+
+
+def record_payloads():
+    os.makedirs(PAYLOAD_DIR, exist_ok=True)
+    for name, url in FEEDS.items():
+        resp = upstream.fetch(url, timeout=30)
+        resp.raise_for_status()
+        with open(os.path.join(PAYLOAD_DIR, name), "wb") as f:
+            f.write(resp.content)
+        print(f"Recorded {url} ({len(resp.content)} bytes)")
+
+
+def load_payloads():
+    """(payloads, now, source). Recorded feeds are replayed as of their last sample."""
+    payloads = None
+    if all(os.path.exists(os.path.join(PAYLOAD_DIR, name)) for name in FEEDS):
+        payloads = {}
+        for name in FEEDS:
+            with open(os.path.join(PAYLOAD_DIR, name)) as f:
+                payloads[name] = json.load(f)
+    else:
+        store = upstream_replay.FixtureStore(os.environ.get("UPSTREAM_FIXTURES", upstream_replay.DEFAULT_FIXTURES))
+        fixtures = {name: store.load("GET", url) for name, url in FEEDS.items()}
+        if all(f is not None and f[0] == 200 for f in fixtures.values()):
+            payloads = {name: json.loads(f[2]) for name, f in fixtures.items()}
+    if payloads is not None:
+        last = payloads["plasma-1-day.json"][-1][0]
+        now = int(datetime.datetime.strptime(last, "%Y-%m-%d %H:%M:%S.%f")
+                  .replace(tzinfo=datetime.timezone.utc).timestamp()) + 60
+        return payloads, now, "recorded"
+    now = 1770000000
+    return synthetic_payloads(now), now, "synthetic"
+
+
+def timed(fn, repeats):
+    samples = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return result, {"p50_ms": round(samples[len(samples) // 2], 3),
+                    "p95_ms": round(samples[max(0, math.ceil(0.95 * len(samples)) - 1)], 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resampling benchmark")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--record", action="store_true", help="save the live SWPC feeds first")
+    parser.add_argument("--output", default=DEFAULT_RESULTS)
+    args = parser.parse_args()
+
+    if args.record:
+        record_payloads()
+    payloads, now, source = load_payloads()
+    xrays, plasma, mag = (payloads[name] for name in FEEDS)
+    print(f"Payloads: {source}, {len(xrays)} X-ray, {len(plasma) - 1} plasma, {len(mag) - 1} mag samples")
+
+    cases = [("xray", lambda: legacy_xray(xrays, now), lambda: noaa_fetcher.render_xray(xrays, now)),
+             ("solar_wind_bz", lambda: legacy_solar_wind(plasma, mag, now),
+              lambda: noaa_fetcher.render_solar_wind(plasma, mag, now))]
+    results = {"payloads": source, "repeats": args.repeats, "cases": {}}
+    failed = False
+    for name, legacy, current in cases:
+        old_out, old = timed(legacy, args.repeats)
+        new_out, new = timed(current, args.repeats)
+        identical = old_out == new_out
+        failed = failed or not identical
+        results["cases"][name] = {"legacy": old, "searchsorted": new, "identical": identical}
+        print(f"{name:14} legacy p50={old['p50_ms']:9.2f}ms  searchsorted p50={new['p50_ms']:7.2f}ms  "
+              f"x{old['p50_ms'] / max(new['p50_ms'], 1e-6):6.1f}  {'identical' if identical else 'OUTPUT DIFFERS'}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
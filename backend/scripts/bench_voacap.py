@@ -0,0 +1,229 @@
+"""
+Offline VOACAP performance benchmark.
+
+Runs generate_voacap_response, calculate_grid_propagation_vectorized and
+band_service.get_band_conditions over a fixed scenario matrix and reports
+p50/p95 latency, peak RSS and peak traced allocations per function.
+
+    python3 backend/scripts/bench_voacap.py                      # run + print
+    python3 backend/scripts/bench_voacap.py --save-baseline      # record baseline
+    python3 backend/scripts/bench_voacap.py --check --threshold 0.25
+
+With --check the exit status is 1 if any metric regressed by more than the
+threshold (fraction) against the baseline, and 2 without comparing if the
+baseline was recorded with a different configuration (--quick or space
+weather). Results go under debug/bench/.
+
+Space weather is pinned to SPACE_WX rather than read from processed data, so
+runs don't depend on what the last fetch cycle published. It is stored with
+the results like the rest of the configuration.
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import itertools
+import logging
+import platform
+import resource
+import tracemalloc
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend", "ingestion"))
+
+import voacap_service
+import band_service
+
+BENCH_DIR = os.path.join(PROJECT_ROOT, "debug", "bench")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "voacap_baseline.json")
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "voacap_latest.json")
+
+# Fixed scenario matrix. Keep stable: baselines are only comparable if this is unchanged.
+TX_LOCATIONS = [("denver", 40.0, -105.0), ("london", 51.5, 0.0), ("brisbane", -27.5, 153.0)]
+RX_LOCATIONS = [("tokyo", 35.7, 139.7), ("capetown", -33.9, 18.4)]
+# (map type, MHz). MUF maps are requested with a real frequency: MHZ=0
+# currently makes the grid model divide by zero and return no map.
+MAPS = [("REL", 14.0), ("MUF", 14.0), ("REL", 28.0)]
+UTC_HOURS = [0, 12]
+PATHS = [0, 1]
+RESOLUTIONS = [(660, 330), (330, 165)]
+FIXED_DATE = (2026, 2)
+# Pinned space weather (the service's fallback values); part of the baseline like the matrix above
+SPACE_WX = {'kp': 3.0, 'sw_speed': 400.0, 'bz': 0.0, 'ssn': 70.0}
+
+# Metrics compared against the baseline (higher is worse)
+CHECKED_METRICS = ["p50_ms", "p95_ms", "alloc_peak_kb"]
+# Run settings that must match the baseline's for --check to compare at all
+CONFIG_KEYS = ["quick", "space_wx"]
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    idx = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[idx]
+
+def voacap_query(tx, mhz, utc, path, res):
+    _, lat, lng = tx
+    return {
+        'TXLAT': [str(lat)], 'TXLNG': [str(lng)], 'MHZ': [str(mhz)], 'TOA': ['3.0'],
+        'YEAR': [str(FIXED_DATE[0])], 'MONTH': [str(FIXED_DATE[1])], 'UTC': [str(utc)],
+        'PATH': [str(path)], 'WIDTH': [str(res[0])], 'HEIGHT': [str(res[1])],
+    }
+
+def build_scenarios(quick=False):
+    """Return {bench name: [(label, zero-arg callable), ...]}"""
+    pick = (lambda xs: xs[:1]) if quick else (lambda xs: xs)
+    swx = dict(SPACE_WX)
+    # band_service reads the sunspot number itself; pin it the same way
+    voacap_service.get_ssn = lambda snapshot=None: swx['ssn']
+    muf_base = 5.0 + 0.1 * swx['ssn']
+
+    generate = []
+    for tx, (map_type, mhz), utc, path, res in itertools.product(TX_LOCATIONS, pick(MAPS), pick(UTC_HOURS), pick(PATHS), pick(RESOLUTIONS)):
+        q = voacap_query(tx, mhz, utc, path, res)
+        label = f"{tx[0]}/{map_type}/{mhz:g}MHz/{utc}Z/p{path}/{res[0]}x{res[1]}"
+        generate.append((label, lambda q=q, m=map_type: voacap_service.generate_voacap_response(q, m, space_wx=swx)))
+
+    grid = []
+    grid_bands = sorted(set(mhz for _, mhz in MAPS))
+    for tx, mhz, utc, path in itertools.product(TX_LOCATIONS, pick(grid_bands), pick(UTC_HOURS), pick(PATHS)):
+        s_dec, s_lng = voacap_service.get_solar_pos(FIXED_DATE[0], FIXED_DATE[1], 15, utc)
+        args = (math.radians(tx[1]), math.radians(tx[2]), mhz, 3.0, s_dec, s_lng, muf_base)
+        label = f"{tx[0]}/{mhz:g}MHz/{utc}Z/p{path}"
+        grid.append((label, lambda a=args, p=path: voacap_service.calculate_grid_propagation_vectorized(*a, path=p, space_wx=swx)))
+
+    bands = []
+    for tx, rx, path in itertools.product(TX_LOCATIONS, RX_LOCATIONS, pick(PATHS)):
+        q = {'TXLAT': [str(tx[1])], 'TXLNG': [str(tx[2])], 'RXLAT': [str(rx[1])], 'RXLNG': [str(rx[2])],
+             'PATH': [str(path)], 'UTC': ['12'], 'MODE': ['38'], 'POW': ['100'], 'TOA': ['3']}
+        bands.append((f"{tx[0]}->{rx[0]}/p{path}", lambda q=q: band_service.get_band_conditions(q)))
+
+    return {
+        "generate_voacap_response": generate,
+        "calculate_grid_propagation_vectorized": grid,
+        "get_band_conditions": bands,
+    }
+
+def run_bench(scenarios, repeats):
+    """Time every scenario `repeats` times, then one traced pass for allocations."""
+    latencies = []
+    errors = 0
+    for _ in range(repeats):
+        for _, fn in scenarios:
+            t = time.perf_counter()
+            result = fn()
+            latencies.append((time.perf_counter() - t) * 1000.0)
+            # The services swallow exceptions and return None; don't time error paths silently
+            if result is None:
+                errors += 1
+
+    alloc_peaks = []
+    tracemalloc.start()
+    for _, fn in scenarios:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        alloc_peaks.append((peak - base) / 1024.0)
+    tracemalloc.stop()
+
+    return {
+        "samples": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "max_ms": round(max(latencies), 3),
+        "alloc_peak_kb": round(percentile(alloc_peaks, 50), 1),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions."""
+    regressions = []
+    for name, metrics in results["benchmarks"].items():
+        if metrics.get("errors"):
+            regressions.append(f"{name}: {metrics['errors']} scenario runs returned no result")
+        base = baseline.get("benchmarks", {}).get(name)
+        if not base:
+            continue
+        for key in CHECKED_METRICS:
+            old, new = base.get(key), metrics.get(key)
+            if old and new is not None and new > old * (1.0 + threshold):
+                regressions.append(f"{name}.{key}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="VOACAP performance benchmark")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="one value per dimension except TX location")
+    parser.add_argument("--only", choices=["generate_voacap_response", "calculate_grid_propagation_vectorized", "get_band_conditions"])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--output", default=DEFAULT_RESULTS)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if slower than baseline")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("BENCH_THRESHOLD", 0.25)))
+    args = parser.parse_args()
+
+    # The services log every map at INFO; keep that out of the timings
+    logging.disable(logging.INFO)
+
+    all_scenarios = build_scenarios(quick=args.quick)
+    results = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "quick": args.quick,
+        "repeats": args.repeats,
+        "space_wx": SPACE_WX,
+        "benchmarks": {},
+    }
+
+    for name, scenarios in all_scenarios.items():
+        if args.only and name != args.only:
+            continue
+        scenarios[0][1]()  # warm-up
+        metrics = run_bench(scenarios, args.repeats)
+        metrics["scenarios"] = len(scenarios)
+        results["benchmarks"][name] = metrics
+        print(f"{name:40} n={metrics['samples']:<4} p50={metrics['p50_ms']:9.2f}ms  p95={metrics['p95_ms']:9.2f}ms  "
+              f"alloc={metrics['alloc_peak_kb']:9.1f}KB  rss={metrics['peak_rss_kb'] / 1024:.1f}MB")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(2)
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        # Deltas between different matrices or space weather mean nothing
+        mismatched = [f"{key}: baseline {baseline.get(key)!r}, this run {results[key]!r}"
+                      for key in CONFIG_KEYS if baseline.get(key) != results[key]]
+        if mismatched:
+            print("Baseline was recorded with a different configuration; not comparing:")
+            for m in mismatched:
+                print(f"  {m}")
+            print("Re-record it with --save-baseline")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSION (threshold {args.threshold:.0%}):")
+            for r in regressions:
+                print(f"  {r}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import subprocess
+
+# Add ingestion to path
+INGESTION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ingestion")
+sys.path.append(INGESTION_DIR)
+
+IMPORT_PROBE = (
+    "import sys, time; sys.path.append({d!r}); import numpy; "
+    "t = time.perf_counter(); import voacap_service; "
+    "print(time.perf_counter() - t)"
+)
+
+def measure_import(asset_dir=None, runs=5):
+    """Time `import voacap_service` in fresh interpreters (numpy already imported)."""
+    env = dict(os.environ)
+    if asset_dir:
+        env["VOACAP_ASSET_DIR"] = asset_dir
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(d=INGESTION_DIR)],
+                             check=True, capture_output=True, text=True, env=env)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    samples.sort()
+    return samples[len(samples) // 2]
+
+if __name__ == "__main__":
+    import voacap_service
+
+    # A non-existent bundle dir forces the legacy compute-at-import path
+    before = measure_import(asset_dir=os.devnull + ".none") if "--measure" in sys.argv else None
+
+    t = time.perf_counter()
+    written = voacap_service.build_asset_bundle()
+    print(f"Built {len(written)} arrays in {time.perf_counter() - t:.3f}s -> {voacap_service.ASSET_DIR}")
+    for name in written:
+        print(f"  {name}")
+
+    if before is not None:
+        after = measure_import()
+        print(f"import voacap_service: {before * 1000:.1f} ms (no bundle) -> {after * 1000:.1f} ms (bundle)")
@@ -0,0 +1,216 @@
+"""
+Offline VOACAP calibration against stored ground-truth maps.
+
+Loads upstream fetchVOACAPArea.pl captures listed in a manifest
+(backend/resources/gt_manifest.json), renders the local model for the same
+query with candidate coefficients and scores each candidate with vectorized
+pixel metrics: RGB mean absolute error, reliability-class confusion and
+per-region error. Candidates are evaluated in parallel across a process pool.
+
+    python3 backend/scripts/calibrate_voacap.py
+    python3 backend/scripts/calibrate_voacap.py --path-loss 0.00005:0.00008:7 \\
+        --rel-slope 20,25,30 --rel-center 0.6:0.8:5 --workers 8
+
+Reports are written to debug/calibration/.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend", "ingestion"))
+
+import voacap_service
+
+RESOURCES_DIR = os.path.join(PROJECT_ROOT, "backend", "resources")
+DEFAULT_MANIFEST = os.path.join(RESOURCES_DIR, "gt_manifest.json")
+REPORT_DIR = os.path.join(PROJECT_ROOT, "debug", "calibration")
+HEADER_SIZE = 122
+
+# Reliability classes, anchored on the REL colour scale in voacap_service
+CLASS_NAMES = ["none", "closed", "poor", "fair", "good"]
+CLASS_ANCHORS = np.array([
+    [0x00, 0x00, 0x00],   # black: masked / no data
+    [0x66, 0x66, 0x66],   # grey:   0%
+    [0xEE, 0x67, 0x66],   # red:   ~21%
+    [0xEE, 0xEE, 0x44],   # yellow: 40-60%
+    [0x44, 0xCC, 0x44],   # green: 83%+
+], dtype=np.float32)
+
+# Coarse regions for per-region error: latitude band x longitude sector
+LAT_BANDS = [("polarN", 60, 90), ("midN", 30, 60), ("tropN", 0, 30),
+             ("tropS", -30, 0), ("midS", -60, -30), ("polarS", -90, -60)]
+LNG_SECTORS = [("americas", -180, -30), ("emea", -30, 60), ("asiapac", 60, 180)]
+
+# Worker-process state (set by _init_worker)
+_SAMPLES = None
+
+def decode_map(bmp):
+    """RGB565 BMP bytes -> (H, W) uint16 pixel array."""
+    w = int.from_bytes(bmp[18:22], "little", signed=True)
+    h = abs(int.from_bytes(bmp[22:26], "little", signed=True))
+    return np.frombuffer(bmp, dtype='<u2', count=w * h, offset=HEADER_SIZE).reshape(h, w)
+
+def first_map(blob):
+    """First (non-dimmed) map of a concatenated two-zlib-stream VOACAP response."""
+    return zlib.decompressobj().decompress(blob)
+
+def rgb565_to_rgb(pix):
+    r = ((pix >> 11) & 0x1F).astype(np.float32) * (255.0 / 31.0)
+    g = ((pix >> 5) & 0x3F).astype(np.float32) * (255.0 / 63.0)
+    b = (pix & 0x1F).astype(np.float32) * (255.0 / 31.0)
+    return np.stack([r, g, b], axis=-1)
+
+def classify(rgb):
+    """Nearest reliability-class anchor per pixel."""
+    d = ((rgb[..., None, :] - CLASS_ANCHORS) ** 2).sum(axis=-1)
+    return np.argmin(d, axis=-1).astype(np.uint8)
+
+def region_masks(h, w):
+    lats = 90.0 - (np.arange(h) + 0.5) * 180.0 / h
+    lngs = -180.0 + (np.arange(w) + 0.5) * 360.0 / w
+    masks = {}
+    for (lat_name, lo, hi), (lng_name, west, east) in itertools.product(LAT_BANDS, LNG_SECTORS):
+        rows = (lats >= lo) & (lats < hi) if lo > -90 else (lats >= lo) & (lats <= hi)
+        cols = (lngs >= west) & (lngs < east)
+        masks[f"{lat_name}/{lng_name}"] = rows[:, None] & cols[None, :]
+    return masks
+
+def compare_maps(gt_pix, local_pix, valid):
+    """Vectorized metrics for one ground-truth / local map pair."""
+    gt_rgb = rgb565_to_rgb(gt_pix)
+    lo_rgb = rgb565_to_rgb(local_pix)
+    abs_err = np.abs(gt_rgb - lo_rgb).mean(axis=-1)
+
+    gt_cls = classify(gt_rgb)[valid]
+    lo_cls = classify(lo_rgb)[valid]
+    n = len(CLASS_NAMES)
+    confusion = np.bincount(gt_cls.astype(np.int64) * n + lo_cls, minlength=n * n).reshape(n, n)
+
+    regions = {}
+    for name, m in region_masks(*gt_pix.shape).items():
+        m = m & valid
+        if m.any():
+            regions[name] = round(float(abs_err[m].mean()), 3)
+
+    return {
+        "mae": float(abs_err[valid].mean()),
+        "exact_pixels": float((gt_pix[valid] == local_pix[valid]).mean()),
+        "class_accuracy": float(np.trace(confusion) / max(1, confusion.sum())),
+        "confusion": confusion.tolist(),
+        "regions": regions,
+    }
+
+def load_samples(manifest_path):
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    samples = []
+    for entry in manifest.get("samples", []):
+        with open(os.path.join(base, entry["file"]), "rb") as f:
+            gt = decode_map(first_map(f.read()))
+        samples.append({
+            "name": entry["file"],
+            "query": {k: [str(v)] for k, v in entry["query"].items()},
+            "map_type": entry.get("map_type", "REL"),
+            "space_wx": entry.get("space_wx"),
+            "gt": gt,
+        })
+    return samples
+
+def _init_worker(manifest_path):
+    global _SAMPLES
+    logging.disable(logging.INFO)
+    _SAMPLES = load_samples(manifest_path)
+
+def evaluate(coeffs):
+    """Render every sample with `coeffs` and aggregate the metrics (runs in a worker)."""
+    voacap_service.MODEL_COEFFS = dict(voacap_service.MODEL_COEFFS, **coeffs)
+    per_sample = {}
+    for s in _SAMPLES:
+        maps = voacap_service.generate_voacap_response(s["query"], s["map_type"], space_wx=s["space_wx"])
+        if not maps:
+            per_sample[s["name"]] = {"error": "model returned no map"}
+            continue
+        local = decode_map(zlib.decompress(maps[0]))
+        if local.shape != s["gt"].shape:
+            per_sample[s["name"]] = {"error": f"shape {local.shape} != {s['gt'].shape}"}
+            continue
+        valid = np.ones(local.shape, dtype=bool)
+        mask = voacap_service.COUNTRIES_MASK
+        if mask is not None and mask.shape == local.shape:
+            valid &= mask == 0
+        per_sample[s["name"]] = compare_maps(s["gt"], local, valid)
+
+    scored = [m for m in per_sample.values() if "mae" in m]
+    return {
+        "coeffs": coeffs,
+        "mae": float(np.mean([m["mae"] for m in scored])) if scored else float("inf"),
+        "class_accuracy": float(np.mean([m["class_accuracy"] for m in scored])) if scored else 0.0,
+        "samples": per_sample,
+    }
+
+def parse_sweep(spec, default):
+    """'a,b,c' -> list; 'start:stop:n' -> linspace; None -> [default]."""
+    if not spec:
+        return [default]
+    if ":" in spec:
+        start, stop, n = spec.split(":")
+        return [float(v) for v in np.linspace(float(start), float(stop), int(n))]
+    return [float(v) for v in spec.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline VOACAP calibration")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--path-loss", help="sweep for MODEL_COEFFS['path_loss']")
+    parser.add_argument("--rel-slope", help="sweep for MODEL_COEFFS['rel_slope']")
+    parser.add_argument("--rel-center", help="sweep for MODEL_COEFFS['rel_center']")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default=os.path.join(REPORT_DIR, f"calibration_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    defaults = voacap_service.MODEL_COEFFS
+    grid = list(itertools.product(
+        parse_sweep(args.path_loss, defaults['path_loss']),
+        parse_sweep(args.rel_slope, defaults['rel_slope']),
+        parse_sweep(args.rel_center, defaults['rel_center']),
+    ))
+    candidates = [{"path_loss": p, "rel_slope": s, "rel_center": c} for p, s, c in grid]
+    current = {k: defaults[k] for k in ("path_loss", "rel_slope", "rel_center")}
+    if current not in candidates:
+        candidates.append(current)  # always score the shipped coefficients for reference
+    print(f"Evaluating {len(candidates)} candidates on {args.workers} workers...")
+
+    t_start = time.time()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.manifest,)) as pool:
+        results = list(pool.map(evaluate, candidates))
+    elapsed = time.time() - t_start
+
+    results.sort(key=lambda r: r["mae"])
+    baseline = next((r for r in results if r["coeffs"] == current), None)
+
+    print(f"Done in {elapsed:.1f}s ({elapsed / max(1, len(candidates)):.2f}s/candidate)")
+    print(f"{'rank':>4}  {'path_loss':>10} {'slope':>6} {'center':>6}  {'MAE':>7} {'class acc':>9}")
+    for i, r in enumerate(results[:args.top]):
+        c = r["coeffs"]
+        print(f"{i + 1:>4}  {c['path_loss']:>10.7f} {c['rel_slope']:>6.2f} {c['rel_center']:>6.3f}  {r['mae']:>7.3f} {r['class_accuracy']:>9.3%}")
+    if baseline:
+        print(f"current MODEL_COEFFS: MAE {baseline['mae']:.3f}, class acc {baseline['class_accuracy']:.3%}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"manifest": args.manifest, "classes": CLASS_NAMES, "elapsed_s": elapsed,
+                   "results": results}, f, indent=2)
+    print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
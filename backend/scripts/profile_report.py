@@ -0,0 +1,82 @@
+"""
+Aggregate sampled request profiles into the top-N hot functions per route.
+
+Reads the .pstats dumps written by backend/profiler.py (one directory per
+route under debug/profiles/), merges all dumps of a route and prints the
+functions with the most time, plus the largest allocation sites when
+tracemalloc summaries are present.
+
+    python3 backend/scripts/profile_report.py
+    python3 backend/scripts/profile_report.py --route SDO --top 30 --sort tottime
+"""
+import os
+import io
+import sys
+import re
+import glob
+import pstats
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiler import PROFILE_DIR
+
+ALLOC_LINE = re.compile(r"^(.*?): size=.*?\(([+-][\d.]+) (B|KiB|MiB|GiB)\)")
+UNITS = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+
+def hot_functions(files, top, sort):
+    """[(ncalls, tottime, cumtime, "file:line(func)")] over the merged dumps."""
+    stats = pstats.Stats(*files, stream=io.StringIO())
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:top]:
+        cc, nc, tt, ct, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append((nc, tt, ct, f"{os.path.basename(filename)}:{line}({name})"))
+    return rows
+
+def alloc_sites(files, top):
+    """Allocation deltas per source line summed over .alloc.txt summaries, largest first."""
+    totals = {}
+    for path in files:
+        with open(path) as f:
+            for line in f:
+                # "<file>:<line>: size=12.3 KiB (+12.3 KiB), count=..."
+                m = ALLOC_LINE.match(line)
+                if m:
+                    site, value, unit = m.groups()
+                    totals[site] = totals.get(site, 0) + float(value) * UNITS[unit]
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-N hot functions per profiled route")
+    parser.add_argument("--dir", default=PROFILE_DIR)
+    parser.add_argument("--route", help="only this route directory (e.g. SDO, fetchVOACAPArea_pl)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--sort", default="cumulative", choices=["cumulative", "tottime", "ncalls"])
+    args = parser.parse_args()
+
+    routes = sorted(d for d in os.listdir(args.dir) if os.path.isdir(os.path.join(args.dir, d))) \
+        if os.path.isdir(args.dir) else []
+    if args.route:
+        routes = [r for r in routes if r == args.route]
+    if not routes:
+        print(f"No profiles under {args.dir}")
+        sys.exit(1)
+
+    for route in routes:
+        files = sorted(glob.glob(os.path.join(args.dir, route, "*.pstats")))
+        if not files:
+            continue
+        print(f"== {route}: {len(files)} profiled requests")
+        print(f"{'ncalls':>9} {'tottime':>9} {'cumtime':>9}  function")
+        for nc, tt, ct, func in hot_functions(files, args.top, args.sort):
+            print(f"{nc:>9} {tt:>9.4f} {ct:>9.4f}  {func}")
+        allocs = glob.glob(os.path.join(args.dir, route, "*.alloc.txt"))
+        if allocs:
+            print(f"-- allocations ({len(allocs)} snapshots)")
+            for site, nbytes in alloc_sites(allocs, args.top):
+                print(f"{nbytes / 1024:>12.1f} KiB  {site}")
+        print()
+
+if __name__ == "__main__":
+    main()
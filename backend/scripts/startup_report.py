@@ -0,0 +1,130 @@
+"""
+Startup report for the backend, checked against a time budget.
+
+1. `python -X importtime -c "import server"` (best of --runs): total import
+   time of server.py and its heaviest direct imports. Interpreter start-up
+   (`site`) is reported separately; it is not ours to optimize.
+2. Starts the server on a spare port and measures time until the listener
+   accepts connections and until /ready reports the background warm-up done.
+
+Exits 1 when the import or listen time is over budget.
+
+    python3 backend/scripts/startup_report.py
+    python3 backend/scripts/startup_report.py --import-budget-ms 100 --listen-budget-ms 500 --top 15
+"""
+import os
+import sys
+import time
+import json
+import socket
+import argparse
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET_MS = 100
+LISTEN_BUDGET_MS = 500
+READY_TIMEOUT_S = 60
+
+def parse_importtime(stderr):
+    """[(depth, name, self_us, cumulative_us)] from -X importtime output, in output order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us, cum_us, name = int(fields[0]), int(fields[1]), fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((depth, name.strip(), self_us, cum_us))
+    return rows
+
+def import_profile(module="server"):
+    """(cumulative ms for `module`, site ms, [(name, ms)] direct imports of `module`)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BACKEND_DIR, capture_output=True, text=True, env={**os.environ, "ACCESS_LOG": ""})
+    rows = parse_importtime(proc.stderr)
+    total = site = 0
+    children = []
+    pending = []
+    for depth, name, _, cum in rows:
+        if depth == 0:
+            if name == module:
+                total = cum
+                children = pending
+            elif name == "site":
+                site = cum
+            pending = []
+        elif depth == 1:
+            pending.append((name, cum))
+    return total / 1000.0, site / 1000.0, sorted(((n, c / 1000.0) for n, c in children), key=lambda x: -x[1])
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def listen_profile():
+    """(ms until the listener accepts, ms until /ready is 200 or None)."""
+    port = free_port()
+    env = {**os.environ, "BACKEND_PORT": str(port), "ACCESS_LOG": "", "BACKEND_MODE": "threaded"}
+    t = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "server.py"], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listen_ms = ready_ms = None
+    try:
+        deadline = t + READY_TIMEOUT_S
+        while time.perf_counter() < deadline and proc.poll() is None:
+            if listen_ms is None:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                    listen_ms = (time.perf_counter() - t) * 1000.0
+                except OSError:
+                    time.sleep(0.002)
+                    continue
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5) as resp:
+                    if resp.status == 200:
+                        ready_ms = (time.perf_counter() - t) * 1000.0
+                        break
+            except OSError:
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return listen_ms, ready_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend startup time report")
+    parser.add_argument("--runs", type=int, default=3, help="importtime runs (best is reported)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--listen-budget-ms", type=float, default=LISTEN_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    total, site, children = min((import_profile() for _ in range(args.runs)), key=lambda r: r[0])
+    listen_ms, ready_ms = listen_profile()
+    over = total > args.import_budget_ms or listen_ms is None or listen_ms > args.listen_budget_ms
+
+    report = {
+        "import_ms": round(total, 1), "import_budget_ms": args.import_budget_ms,
+        "site_ms": round(site, 1),
+        "listen_ms": None if listen_ms is None else round(listen_ms, 1), "listen_budget_ms": args.listen_budget_ms,
+        "ready_ms": None if ready_ms is None else round(ready_ms, 1),
+        "top_imports": [(n, round(ms, 1)) for n, ms in children[:args.top]],
+        "within_budget": not over,
+    }
+    if args.json:
+        print(json.dumps(report, indent=1))
+    else:
+        print(f"import server     {total:8.1f} ms  (budget {args.import_budget_ms:.0f} ms; interpreter site {site:.1f} ms)")
+        for name, ms in children[:args.top]:
+            print(f"  {name:30} {ms:8.1f} ms")
+        print(f"listener up       {report['listen_ms'] or float('nan'):8.1f} ms  (budget {args.listen_budget_ms:.0f} ms)")
+        print(f"ready (warm-up)   {report['ready_ms'] or float('nan'):8.1f} ms")
+        print("within budget" if not over else "OVER BUDGET")
+    sys.exit(1 if over else 0)
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,23 @@ import http.server
 import socketserver
 import urllib.parse
 import os
+import gc
+import io
+import json
+import math
 import sys
+import time
+import signal
+import threading
+import tempfile
 import logging
+import access_log
+import metrics
+import profiler
+import startup
+import fair_scheduler
+import telemetry
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Add ingestion directory to path to import services
@@ -13,82 +26,215 @@ ingestion_dir = os.path.join(os.path.dirname(__file__), "ingestion")
 sys.path.append(ingestion_dir)
 logger.debug(f"Added {ingestion_dir} to sys.path")
 
-try:
-    import geoloc_service
-    import spot_service
-    import weather_service
-    import sdo_service
-    import drap_service
-    import voacap_service
-    import band_service
-    logger.info("Successfully imported all Group 3 dynamic services")
-except ImportError as e:
-    logger.error(f"Failed to import services: {e}")
-    # Print to stdout/stderr as well to ensure it's captured
-    print(f"CRITICAL ERROR: {e}", file=sys.stderr)
-    sys.exit(1)
-
-PORT = 9086
+from static_cache import StaticCache, accepts_gzip
+import snapshot_store
+from gzip_publisher import GZIP_SUFFIXES
+from routes import RouteTable
+
+# Service calls timed into the /metrics service histograms
+INSTRUMENTED_SERVICES = {
+    "geoloc_service": ["get_geoloc"],
+    "spot_service": ["fetch_pskreporter"],
+    "weather_service": ["fetch_weather", "get_prevailing_stats"],
+    "sdo_service": ["get_sdo_image_path"],
+    "drap_service": ["get_drap_stats"],
+    "voacap_service": ["generate_voacap_response", "generate_voacap_raw"],
+    "band_service": ["get_band_conditions"],
+}
+
+def _instrument(module):
+    for name in INSTRUMENTED_SERVICES.get(module.__name__, ()):
+        setattr(module, name, metrics.instrument(f"{module.__name__}.{name}", getattr(module, name)))
+
+# Services import on first use or during the background warm-up (see startup.py),
+# heaviest first, so the listener doesn't wait for NumPy, requests and the VOACAP assets
+voacap_service = startup.lazy("voacap_service", _instrument)
+band_service = startup.lazy("band_service", _instrument)
+voacap_ab = startup.lazy("voacap_ab")
+drap_service = startup.lazy("drap_service", _instrument)
+weather_service = startup.lazy("weather_service", _instrument)
+geoloc_service = startup.lazy("geoloc_service", _instrument)
+spot_service = startup.lazy("spot_service", _instrument)
+sdo_service = startup.lazy("sdo_service", _instrument)
+
+PORT = int(os.environ.get("BACKEND_PORT", 9086))
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "processed_data")
 
+# "threaded" (one thread per connection), "async" (event loop + executors)
+# or "prefork" (BACKEND_WORKERS threaded workers sharing the port)
+SERVER_MODE = os.environ.get("BACKEND_MODE", "threaded")
+WORKERS = int(os.environ.get("BACKEND_WORKERS", os.cpu_count() or 1))
+# Prefork workers publish metrics here; /dev/shm keeps it in shared memory
+RUN_DIR = os.environ.get("BACKEND_RUN_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), f"hamclock-backend-{PORT}"))
+CPU_WORKERS = int(os.environ.get("BACKEND_CPU_WORKERS", min(4, os.cpu_count() or 1)))
+IO_WORKERS = int(os.environ.get("BACKEND_IO_WORKERS", 16))
+
+# Directories under processed_data served as static files
+STATIC_DIRS = ["/geomag/", "/ssn/", "/solar-flux/", "/xray/", "/solar-wind/", "/Bz/", "/aurora/", "/dst/",
+               "/NOAASpaceWX/", "/drap/", "/cty/", "/ONTA/", "/dxpeds/", "/contests/"]
+STATIC_SUFFIXES = [".txt", ".bmp", ".bmp.z"]
+
+STATIC_CACHE = StaticCache(gzip_suffixes=GZIP_SUFFIXES)
+
+# Sampled cProfile/tracemalloc of selected routes (see profiler.py)
+PROFILER = profiler.Profiler.from_env()
+# Per-client token buckets + fair queueing for routes registered with a cost
+SCHEDULER = fair_scheduler.FairScheduler()
+# Fleet telemetry (unique clients, versions, heavy hitters), see telemetry.py
+TELEMETRY = telemetry.Telemetry()
+# /telemetry.json?top= is clamped to this (the size of the largest heavy-hitter table)
+TELEMETRY_MAX_TOP = 256
+# /admin/* endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("BACKEND_ADMIN_TOKEN", "")
+# BACKEND_INGEST=1 runs the ingestion scheduler (ingestion/scheduler.py) on a
+# thread of this process instead of as a separate one (threaded/async modes)
+INGEST_ENABLED = os.environ.get("BACKEND_INGEST", "") == "1"
+INGEST = None
+
+
+
+class _HeadersOnly:
+    """wfile wrapper for HEAD: passes the header block, drops the body."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.headers_sent = False
+
+    def write(self, data):
+        if not self.headers_sent:
+            self.headers_sent = True
+            return self.raw.write(data)
+        return len(data)
+
+    def flush(self):
+        self.raw.flush()
+
 
 class HamClockBackend(http.server.SimpleHTTPRequestHandler):
-    protocol_version = "HTTP/1.0"
+    # HTTP/1.1 keep-alive: every response must carry Content-Length
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are dropped after this many seconds
+    timeout = 30
+    # Headers and body go out in separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
+
+    def _begin_request(self):
+        self._started = time.perf_counter()
+        self._status = None
+        self._resp_bytes = 0
+        self._route = None
+        self._cache = None
+
+    def _end_request(self):
+        ua = self.headers.get("User-Agent")
+        fields = {
+            "method": self.command,
+            "route": self._route,
+            "path": self.path,
+            # No response sent: the handler raised before send_response
+            "status": self._status or 500,
+            "bytes": self._resp_bytes,
+            "latency_ms": round((time.perf_counter() - self._started) * 1000.0, 3),
+            "cache": self._cache,
+            "client": access_log.client_key(ua, self.client_address[0]),
+            "ua": ua,
+        }
+        sink = getattr(self, "access_sink", None)
+        if sink is not None:
+            sink.append(fields)  # render_request: the caller logs and records it
+        else:
+            if self._route is not None:
+                metrics.request_finished(self._route)
+            metrics.observe_request(self._route or "unmatched", self._status, self._resp_bytes,
+                                    time.perf_counter() - self._started, self._cache)
+            TELEMETRY.observe(fields)
+            access_log.log_access(fields)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self._resp_bytes = int(value)
+        super().send_header(keyword, value)
+
+    def log_request(self, code='-', size='-'):
+        pass  # replaced by the structured access log
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def do_HEAD(self):
+        # Same routing as GET. Handlers write the whole header block in one
+        # end_headers() call, so everything after it is the body.
+        wfile = self.wfile
+        self.wfile = _HeadersOnly(wfile)
+        try:
+            self.do_GET()
+        finally:
+            self.wfile = wfile
 
     def do_GET(self):
-        parsed_path = urllib.parse.urlparse(self.path)
-        path = parsed_path.path
-        query = urllib.parse.parse_qs(parsed_path.query)
-
-        # Normalize path: remove potential prefixes like /ham/HamClock/
-        normalized_path = path
-        if path.startswith("/ham/HamClock"):
-            normalized_path = path[len("/ham/HamClock"):]
-        
-        print(f"Server received: {path} (normalized: {normalized_path}) with params {query}")
-
-        if normalized_path == "/fetchIPGeoloc.pl":
-            self.handle_geoloc(query)
-        elif normalized_path == "/fetchPSKReporter.pl":
-            self.handle_psk(query)
-        elif normalized_path == "/version.pl":
-            self.handle_version(query)
-        elif normalized_path == "/RSS/web15rss.pl":
-            self.handle_rss(query)
-        elif normalized_path == "/wx.pl":
-            self.handle_weather(query)
-        elif normalized_path == "/worldwx/wx.txt":
-            self.handle_world_wx()
-        elif normalized_path == "/fetchVOACAPArea.pl":
-            self.handle_voacap_area(query)
-        elif normalized_path == "/fetchBandConditions.pl":
-            self.handle_band_conditions(query)
-        elif normalized_path in ["/fetchVOACAP-MUF.pl", "/fetchVOACAP-TOA.pl"]:
-            self.handle_voacap_map(normalized_path)
-        elif normalized_path == "/fetchDRAP.pl":
-            self.handle_drap(query)
-        elif normalized_path == "/fetchWordWx.pl":
-            self.handle_word_wx()
-        elif normalized_path in ["/fetchONTA.pl", "/fetchAurora.pl", "/fetchDXPeds.pl"]:
-            # Serve as static for now or implement shim
-            self.handle_static(normalized_path)
-        elif normalized_path.startswith("/SDO/"):
-            self.handle_sdo(normalized_path)
-        elif normalized_path.startswith("/geomag/") or normalized_path.startswith("/ssn/") or normalized_path.startswith("/solar-flux/") \
-             or normalized_path.startswith("/xray/") or normalized_path.startswith("/solar-wind/") or normalized_path.startswith("/Bz/") \
-             or normalized_path.startswith("/aurora/") or normalized_path.startswith("/dst/") or normalized_path.startswith("/NOAASpaceWX/") \
-             or normalized_path.startswith("/drap/") or normalized_path.startswith("/cty/") or normalized_path.startswith("/ONTA/") \
-             or normalized_path.startswith("/dxpeds/") or normalized_path.startswith("/contests/") \
-             or normalized_path.endswith(".txt") or normalized_path.endswith(".bmp") or normalized_path.endswith(".bmp.z"):
-            # Serve from processed_data
-            self.handle_static(normalized_path)
+        self._begin_request()
+        try:
+            parsed_path = urllib.parse.urlparse(self.path)
+            normalized_path = normalize_path(parsed_path.path)
+
+            route = ROUTES.match(normalized_path)
+            if route is None:
+                self.send_error(404, "Not Found")
+                return
+            self._route = route.name
+            if getattr(self, "access_sink", None) is None:
+                metrics.request_started(route.name)
+            query = urllib.parse.parse_qs(parsed_path.query)
+            refusal = getattr(self, "sched_refusal", None)
+            if refusal is not None:
+                self.send_refusal(*refusal)  # decided by the async front end
+            elif route.cost and getattr(self, "access_sink", None) is None:
+                self._run_scheduled(route, normalized_path, query)
+            else:
+                self._dispatch(route, normalized_path, query)
+        finally:
+            self._end_request()
+
+    def _dispatch(self, route, path, query):
+        if PROFILER.routes and PROFILER.wants(route.name):
+            PROFILER.run(route.name, route.handler, self, path, query)
         else:
-            self.send_error(404, "Not Found")
+            route.handler(self, path, query)
+
+    def _run_scheduled(self, route, path, query):
+        client = access_log.client_key(self.headers.get("User-Agent"), self.client_address[0])
+        retry_after = SCHEDULER.throttle(client, route.cost)
+        if retry_after:
+            self.send_refusal(429, retry_after)
+            return
+        if not SCHEDULER.acquire(client, route.cost):
+            self.send_refusal(503, SCHEDULER.max_wait)
+            return
+        started = time.perf_counter()
+        try:
+            self._dispatch(route, path, query)
+        finally:
+            SCHEDULER.release(client, time.perf_counter() - started)
+
+    def send_refusal(self, code, retry_after):
+        """429 (client over its rate) or 503 (queued too long) with Retry-After."""
+        body = b"Too many requests\n" if code == 429 else b"Server busy\n"
+        self.send_response(code)
+        self.send_header("Content-type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", str(max(1, math.ceil(retry_after))))
+        self.end_headers()
+        self.wfile.write(body)
 
     def handle_geoloc(self, query):
         try:
             ip = query.get('ip', [None])[0]
-            logger.debug(f"Geoloc request for IP: {ip}")
+            logger.debug("Geoloc request for IP: %s", ip)
             result = geoloc_service.get_geoloc(ip)
             if result:
                 encoded_result = result.encode()
@@ -122,14 +268,16 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
                 is_receiver = True
                 
             maxage = int(query.get('maxage', [1800])[0])
-            logger.debug(f"PSK request: call={call}, grid={grid}, is_receiver={is_receiver}")
+            logger.debug("PSK request: call=%s, grid=%s, is_receiver=%s", call, grid, is_receiver)
             
             result = spot_service.fetch_pskreporter(callsign=call, grid=grid, maxage_sec=maxage, 
                                                     mode_filter=mode, is_receiver=is_receiver)
+            encoded_result = result.encode()
             self.send_response(200)
             self.send_header("Content-type", "text/plain")
+            self.send_header("Content-Length", str(len(encoded_result)))
             self.end_headers()
-            self.wfile.write(result.encode())
+            self.wfile.write(encoded_result)
         except (BrokenPipeError, ConnectionResetError) as e:
             logger.warning(f"Client disconnected during PSK response: {e}")
         except Exception as e:
@@ -144,28 +292,97 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
             # Remove leading slash for os.path.join
             rel_path = path.lstrip('/')
             local_path = os.path.join(DATA_DIR, rel_path)
-            logger.debug(f"Static request for: {path} -> {local_path}")
-            
-            if os.path.exists(local_path):
-                # Set content type based on extension
-                content_type = "application/octet-stream" if local_path.endswith(".z") else "text/plain"
-                with open(local_path, "rb") as f:
-                    content = f.read()
-                    self.send_response(200)
-                    self.send_header("Content-type", content_type)
-                    self.send_header("Content-Length", str(len(content)))
-                    self.end_headers()
-                    self.wfile.write(content)
-                    logger.debug(f"Served {local_path} ({len(content)} bytes)")
-            else:
+            logger.debug("Static request for: %s -> %s", path, local_path)
+
+            # Set content type based on extension
+            content_type = "application/octet-stream" if local_path.endswith(".z") else "text/plain"
+            entry = hit = None
+            if accepts_gzip(self.headers.get("Accept-Encoding")):
+                # HamClock never sends Accept-Encoding, so it always gets identity bytes
+                entry, hit = STATIC_CACHE.lookup_gzip(local_path, content_type)
+            if entry is None:
+                # Small products published through the snapshot store are served from
+                # memory; larger ones take the stat + sendfile path like any file
+                dataset = snapshot_store.current().get(rel_path)
+                if dataset is not None and dataset.body is not None and len(dataset.body) <= STATIC_CACHE.max_entry_bytes:
+                    entry, hit = STATIC_CACHE.lookup_published(local_path, content_type, dataset.stamp, dataset.body)
+                else:
+                    entry, hit = STATIC_CACHE.lookup(local_path, content_type)
+            self._cache = "hit" if hit else ("stream" if entry is not None and entry.body is None else "miss")
+            if entry is None:
                 logger.warning(f"Static file not found: {local_path}")
                 self.send_error(404, f"File {rel_path} not found in {DATA_DIR}")
+                return
+
+            if entry.not_modified(self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since")):
+                self.send_response(304)
+                self.send_header("ETag", entry.etag)
+                self.send_header("Last-Modified", entry.last_modified)
+                if entry.vary:
+                    self.send_header("Vary", "Accept-Encoding")
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            if entry.body is not None:
+                self.send_prebuilt_headers(entry.headers, entry.body)
+            else:
+                self.send_static_file(entry)
+            logger.debug("Served %s (%s bytes)", local_path, entry.stamp[1])
         except (BrokenPipeError, ConnectionResetError) as e:
             logger.warning(f"Client disconnected during static response: {e}")
         except Exception as e:
             logger.error(f"Error in handle_static: {e}", exc_info=True)
             self.send_error(500, str(e))
 
+    def send_prebuilt_headers(self, header_bytes, body=b""):
+        """
+        Finish a send_response() with an already encoded header block.
+        A small in-memory body goes out in the same write as the headers.
+        """
+        if self.command == "HEAD":
+            body = b""
+        self._resp_bytes = len(body)
+        if hasattr(self, "_headers_buffer"):
+            self._headers_buffer.extend((header_bytes, b"\r\n", body))
+            self.flush_headers()
+        elif body:
+            self.wfile.write(body)
+
+    def send_static_file(self, entry):
+        """Headers for `entry`, then its body streamed from disk."""
+        with open(entry.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if (st.st_mtime_ns, st.st_size) != entry.stamp:
+                # Replaced since it was looked up: describe the file actually open
+                entry = STATIC_CACHE.get(entry.path, entry.content_type, entry.encoding, st=st)
+                if entry.body is not None:
+                    self.send_prebuilt_headers(entry.headers, entry.body)
+                    return
+            self.send_prebuilt_headers(entry.headers)
+            self.send_file_body(f, st.st_size)
+
+    def send_file_body(self, f, size):
+        """
+        Write `size` bytes of open file `f` as the response body. On a real
+        connection this is socket.sendfile, i.e. os.sendfile where the platform
+        has it; in-memory writers (async mode) get ordinary writes.
+        """
+        if self.command == "HEAD":
+            return
+        self._resp_bytes = size
+        sock = getattr(self, "connection", None)
+        if sock is not None:
+            sock.sendfile(f, 0, size)
+            return
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(remaining, 256 * 1024))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            remaining -= len(chunk)
+
     def handle_version(self, query):
         # Current HamClock version is 4.22
         # Original response is exactly 32 bytes including newlines
@@ -183,18 +400,122 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(version_text.encode('utf-8'))
 
+    def handle_metrics(self, path, query):
+        if path.endswith(".json") or query.get("format", [""])[0] == "json":
+            snapshot = metrics.render_json()
+            snapshot["static_cache"] = STATIC_CACHE.stats()
+            snapshot["startup"] = startup.status()
+            snapshot["scheduler"] = SCHEDULER.stats()
+            snapshot["snapshot"] = snapshot_store.STORE.stats()
+            if INGEST is not None:
+                snapshot["ingest"] = INGEST.status()
+            # Per-host upstream counters, once a service has loaded the client
+            if "upstream" in sys.modules:
+                snapshot["upstream"] = sys.modules["upstream"].stats()
+            body = json.dumps(snapshot, indent=1).encode()
+            content_type = "application/json"
+        else:
+            lines = SCHEDULER.prometheus_lines() + (INGEST.prometheus_lines() if INGEST is not None else [])
+            body = (metrics.render_prometheus() + "\n".join(lines) + "\n").encode()
+            content_type = "text/plain; version=0.0.4"
+        self.send_response(200)
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_telemetry(self, query):
+        try:
+            top = min(max(int(query.get("top", ["20"])[0]), 1), TELEMETRY_MAX_TOP)
+        except ValueError:
+            self.send_error(400, "top must be an integer")
+            return
+        snapshot = TELEMETRY.snapshot(top)
+        snapshot["prewarm"] = TELEMETRY.prewarm_targets(top)
+        body = json.dumps(snapshot, indent=1).encode()
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_ready(self):
+        if startup.is_ready():
+            body, code, content_type = b"ready\n", 200, "text/plain"
+        else:
+            body, code, content_type = json.dumps(startup.status()).encode(), 503, "application/json"
+        self.send_response(code)
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_admin_profile(self, query):
+        """
+        /admin/profile?token=T[&routes=/SDO/,/fetchVOACAPArea.pl][&rate=0.2][&tracemalloc=1]
+        Updates the profiler settings given and returns them; routes= (empty) turns it off.
+        """
+        if not ADMIN_TOKEN or query.get("token", [""])[0] != ADMIN_TOKEN:
+            self.send_error(404, "Not Found")
+            return
+        try:
+            routes = query.get("routes", [None])[0]
+            rate = query.get("rate", [None])[0]
+            trace = query.get("tracemalloc", [None])[0]
+            PROFILER.configure(routes=None if routes is None else [r for r in routes.split(",") if r],
+                               rate=None if rate is None else float(rate),
+                               trace_malloc=None if trace is None else trace == "1")
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+        body = json.dumps(PROFILER.describe()).encode()
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_admin_fetch(self, query):
+        """
+        /admin/fetch?token=T[&run=xray|all]
+        Ingestion status when BACKEND_INGEST=1; run= makes a source (or all) due now.
+        """
+        if not ADMIN_TOKEN or INGEST is None or query.get("token", [""])[0] != ADMIN_TOKEN:
+            self.send_error(404, "Not Found")
+            return
+        run = query.get("run", [None])[0]
+        if run is not None:
+            try:
+                INGEST.run_now(None if run == "all" else run)
+            except KeyError:
+                self.send_error(400, f"Unknown source {run}")
+                return
+        body = json.dumps(INGEST.status()).encode()
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
     def handle_voacap_area(self, query):
         try:
-            logger.info(f"Generating dynamic VOACAP Area map for query: {query}")
+            logger.info("Generating dynamic VOACAP Area map for query: %s", query)
             results = voacap_service.generate_voacap_response(query, "REL")
             if results and len(results) == 2:
                 l1, l2 = len(results[0]), len(results[1])
                 self.send_response(200)
                 self.send_header("Content-type", "application/octet-stream")
                 self.send_header("X-2Z-lengths", f"{l1} {l2}")
+                self.send_header("Content-Length", str(l1 + l2))
                 self.end_headers()
                 self.wfile.write(results[0])
                 self.wfile.write(results[1])
+                voacap_ab.maybe_shadow(query, "REL")
             else:
                 self.send_error(500, "Failed to generate VOACAP maps")
         except (BrokenPipeError, ConnectionResetError) as e:
@@ -213,7 +534,7 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
             if "MUF" in path:
                 query['MHZ'] = ['0']
             
-            logger.info(f"Generating dynamic VOACAP {path} map")
+            logger.info("Generating dynamic VOACAP %s map", path)
             map_type = "TOA" if "TOA" in path else ("MUF" if "MUF" in path else "REL")
             results = voacap_service.generate_voacap_response(query, map_type)
             if results and len(results) == 2:
@@ -221,9 +542,11 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
                 self.send_response(200)
                 self.send_header("Content-type", "application/octet-stream")
                 self.send_header("X-2Z-lengths", f"{l1} {l2}")
+                self.send_header("Content-Length", str(l1 + l2))
                 self.end_headers()
                 self.wfile.write(results[0])
                 self.wfile.write(results[1])
+                voacap_ab.maybe_shadow(query, map_type)
             else:
                 self.send_error(500, "Failed to generate VOACAP maps")
         except (BrokenPipeError, ConnectionResetError) as e:
@@ -232,81 +555,92 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
             logger.error(f"Error in handle_voacap_map: {e}", exc_info=True)
             self.send_error(500, str(e))
 
+    def handle_voacap_raw(self, query):
+        try:
+            logger.info("Generating raw VOACAP export for query: %s", query)
+            result = voacap_service.generate_voacap_raw(query)
+            if result:
+                self.send_response(200)
+                self.send_header("Content-type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(result)))
+                self.end_headers()
+                self.wfile.write(result)
+            else:
+                self.send_error(500, "Failed to generate VOACAP raw export")
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning(f"Client disconnected during VOACAP raw response: {e}")
+        except Exception as e:
+            logger.error(f"Error in handle_voacap_raw: {e}", exc_info=True)
+            self.send_error(500, str(e))
+
     def handle_rss(self, query):
         # Shim for RSS feed
+        body = b"HamClock Replacement Server Active - Local Source Feed Running\n"
         self.send_response(200)
         self.send_header("Content-type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(b"HamClock Replacement Server Active - Local Source Feed Running\n")
+        self.wfile.write(body)
 
     def handle_drap(self, query):
         try:
             # Stats for plots
-            stats = drap_service.get_drap_stats()
+            stats = drap_service.get_drap_stats().encode()
             self.send_response(200)
             self.send_header("Content-type", "text/plain")
+            self.send_header("Content-Length", str(len(stats)))
             self.end_headers()
-            self.wfile.write(stats.encode())
+            self.wfile.write(stats)
         except Exception as e:
             logger.error(f"Error in handle_drap: {e}")
             self.send_error(500, str(e))
 
     def handle_world_wx(self):
-        try:
-            # Use the de-proxied original data if available
-            sample_path = os.path.join(DATA_DIR, "worldwx/wx.txt")
-            if os.path.exists(sample_path):
-                logger.info(f"Serving World Weather shim from {sample_path}")
-                with open(sample_path, "rb") as f:
-                    content = f.read()
-                    self.send_response(200)
-                    self.send_header("Content-type", "text/plain")
-                    self.end_headers()
-                    self.wfile.write(content)
-            else:
-                self.send_error(404, "World weather sample not found")
-        except Exception as e:
-            logger.error(f"Error in handle_world_wx: {e}")
-            self.send_error(500, str(e))
+        # The de-proxied original data, with its gzip variant when the client accepts it
+        self.handle_static("/worldwx/wx.txt")
 
     def handle_word_wx(self):
         try:
             logger.info("Generating dynamic Word Wx prevailing stats")
-            result = weather_service.get_prevailing_stats()
+            result = weather_service.get_prevailing_stats().encode()
             self.send_response(200)
             self.send_header("Content-type", "text/plain")
+            self.send_header("Content-Length", str(len(result)))
             self.end_headers()
-            self.wfile.write(result.encode())
+            self.wfile.write(result)
         except Exception as e:
             logger.error(f"Error in handle_word_wx: {e}")
             self.send_error(500, str(e))
 
     def handle_band_conditions(self, query):
         try:
-            logger.info(f"Generating dynamic Band Conditions for query: {query}")
-            result = band_service.get_band_conditions(query)
+            logger.info("Generating dynamic Band Conditions for query: %s", query)
+            result = band_service.get_band_conditions(query).encode()
             self.send_response(200)
             self.send_header("Content-type", "text/plain")
             self.send_header("Content-Length", str(len(result)))
             self.end_headers()
-            self.wfile.write(result.encode())
+            self.wfile.write(result)
         except Exception as e:
             logger.error(f"Error in handle_band_conditions: {e}")
             self.send_error(500, str(e))
 
     def handle_sdo(self, path):
         try:
-            # SDO images are fetched and processed dynamically
-            img_data = sdo_service.get_sdo_image(path)
-            if img_data:
-                logger.debug(f"Serving live SDO image for {path}")
-                self.send_response(200)
-                self.send_header("Content-type", "application/octet-stream")
-                self.send_header("Content-Length", str(len(img_data)))
-                self.end_headers()
-                self.wfile.write(img_data)
+            # SDO images are fetched and processed dynamically into a disk cache
+            cache_path = sdo_service.get_sdo_image_path(path)
+            if cache_path:
+                logger.debug("Serving live SDO image for %s", path)
+                with open(cache_path, "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    self.send_response(200)
+                    self.send_prebuilt_headers(
+                        f"Content-type: application/octet-stream\r\nContent-Length: {size}\r\n".encode("latin-1"))
+                    self.send_file_body(f, size)
             else:
                 self.send_error(404, "SDO image fetch failed")
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning(f"Client disconnected during SDO response: {e}")
         except Exception as e:
             logger.error(f"Error in handle_sdo: {e}")
             self.send_error(500, str(e))
@@ -316,7 +650,7 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
         try:
             lat = float(query.get('lat', [0])[0])
             lng = float(query.get('lng', [0])[0])
-            logger.debug(f"Weather request for lat={lat}, lng={lng}")
+            logger.debug("Weather request for lat=%s, lng=%s", lat, lng)
             raw_data = weather_service.fetch_weather(lat, lng)
             formatted = weather_service.format_for_hamclock(raw_data, lat, lng)
             
@@ -326,7 +660,7 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
                 return
 
             encoded_formatted = formatted.encode('utf-8')
-            logger.debug(f"Sending weather data ({len(encoded_formatted)} bytes)")
+            logger.debug("Sending weather data (%s bytes)", len(encoded_formatted))
             self.send_response(200)
             self.send_header("Content-type", "text/plain")
             self.send_header("Content-Length", str(len(encoded_formatted)))
@@ -338,13 +672,342 @@ class HamClockBackend(http.server.SimpleHTTPRequestHandler):
             logger.error(f"Error in handle_weather: {e}", exc_info=True)
             self.send_error(500, str(e))
 
+def normalize_path(path):
+    """Remove potential prefixes like /ham/HamClock/"""
+    if path.startswith("/ham/HamClock"):
+        return path[len("/ham/HamClock"):]
+    return path
+
+ROUTES = RouteTable()
+
+def register_route(path, handler, prefix=False, suffix=False, **meta):
+    """
+    Add an endpoint. `handler(request_handler, normalized_path, query)`;
+    `meta` is content_type, cacheable, executor and cost (see routes.Route).
+    """
+    if prefix:
+        ROUTES.add_prefix(path, handler, **meta)
+    elif suffix:
+        ROUTES.add_suffix(path, handler, **meta)
+    else:
+        ROUTES.add(path, handler, **meta)
+
+_static = lambda h, path, query: h.handle_static(path)
+_voacap_map = lambda h, path, query: h.handle_voacap_map(path)
+_BINARY = "application/octet-stream"
+
+register_route("/fetchIPGeoloc.pl", lambda h, path, query: h.handle_geoloc(query), executor="io", cost=1)
+register_route("/fetchPSKReporter.pl", lambda h, path, query: h.handle_psk(query), executor="io", cost=1)
+register_route("/version.pl", lambda h, path, query: h.handle_version(query))
+register_route("/RSS/web15rss.pl", lambda h, path, query: h.handle_rss(query))
+register_route("/wx.pl", lambda h, path, query: h.handle_weather(query), executor="io", cost=1)
+register_route("/worldwx/wx.txt", lambda h, path, query: h.handle_world_wx(), executor="io")
+register_route("/fetchVOACAPArea.pl", lambda h, path, query: h.handle_voacap_area(query), content_type=_BINARY, executor="cpu", cost=4)
+register_route("/fetchVOACAPRaw.pl", lambda h, path, query: h.handle_voacap_raw(query), content_type=_BINARY, executor="cpu", cost=4)
+register_route("/fetchBandConditions.pl", lambda h, path, query: h.handle_band_conditions(query), executor="cpu", cost=2)
+register_route("/fetchVOACAP-MUF.pl", _voacap_map, content_type=_BINARY, executor="cpu", cost=4)
+register_route("/fetchVOACAP-TOA.pl", _voacap_map, content_type=_BINARY, executor="cpu", cost=4)
+register_route("/fetchDRAP.pl", lambda h, path, query: h.handle_drap(query), executor="io")
+register_route("/fetchWordWx.pl", lambda h, path, query: h.handle_word_wx(), executor="io")
+register_route("/metrics", lambda h, path, query: h.handle_metrics(path, query))
+register_route("/telemetry.json", lambda h, path, query: h.handle_telemetry(query), content_type="application/json")
+register_route("/ready", lambda h, path, query: h.handle_ready())
+register_route("/admin/profile", lambda h, path, query: h.handle_admin_profile(query), content_type="application/json")
+register_route("/admin/fetch", lambda h, path, query: h.handle_admin_fetch(query), content_type="application/json")
+register_route("/metrics.json", lambda h, path, query: h.handle_metrics(path, query), content_type="application/json")
+# Serve as static for now or implement shim
+for _path in ["/fetchONTA.pl", "/fetchAurora.pl", "/fetchDXPeds.pl"]:
+    register_route(_path, _static, cacheable=True)
+register_route("/SDO/", lambda h, path, query: h.handle_sdo(path), prefix=True, content_type=_BINARY, executor="io", cost=1)
+for _path in STATIC_DIRS:
+    register_route(_path, _static, prefix=True, cacheable=True)
+for _path in STATIC_SUFFIXES:
+    register_route(_path, _static, suffix=True, cacheable=True,
+                   content_type=_BINARY if _path.endswith(".z") else "text/plain")
+
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     allow_reuse_address = True
 
+class ReusePortTCPServer(ThreadedTCPServer):
+    """One per prefork worker; the kernel spreads connections over them."""
+    allow_reuse_port = True
+
+def render_request(raw, client_address=("127.0.0.1", 0), refusal=None):
+    """Run HamClockBackend over an in-memory request.
+
+    Returns (raw response bytes, close_connection, access log records).
+    `refusal` is (429 or 503, retry after) when the fair scheduler refused it.
+
+    The async front end uses this so every route produces exactly the bytes
+    and headers of the threaded server. Top-level so it can run in a
+    ProcessPoolExecutor worker.
+    """
+    handler = HamClockBackend.__new__(HamClockBackend)
+    handler.directory = os.getcwd()
+    handler.client_address = client_address
+    handler.server = None
+    handler.request = None
+    handler.rfile = io.BytesIO(raw)
+    handler.wfile = io.BytesIO()
+    handler.close_connection = True
+    handler.access_sink = []
+    handler.sched_refusal = refusal
+    handler.handle_one_request()
+    return handler.wfile.getvalue(), handler.close_connection, handler.access_sink
+
+def raw_header(raw, name):
+    """Value of header `name` (lower-case bytes) in a raw request head, or None."""
+    for line in raw.split(b"\r\n")[1:]:
+        key, sep, value = line.partition(b":")
+        if sep and key.strip().lower() == name:
+            return value.strip().decode("latin-1")
+    return None
+
+def match_raw(raw):
+    """Route for a raw request head, or None."""
+    try:
+        target = raw.split(b" ", 2)[1].decode("latin-1")
+    except IndexError:
+        return None
+    return ROUTES.match(normalize_path(urllib.parse.urlparse(target).path))
+
+class AsyncBackend:
+    """asyncio front end: static/text routes on the loop, VOACAP on a process
+    pool, upstream-bound routes (PSKReporter, wttr.in, ip-api, SDO) on a
+    bounded thread pool so blocking fetches and retry sleeps never stall it.
+    """
+
+    def __init__(self, host="127.0.0.1", port=PORT):
+        # Imported here: only async mode needs them, and they cost ~50 ms of startup
+        import multiprocessing
+        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+        self.host = host
+        self.port = port
+        self.executors = {
+            "io": ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io"),
+            # spawn: the parent already runs executor threads when workers start
+            "cpu": ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=init_cpu_worker),
+        }
+
+    async def handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername") or ("127.0.0.1", 0)
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            close = False
+            while not close:
+                try:
+                    raw = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HamClockBackend.timeout)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    return
+                route = match_raw(raw)
+                kind = route.executor if route is not None else "loop"
+                started = time.perf_counter()
+                client = refusal = None
+                if route is not None and route.cost:
+                    client = access_log.client_key(raw_header(raw, b"user-agent"), peer[0])
+                    retry_after = SCHEDULER.throttle(client, route.cost)
+                    if retry_after:
+                        refusal = (429, retry_after)
+                    elif not await SCHEDULER.acquire_async(client, route.cost):
+                        refusal = (503, SCHEDULER.max_wait)
+                    if refusal is not None:
+                        kind, client = "loop", None
+                if route is not None:
+                    metrics.request_started(route.name)
+                try:
+                    if kind == "loop":
+                        response, close, records = render_request(raw, peer[:2], refusal)
+                    else:
+                        response, close, records = await loop.run_in_executor(self.executors[kind], render_request, raw, peer[:2])
+                    writer.write(response)
+                    await writer.drain()
+                finally:
+                    if client is not None:
+                        SCHEDULER.release(client, time.perf_counter() - started)
+                    if route is not None:
+                        metrics.request_finished(route.name)
+                for fields in records:
+                    # Include executor queueing and the socket write
+                    elapsed = time.perf_counter() - started
+                    fields["latency_ms"] = round(elapsed * 1000.0, 3)
+                    metrics.observe_request(fields["route"] or "unmatched", fields["status"], fields["bytes"],
+                                            elapsed, fields["cache"])
+                    TELEMETRY.observe(fields)
+                    access_log.log_access(fields)
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logger.warning(f"Client disconnected during async response: {e}")
+        except Exception as e:
+            logger.error(f"Error in async request handling: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        import asyncio
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, reuse_address=True)
+        print(f"HamClock Replacement Server (async) running on port {self.port}")
+        startup.start_warm_up(WARM_UP_EXTRA)
+        # Workers start on demand; start them all now so they warm up in the background
+        for _ in range(CPU_WORKERS):
+            self.executors["cpu"].submit(int)
+        if INGEST_ENABLED:
+            start_ingest()
+        async with server:
+            await server.serve_forever()
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# Run after the service imports during warm-up
+WARM_UP_EXTRA = [lambda: weather_service.get_timezone_finder()]
+
+def warm_up_services():
+    """Import every service now (process pool initializer, prefork master)."""
+    startup.warm_up(WARM_UP_EXTRA)
+
+def init_cpu_worker():
+    """Process pool initializer: stderr logging (the parent writes the access log), then warm up."""
+    access_log.setup_logging(access_path="")
+    warm_up_services()
+
+def preload_shared_assets():
+    """
+    Load read-only assets in the prefork master so workers share the pages
+    copy-on-write. The VOACAP base maps, colour scales and trig grids are
+    loaded (memory-mapped from the asset bundle) when voacap_service is
+    imported; warm-up also builds the timezone index. Large static files
+    (CTY, maps) are streamed with sendfile from the shared page cache.
+    """
+    warm_up_services()
+    # Keep the cyclic GC from touching (and so copying) every preloaded object
+    gc.freeze()
+
+def start_ingest():
+    """Import the fetchers and run the ingestion scheduler on a daemon thread."""
+
+    def run():
+        global INGEST
+        import scheduler
+        INGEST = scheduler.build_scheduler()
+        INGEST.prime()
+        INGEST.loop()
+
+    thread = threading.Thread(target=run, name="ingest", daemon=True)
+    thread.start()
+    return thread
+
+class PreforkMaster:
+    """Pre-fork front end: N threaded workers bind PORT with SO_REUSEPORT.
+
+    The master loads shared assets, forks the workers and restarts any that
+    die. Each worker keeps its own static cache (validated against file
+    mtimes, so workers never disagree on content); the SDO cache and the
+    processed data are already on disk. Metrics are the one per-process
+    store that must be merged: workers publish them under RUN_DIR and a
+    scrape of any worker reports the totals.
+    """
+
+    # A worker that dies sooner than this after starting counts as crash-looping
+    MIN_UPTIME = 5.0
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, workers=WORKERS, host="127.0.0.1", port=PORT, run_dir=RUN_DIR):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.run_dir = run_dir
+        self.children = {}  # pid -> (worker index, start time)
+        self.backoff = {}   # worker index -> seconds to wait before the next restart
+        self.stopping = False
+
+    def spawn(self, idx):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.run_worker(idx)
+            except BaseException as e:
+                logger.error(f"Worker {idx} failed: {e}", exc_info=True)
+                code = 1
+            finally:
+                access_log.stop_logging()
+                os._exit(code)
+        self.children[pid] = (idx, time.monotonic())
+
+    def run_worker(self, idx):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master handles Ctrl-C
+        access_log.reinit_after_fork(access_log.worker_access_path(idx))
+        metrics.share(self.run_dir, idx)
+        with ReusePortTCPServer((self.host, self.port), HamClockBackend) as httpd:
+            # shutdown() waits for serve_forever, so it can't run on this thread
+            signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=httpd.shutdown).start())
+            logger.info(f"Worker {idx} (pid {os.getpid()}) serving on port {self.port}")
+            httpd.serve_forever()
+
+    def stop(self, *_):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def serve_forever(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        for stale in os.listdir(self.run_dir):
+            os.remove(os.path.join(self.run_dir, stale))
+        preload_shared_assets()
+        for idx in range(self.workers):
+            self.spawn(idx)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"HamClock Replacement Server (prefork, {self.workers} workers) running on port {self.port}")
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            idx, started = self.children.pop(pid, (None, None))
+            if idx is None or self.stopping:
+                continue
+            uptime = time.monotonic() - started
+            logger.error(f"Worker {idx} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)} "
+                         f"after {uptime:.1f}s; restarting")
+            if uptime < self.MIN_UPTIME:
+                delay = self.backoff.get(idx, 0.5)
+                self.backoff[idx] = min(delay * 2, self.MAX_BACKOFF)
+                time.sleep(delay)
+            else:
+                self.backoff.pop(idx, None)
+            if not self.stopping:
+                self.spawn(idx)
+
 if __name__ == "__main__":
+    # Here rather than at import, so scripts and tests importing server keep their logging
+    access_log.setup_logging()
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
-        
-    with ThreadedTCPServer(("127.0.0.1", PORT), HamClockBackend) as httpd:
-        print(f"HamClock Replacement Server running on port {PORT}")
-        httpd.serve_forever()
+
+    if SERVER_MODE == "prefork":
+        if INGEST_ENABLED:
+            logger.warning("BACKEND_INGEST is ignored in prefork mode; run ingestion/scheduler.py")
+        PreforkMaster().serve_forever()
+    elif SERVER_MODE == "async":
+        import asyncio
+        backend = AsyncBackend()
+        try:
+            asyncio.run(backend.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            backend.shutdown()
+    else:
+        with ThreadedTCPServer(("127.0.0.1", PORT), HamClockBackend) as httpd:
+            print(f"HamClock Replacement Server running on port {PORT}")
+            startup.start_warm_up(WARM_UP_EXTRA)
+            if INGEST_ENABLED:
+                start_ingest()
+            httpd.serve_forever()
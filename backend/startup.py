@@ -0,0 +1,108 @@
+"""
+Lazy service imports, background warm-up and readiness for the backend.
+
+The service modules pull in requests, NumPy, PIL, timezonefinder and pytz
+and load the VOACAP assets at import, so server.py registers them as
+LazyModule stand-ins: the listener binds first, then warm_up() imports them
+on a background thread. A request that needs a module before warm-up gets
+to it imports it itself (the import lock makes that safe).
+
+    /ready   200 once warm-up has finished, 503 with the pending modules before
+"""
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+_modules = []
+_ready = threading.Event()
+_state = {"started": time.time(), "warm_up_ms": None, "error": None}
+
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access."""
+
+    def __init__(self, name, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._load_ms = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    t = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    self._load_ms = round((time.perf_counter() - t) * 1000.0, 1)
+                    self._module = module
+                module = self._module
+        return module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._module or self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r} ({'loaded' if self.loaded else 'pending'})>"
+
+
+def lazy(name, on_load=None):
+    """Register a module to be imported on first use or by warm_up()."""
+    module = LazyModule(name, on_load)
+    _modules.append(module)
+    return module
+
+
+def warm_up(extra=()):
+    """Import every registered module, then run `extra` callables; sets the ready flag."""
+    t = time.perf_counter()
+    for module in _modules:
+        module.load()
+    for fn in extra:
+        fn()
+    _state["warm_up_ms"] = round((time.perf_counter() - t) * 1000.0, 1)
+    _ready.set()
+    logger.info(f"Warm-up finished in {_state['warm_up_ms']} ms")
+
+
+def start_warm_up(extra=()):
+    """warm_up() on a daemon thread. A service that fails to import stops the process."""
+
+    def run():
+        try:
+            warm_up(extra)
+        except ImportError as e:
+            _state["error"] = str(e)
+            logger.error(f"Failed to import services: {e}")
+            print(f"CRITICAL ERROR: {e}", file=sys.stderr)
+            os._exit(1)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def status():
+    return {
+        "ready": _ready.is_set(),
+        "uptime_s": round(time.time() - _state["started"], 1),
+        "warm_up_ms": _state["warm_up_ms"],
+        "error": _state["error"],
+        "modules": {m._name: m._load_ms if m.loaded else None for m in _modules},
+    }
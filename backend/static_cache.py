@@ -0,0 +1,197 @@
+"""
+In-memory cache of static responses for the backend.
+
+Files under processed_data change at most every ingestion cycle, so each
+cached entry keeps the body together with its prebuilt header block
+(Content-type, Content-Length, ETag, Last-Modified). A request costs one
+os.stat: an entry is reused while the file's (mtime_ns, size) is unchanged
+and rebuilt otherwise. Entries are evicted least-recently-used once the
+total cached body size exceeds the byte budget. Files above the per-entry
+limit are never held in memory: their entry has body None and the server
+streams them from disk with sendfile.
+
+Products published through ingestion/snapshot_store.py up to the per-entry
+limit are already in memory: lookup_published() keys their entry on the
+published stamp instead of a stat. Larger products go through lookup().
+
+Gzip variants (<file>.gz, written by ingestion/gzip_publisher.py with the
+source's mtime) are cached as separate entries and only used while their
+mtime still matches the source. Identity responses for paths that can have
+a variant (`gzip_suffixes`) carry Vary: Accept-Encoding as well, so shared
+caches keep the two apart.
+"""
+import os
+import threading
+import email.utils
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = int(os.environ.get("STATIC_CACHE_BYTES", 32 * 1024 * 1024))
+DEFAULT_MAX_ENTRY_BYTES = int(os.environ.get("STATIC_CACHE_ENTRY_BYTES", 64 * 1024))
+
+
+class StaticEntry:
+    __slots__ = ("path", "stamp", "body", "headers", "etag", "last_modified", "mtime",
+                 "content_type", "encoding", "vary")
+
+    def __init__(self, path, stamp, body, content_type, encoding=None, vary=False):
+        self.path = path
+        self.stamp = stamp
+        self.body = body
+        self.content_type = content_type
+        self.encoding = encoding
+        self.vary = bool(encoding) or vary
+        mtime_ns, size = stamp
+        self.mtime = mtime_ns // 1_000_000_000
+        self.etag = f'"{size:x}-{mtime_ns:x}"'
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        self.headers = (
+            f"Content-type: {content_type}\r\n"
+            f"Content-Length: {size}\r\n"
+            f"ETag: {self.etag}\r\n"
+            f"Last-Modified: {self.last_modified}\r\n"
+            + (f"Content-Encoding: {encoding}\r\n" if encoding else "")
+            + ("Vary: Accept-Encoding\r\n" if self.vary else "")
+        ).encode("latin-1")
+
+    def not_modified(self, if_none_match=None, if_modified_since=None):
+        """True if the conditional request headers allow a 304."""
+        if if_none_match is not None:
+            # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or any(t.removeprefix("W/") == self.etag for t in tags)
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since is not None and self.mtime <= since.timestamp()
+        return False
+
+
+def accepts_gzip(accept_encoding):
+    """True if an Accept-Encoding header value allows gzip."""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() not in ("gzip", "x-gzip"):
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class StaticCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entry_bytes=None, gzip_suffixes=()):
+        self.max_bytes = max_bytes
+        self.gzip_suffixes = tuple(gzip_suffixes)
+        # A single file may take at most a quarter of the budget
+        if max_entry_bytes is None:
+            max_entry_bytes = min(DEFAULT_MAX_ENTRY_BYTES, max_bytes // 4)
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, local_path, content_type, encoding=None, st=None):
+        """
+        Return a StaticEntry for `local_path`, or None if it is not a file.
+        Pass `st` to describe a file the caller already holds open.
+        """
+        return self.lookup(local_path, content_type, encoding, st)[0]
+
+    def lookup(self, local_path, content_type, encoding=None, st=None):
+        """Like get(), but returns (entry, served from memory without a read)."""
+        if st is None:
+            try:
+                st = os.stat(local_path)
+            except OSError:
+                self.invalidate(local_path)
+                return None, False
+        stamp = (st.st_mtime_ns, st.st_size)
+        if st.st_size > self.max_entry_bytes:
+            return self._entry(local_path, stamp, None, content_type, encoding), False
+
+        with self.lock:
+            entry = self.entries.get(local_path)
+            if entry is not None and entry.stamp == stamp:
+                self.entries.move_to_end(local_path)
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+
+        try:
+            with open(local_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self.invalidate(local_path)
+            return None, False
+        entry = self._entry(local_path, (stamp[0], len(body)), body, content_type, encoding)
+        if len(body) <= self.max_entry_bytes:
+            self._store(entry)
+        return entry, False
+
+    def lookup_published(self, local_path, content_type, stamp, body):
+        """
+        lookup() for a body already held in memory (a snapshot_store product):
+        the entry is keyed on the published stamp, so neither stat nor read.
+        """
+        with self.lock:
+            entry = self.entries.get(local_path)
+            if entry is not None and entry.stamp == stamp:
+                self.entries.move_to_end(local_path)
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+        entry = self._entry(local_path, stamp, body, content_type)
+        if len(body) <= self.max_entry_bytes:
+            self._store(entry)
+        return entry, False
+
+    def _entry(self, local_path, stamp, body, content_type, encoding=None):
+        return StaticEntry(local_path, stamp, body, content_type, encoding,
+                           vary=local_path.endswith(self.gzip_suffixes))
+
+    def get_gzip(self, local_path, content_type):
+        """The current gzip variant of `local_path`, or None if there is none."""
+        return self.lookup_gzip(local_path, content_type)[0]
+
+    def lookup_gzip(self, local_path, content_type):
+        gz_path = local_path + ".gz"
+        try:
+            st = os.stat(local_path)
+            gz_st = os.stat(gz_path)
+        except OSError:
+            return None, False
+        if gz_st.st_mtime_ns != st.st_mtime_ns:
+            return None, False  # source republished since the variant was written
+        return self.lookup(gz_path, content_type, encoding="gzip", st=gz_st)
+
+    def _store(self, entry):
+        with self.lock:
+            old = self.entries.pop(entry.path, None)
+            if old is not None:
+                self.total_bytes -= len(old.body)
+            self.entries[entry.path] = entry
+            self.total_bytes += len(entry.body)
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted.body)
+
+    def invalidate(self, local_path):
+        with self.lock:
+            old = self.entries.pop(local_path, None)
+            if old is not None:
+                self.total_bytes -= len(old.body)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.total_bytes,
+                    "hits": self.hits, "misses": self.misses}
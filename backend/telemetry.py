@@ -0,0 +1,217 @@
+"""
+Fleet telemetry from the request path, in bounded memory.
+
+What is kept (fixed size regardless of traffic):
+    unique clients     HyperLogLog over client ids (2**14 registers, ~0.8% error)
+    versions           one small HyperLogLog per HamClock version -> distinct clients per version
+    platforms          request counts per platform string
+    uptime             histogram of the uptime HamClock reports in its User-Agent
+    routes, clients    space-saving top-k (request counts)
+    DE locations       space-saving top-k of Maidenhead squares from VOACAP/band/wx queries
+    request mix        Count-Min sketch over (client, route) -> per-client route counts
+
+The DE heavy hitters (prewarm_targets()) are the locations worth pre-computing
+for. Exposed by the server at /telemetry.json.
+"""
+import math
+import time
+import array
+import hashlib
+import threading
+import urllib.parse
+
+import access_log
+
+MAX_VERSIONS = 32
+UPTIME_BUCKETS = ((3600, "<1h"), (86400, "<1d"), (7 * 86400, "<1w"), (30 * 86400, "<30d"))
+
+# route -> (lat param, lng param) giving the client's DE location
+DE_PARAMS = {
+    "/fetchVOACAPArea.pl": ("TXLAT", "TXLNG"),
+    "/fetchVOACAPRaw.pl": ("TXLAT", "TXLNG"),
+    "/fetchVOACAP-MUF.pl": ("TXLAT", "TXLNG"),
+    "/fetchVOACAP-TOA.pl": ("TXLAT", "TXLNG"),
+    "/fetchBandConditions.pl": ("TXLAT", "TXLNG"),
+    "/wx.pl": ("lat", "lng"),
+}
+
+
+def hash64(value):
+    """Stable 64-bit hash (unlike hash(), identical across processes and runs)."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, h):
+        idx = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array.array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, key):
+        h = hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, n=1):
+        for row, i in zip(self.rows, self._indexes(key)):
+            row[i] += n
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+
+class SpaceSaving:
+    """Top-k heavy hitters: counts are overestimated by at most `error`."""
+
+    def __init__(self, k=64):
+        self.k = k
+        self.counts = {}  # item -> [count, error]
+
+    def add(self, item, n=1):
+        entry = self.counts.get(item)
+        if entry is not None:
+            entry[0] += n
+        elif len(self.counts) < self.k:
+            self.counts[item] = [n, 0]
+        else:
+            victim = min(self.counts, key=lambda key: self.counts[key][0])
+            floor = self.counts.pop(victim)[0]
+            self.counts[item] = [floor + n, floor]
+
+    def top(self, n=None):
+        items = sorted(self.counts.items(), key=lambda item: -item[1][0])
+        return [(item, count, error) for item, (count, error) in items[:n]]
+
+
+def maidenhead(lat, lng):
+    """4-character grid square for a location."""
+    lng = min(max(lng + 180.0, 0.0), 359.999)
+    lat = min(max(lat + 90.0, 0.0), 179.999)
+    return f"{chr(65 + int(lng // 20))}{chr(65 + int(lat // 10))}{int(lng % 20 // 2)}{int(lat % 10)}"
+
+
+def grid_center(grid):
+    lng = (ord(grid[0]) - 65) * 20 + int(grid[2]) * 2 + 1 - 180
+    lat = (ord(grid[1]) - 65) * 10 + int(grid[3]) + 0.5 - 90
+    return lat, lng
+
+
+class Telemetry:
+    def __init__(self, top_k=64, de_k=256):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.clients = HyperLogLog(14)
+        self.versions = {}      # version -> HyperLogLog of client ids
+        self.version_requests = {}
+        self.platforms = {}
+        self.uptime = {label: 0 for _, label in UPTIME_BUCKETS}
+        self.uptime[">=30d"] = 0
+        self.routes = SpaceSaving(top_k)
+        self.heavy_clients = SpaceSaving(top_k)
+        self.de = SpaceSaving(de_k)
+        self.mix = CountMinSketch()
+
+    def observe(self, fields):
+        """Feed one access record (see HamClockBackend._end_request)."""
+        platform, version, cid, up = access_log.parse_client(fields.get("ua"))
+        client = fields.get("client") or cid
+        route = fields.get("route") or "unmatched"
+        grid = self._de_grid(route, fields.get("path", ""))
+        with self._lock:
+            self.requests += 1
+            self.routes.add(route)
+            client_hash = hash64(client) if client else None
+            if client:
+                self.clients.add_hash(client_hash)
+                self.heavy_clients.add(client)
+                self.mix.add(f"{client}\0{route}")
+            if version:
+                hll = self.versions.get(version)
+                if hll is None and len(self.versions) < MAX_VERSIONS:
+                    hll = self.versions[version] = HyperLogLog(10)
+                if hll is not None:
+                    if client:
+                        hll.add_hash(client_hash)
+                    self.version_requests[version] = self.version_requests.get(version, 0) + 1
+            if platform:
+                if platform in self.platforms or len(self.platforms) < MAX_VERSIONS:
+                    self.platforms[platform] = self.platforms.get(platform, 0) + 1
+            if up is not None:
+                self.uptime[self._uptime_bucket(up)] += 1
+            if grid:
+                self.de.add(grid)
+
+    @staticmethod
+    def _uptime_bucket(up):
+        for limit, label in UPTIME_BUCKETS:
+            if up < limit:
+                return label
+        return ">=30d"
+
+    @staticmethod
+    def _de_grid(route, path):
+        params = DE_PARAMS.get(route)
+        if params is None:
+            return None
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(path).query)
+        try:
+            return maidenhead(float(query[params[0]][0]), float(query[params[1]][0]))
+        except (KeyError, ValueError, IndexError):
+            return None
+
+    def prewarm_targets(self, n=20):
+        """Most requested DE squares as [{grid, lat, lng, requests}] for cache pre-warming."""
+        with self._lock:
+            top = self.de.top(n)
+        return [{"grid": grid, "lat": grid_center(grid)[0], "lng": grid_center(grid)[1], "requests": count}
+                for grid, count, _ in top]
+
+    def snapshot(self, top=20):
+        with self._lock:
+            routes = self.routes.top()
+            heavy = self.heavy_clients.top(top)
+            return {
+                "since": round(self.started),
+                "requests": self.requests,
+                "unique_clients": self.clients.count(),
+                "versions": {v: {"clients": hll.count(), "requests": self.version_requests.get(v, 0)}
+                             for v, hll in sorted(self.versions.items())},
+                "platforms": dict(self.platforms),
+                "uptime": dict(self.uptime),
+                "routes": [{"route": r, "requests": c, "error": e} for r, c, e in routes],
+                "clients": [{"client": c, "requests": n, "error": e,
+                             "mix": {r: m for r, _, _ in routes if (m := self.mix.estimate(f"{c}\0{r}"))}}
+                            for c, n, e in heavy],
+                "de": [{"grid": g, "requests": c, "error": e} for g, c, e in self.de.top(top)],
+            }
@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import access_log
+
+def test_parse_client():
+    print("Testing HamClock User-Agent parsing...")
+    ua = "HamClock-linux/4.22 (id 1301431275 up 510) crc 0"
+    assert access_log.parse_client(ua) == ("linux", "4.22", "1301431275", 510)
+    assert access_log.parse_client("curl/8.0") == (None, None, None, None)
+    assert access_log.client_key(ua, "10.0.0.1") == "1301431275"
+    assert access_log.client_key(None, "10.0.0.1") == "10.0.0.1"
+    assert access_log.worker_access_path(2, "logs/access.log") == "logs/access.w2.log"
+
+def test_json_formatter():
+    print("\nTesting access log formatting...")
+    record = logging.LogRecord("hamclock.access", logging.INFO, __file__, 1, {"route": "/version.pl", "status": 200}, None, None)
+    line = json.loads(access_log.JsonFormatter().format(record))
+    assert line["route"] == "/version.pl" and line["status"] == 200 and "ts" in line
+
+def test_missing_status():
+    print("\nTesting requests that ended without a response...")
+    access_log.log_access({"route": "/telemetry.json", "status": None})  # must not raise
+
+def test_import_keeps_logging():
+    print("\nTesting that importing server leaves logging alone...")
+    handlers = list(logging.getLogger().handlers)
+    import server
+    assert logging.getLogger().handlers == handlers and not access_log._listeners
+
+if __name__ == "__main__":
+    test_parse_client()
+    test_json_formatter()
+    test_missing_status()
+    test_import_keeps_logging()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import server
+
+def _get(port, path):
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+        data = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return data
+            data += chunk
+
+def test_blocking_routes_use_executors():
+    print("Testing that blocking routes are not run on the event loop...")
+    for path in ("/worldwx/wx.txt", "/fetchDRAP.pl", "/fetchWordWx.pl"):
+        route = server.ROUTES.match(path)
+        # Off the loop, but cheap enough to stay outside the per-client token bucket
+        assert route.executor == "io" and route.cost == 0, path
+
+def test_slow_handler_does_not_block_static():
+    print("\nTesting a slow executor route next to a static request...")
+    backend = server.AsyncBackend()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {}
+
+    async def serve():
+        srv = await asyncio.start_server(backend.handle_client, "127.0.0.1", 0)
+        state["port"] = srv.sockets[0].getsockname()[1]
+        state["server"] = srv
+        started.set()
+
+    thread = threading.Thread(target=lambda: (loop.run_until_complete(serve()), loop.run_forever()), daemon=True)
+    thread.start()
+    started.wait(5)
+    saved_dir = server.DATA_DIR
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "geomag"))
+        with open(os.path.join(d, "geomag", "kindex.txt"), "w") as f:
+            f.write("1.00\n2.33\n")
+        server.DATA_DIR = d
+        try:
+            # Removed from the global table in the finally below
+            server.register_route("/test/slow.pl", lambda h, path, query: (time.sleep(1.0), h.handle_version(query)),
+                                  executor="io", cost=1)
+            slow = {}
+            t = threading.Thread(target=lambda: slow.update(body=_get(state["port"], "/test/slow.pl")))
+            t.start()
+            time.sleep(0.1)
+            t0 = time.perf_counter()
+            static = _get(state["port"], "/geomag/kindex.txt")
+            elapsed = time.perf_counter() - t0
+            t.join()
+            print(f"  static answered in {elapsed * 1000:.1f} ms while the slow route ran")
+            assert static.startswith(b"HTTP/1.1 200") and static.endswith(b"1.00\n2.33\n")
+            assert elapsed < 0.5 and slow["body"].startswith(b"HTTP/1.1 200")
+        finally:
+            server.DATA_DIR = saved_dir
+            server.ROUTES.exact.pop("/test/slow.pl", None)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(5)
+            for executor in backend.executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == "__main__":
+    test_blocking_routes_use_executors()
+    test_slow_handler_does_not_block_static()
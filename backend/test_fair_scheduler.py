@@ -0,0 +1,44 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fair_scheduler import FairScheduler, parse_weights
+
+def test_token_bucket():
+    print("Testing per-client token buckets...")
+    s = FairScheduler(slots=4, rate=1.0, burst=8)
+    assert s.throttle("a", 4) == 0 and s.throttle("a", 4) == 0
+    retry = s.throttle("a", 4)
+    assert 3.9 < retry <= 4.0
+    assert s.throttle("b", 4) == 0  # other clients unaffected
+    top = {c["client"]: c for c in s.stats()["top"]}
+    assert top["a"]["requests"] == 2 and top["a"]["throttled"] == 1 and top["a"]["cost"] == 8
+
+def test_fair_queueing():
+    print("\nTesting weighted fair queueing order...")
+    s = FairScheduler(slots=1, rate=1.0, burst=100)
+    order = []
+    assert s.enqueue("spammer", 4, None) is None  # holds the only slot
+    waiters = [s.enqueue("spammer", 4, lambda i=i: order.append(f"spammer{i}")) for i in range(3)]
+    s.enqueue("quiet", 4, lambda: order.append("quiet"))
+    assert s.stats()["queued"] == 4
+    s.release("spammer")
+    assert order == ["quiet"]  # ahead of the spammer's earlier-queued requests
+    s.release("quiet")
+    s.release("spammer")
+    s.release("spammer")
+    assert order == ["quiet", "spammer0", "spammer1", "spammer2"]
+    # A cancelled waiter is skipped
+    s2 = FairScheduler(slots=1)
+    s2.enqueue("a", 1, None)
+    w = s2.enqueue("b", 1, lambda: order.append("never"))
+    assert s2.cancel(w)
+    s2.release("a")
+    assert "never" not in order and s2.stats()["busy"] == 0
+
+def test_weights():
+    assert parse_weights("1301431275:2, 10.0.0.5:0.5") == {"1301431275": 2.0, "10.0.0.5": 0.5}
+
+if __name__ == "__main__":
+    test_token_bucket()
+    test_fair_queueing()
+    test_weights()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import snapshot_store
+import scheduler
+
+def test_intervals_and_backoff():
+    print("Testing per-source intervals, backoff and run-now...")
+    with tempfile.TemporaryDirectory() as d:
+        store = snapshot_store.SnapshotStore(d, check_interval=0)
+        calls = []
+        fail = {"flaky": True}
+
+        def good():
+            calls.append("good")
+            store.publish("xray/xray.txt", "x\n")
+
+        def flaky():
+            calls.append("flaky")
+            if fail["flaky"]:
+                raise IOError("upstream down")
+
+        def silent():
+            calls.append("silent")  # logs and swallows its error: publishes nothing
+
+        rounds = []
+        sched = scheduler.IngestScheduler(
+            [scheduler.Source("good", good, 300, ("xray/xray.txt",)),
+             scheduler.Source("flaky", flaky, 600),
+             scheduler.Source("silent", silent, 60, ("Bz/Bz.txt",))],
+            store=store, jitter=0.0, backoff_base=10, backoff_max=25, after_run=lambda: rounds.append(1))
+        sched.prime()
+        assert sched.run_pending() == 3 and rounds == [1]
+        status = sched.status()["sources"]
+        assert status["good"]["failures"] == 0 and 299 <= status["good"]["next_in_s"] <= 300
+        assert status["flaky"]["failures"] == 1 and 9 <= status["flaky"]["next_in_s"] <= 10
+        assert status["silent"]["last_error"] == "not published: Bz/Bz.txt"
+
+        # Consecutive failures double the retry delay up to the cap
+        for expected in (20, 25):
+            sched.sources["flaky"].next_run = 0.0
+            sched.run_pending()
+            assert expected - 1 <= sched.status()["sources"]["flaky"]["next_in_s"] <= expected
+        assert sched.run_pending() == 0
+
+        fail["flaky"] = False
+        sched.run_now("flaky")
+        del calls[:]
+        assert sched.run_pending() == 1 and calls == ["flaky"]
+        assert sched.status()["sources"]["flaky"]["failures"] == 0
+        sched.run_now()
+        assert sched.run_pending() == 3
+
+def test_prime_and_staleness():
+    print("\nTesting start-up age from disk and the staleness SLA...")
+    with tempfile.TemporaryDirectory() as d:
+        store = snapshot_store.SnapshotStore(d, check_interval=0)
+        store.publish("dst/dst.txt", "x\n")
+        old = time.time() - 5000
+        store.publish("cty/cty.txt", "x\n")
+        os.utime(store.path("cty/cty.txt"), (old, old))
+        sched = scheduler.IngestScheduler(
+            [scheduler.Source("dst", lambda: None, 3600, ("dst/dst.txt",)),
+             scheduler.Source("cty", lambda: None, 1000, files=("cty/cty.txt",)),
+             scheduler.Source("new", lambda: None, 60, ("new.txt",))],
+            store=store, jitter=0.0)
+        sched.prime()
+        sched.check_staleness()
+        status = sched.status()["sources"]
+        assert status["dst"]["next_in_s"] > 3500 and not status["dst"]["stale"]
+        assert status["cty"]["next_in_s"] == 0 and status["cty"]["stale"]  # 5000 s > 3 x 1000 s
+        assert status["new"]["next_in_s"] == 0 and status["new"]["age_s"] is None
+        lines = sched.prometheus_lines()
+        assert 'hamclock_ingest_stale{source="cty"} 1' in lines
+
+if __name__ == "__main__":
+    test_intervals_and_backoff()
+    test_prime_and_staleness()
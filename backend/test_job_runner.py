@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import job_runner
+
+def test_concurrency_and_host_limit():
+    print("Testing concurrent jobs with a per-host limit...")
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def job(host):
+        def run():
+            with lock:
+                active[host] = active.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), active[host])
+            time.sleep(0.1)
+            with lock:
+                active[host] -= 1
+        return run
+
+    jobs = [job_runner.Job(f"swpc{i}", job("swpc"), "swpc") for i in range(4)]
+    jobs += [job_runner.Job(f"other{i}", job(f"other{i}"), f"other{i}") for i in range(3)]
+    jobs.append(job_runner.Job("slow", job("grid"), "grid"))
+    started = time.perf_counter()
+    report = job_runner.run_jobs(jobs, max_workers=8, per_host=2, host_limits={})
+    wall = time.perf_counter() - started
+    print(job_runner.format_report(report, wall))
+    assert peak["swpc"] == 2 and len(report) == 8
+    # 4 swpc jobs two at a time = 0.2 s; everything else overlaps with them
+    assert wall < 0.35
+
+def test_order_and_errors():
+    print("\nTesting dependency order and error reporting...")
+    order = []
+
+    def fail():
+        order.append("fail")
+        raise IOError("host down")
+
+    jobs = [job_runner.Job("gzip", lambda: order.append("gzip"), after=["a", "fail"]),
+            job_runner.Job("a", lambda: (time.sleep(0.05), order.append("a"))),
+            job_runner.Job("fail", fail)]
+    report = job_runner.run_jobs(jobs)
+    assert order[-1] == "gzip" and list(report)[-1] == "gzip"
+    assert report["fail"]["error"] == "host down" and report["a"]["error"] is None
+    try:
+        job_runner.run_jobs([job_runner.Job("x", int, after=["y"]), job_runner.Job("y", int, after=["x"])])
+        assert False, "circular dependencies must raise"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    test_concurrency_and_host_limit()
+    test_order_and_errors()
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import metrics
+
+def test_shards_merge():
+    print("Testing per-thread metric shards...")
+    def worker():
+        for _ in range(100):
+            metrics.request_started("/test/shard")
+            metrics.observe_request("/test/shard", 200, 10, 0.002, "hit")
+            metrics.request_finished("/test/shard")
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    route = metrics.render_json()["routes"]["/test/shard"]
+    assert route["requests"] == 400 and route["bytes_out"] == 4000 and route["in_flight"] == 0
+    assert route["latency"]["count"] == 400 and route["latency"]["p50_ms"] == 2.5
+    # Dead threads' shards are folded in, not lost
+    assert metrics.render_json()["routes"]["/test/shard"]["requests"] == 400
+
+def test_instrument_and_prometheus():
+    print("\nTesting service instrumentation and text exposition...")
+    def boom():
+        raise ValueError("x")
+    wrapped = metrics.instrument("test.boom", boom)
+    try:
+        wrapped()
+    except ValueError:
+        pass
+    svc = metrics.render_json()["services"]["test.boom"]
+    assert svc["calls"] == 1 and svc["errors"] == 1
+    text = metrics.render_prometheus()
+    assert 'hamclock_service_errors_total{function="test.boom"} 1' in text
+    assert 'hamclock_service_duration_seconds_bucket{function="test.boom",le="+Inf"} 1' in text
+
+def test_recording_cost():
+    print("\nTesting recording cost...")
+    n = 20000
+    t = time.perf_counter()
+    for _ in range(n):
+        metrics.observe_request("/test/cost", 200, 100, 0.001)
+    per_call_us = (time.perf_counter() - t) / n * 1e6
+    print(f"  observe_request: {per_call_us:.2f} us")
+    assert per_call_us < 50
+
+def test_shared_workers():
+    print("\nTesting prefork metric sharing...")
+    run_dir = tempfile.mkdtemp()
+    try:
+        peer = ({("hamclock_requests_total", (("route", "/test/peer"), ("status", "200"))): 7}, {})
+        with open(os.path.join(run_dir, "metrics.1.pickle"), "wb") as f:
+            pickle.dump(peer, f)
+        metrics.observe_request("/test/peer", 200, 1, 0.001)
+        metrics.share(run_dir, 0, interval=3600)
+        assert metrics.render_json()["routes"]["/test/peer"]["requests"] == 8
+        metrics.publish()
+        assert os.path.exists(os.path.join(run_dir, "metrics.0.pickle"))
+    finally:
+        metrics._shared = None
+        shutil.rmtree(run_dir)
+
+if __name__ == "__main__":
+    test_shards_merge()
+    test_instrument_and_prometheus()
+    test_recording_cost()
+    test_shared_workers()
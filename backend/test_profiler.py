@@ -0,0 +1,43 @@
+import os
+import sys
+import glob
+import pstats
+import shutil
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import profiler
+
+def allocate(n):
+    return [bytes(1024) for _ in range(n)]
+
+def test_sampling():
+    print("Testing profile sampling...")
+    p = profiler.Profiler(["/fetchVOACAPArea.pl"], rate=1.0)
+    assert p.wants("/fetchVOACAPArea.pl")
+    assert not p.wants("/version.pl")
+    p.configure(rate=0)
+    assert not p.wants("/fetchVOACAPArea.pl")
+    p.configure(routes=[])
+    assert not p.wants("/fetchVOACAPArea.pl")
+    assert profiler.route_slug("/SDO/") == "SDO"
+    assert profiler.route_slug("*.bmp.z") == "_bmp_z"
+
+def test_profile_dump():
+    print("\nTesting profile dumps...")
+    out = tempfile.mkdtemp()
+    try:
+        p = profiler.Profiler(["/SDO/"], rate=1.0, trace_malloc=True, out_dir=out)
+        assert len(p.run("/SDO/", allocate, 100)) == 100
+        pst = glob.glob(os.path.join(out, "SDO", "*.pstats"))
+        alloc = glob.glob(os.path.join(out, "SDO", "*.alloc.txt"))
+        assert len(pst) == 1 and len(alloc) == 1
+        funcs = {name for _, _, name in pstats.Stats(pst[0]).stats}
+        assert "allocate" in funcs
+        with open(alloc[0]) as f:
+            assert "test_profiler.py" in f.read()
+    finally:
+        shutil.rmtree(out)
+
+if __name__ == "__main__":
+    test_sampling()
+    test_profile_dump()
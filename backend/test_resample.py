@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import resample
+
+def test_nearest_within_tolerance():
+    print("Testing nearest-sample alignment...")
+    times = np.array([100, 160, 220, 400], dtype=np.int64)
+    # 130 is a tie (earlier wins), 310 is 90 s from both neighbours, 1000 is past the end
+    index = resample.nearest(times, [0, 100, 130, 131, 310, 430, 1000], tolerance=30)
+    assert index.tolist() == [-1, 0, 0, 1, -1, 3, -1]
+    assert resample.nearest(np.array([], dtype=np.int64), [5], 30).tolist() == [-1]
+    assert resample.snap(times, [95, 250], 30).tolist() == [100, 220]
+    assert resample.slots(1000, 3, 60).tolist() == [880, 940, 1000]
+
+def test_series():
+    print("\nTesting Series construction and lookup...")
+    times = resample.parse_times(["2026-02-02 00:01:00.000", "2026-02-02T00:00:00Z", "bad", "2026-02-02 00:01:00.000"])
+    assert times[2] == -1
+    assert resample.parse_times([None]).tolist() == [-1]
+    assert resample.parse_times(["", "2026-02-02T00:00:00Z"]).tolist() == [-1, 1769990400]
+    series = resample.Series.from_columns(times, {"v": resample.to_float(["1.5", None, "7", 2])})
+    # Sorted, unparsable time dropped, the last of a repeated time kept
+    assert series.times.tolist() == [1769990400, 1769990460] and np.isnan(series.columns["v"][0])
+    found, cols = series.at([1769990400, 1769990470, 1769990600], tolerance=30)
+    assert found.tolist() == [True, True, False]
+    assert np.isnan(cols["v"][0]) and cols["v"][1] == 2.0 and np.isnan(cols["v"][2])
+
+def test_render_matches_legacy():
+    print("\nTesting X-ray / solar wind / Bz output against the linear-scan reference...")
+    # The pre-searchsorted implementations are kept as the benchmark's reference
+    import noaa_fetcher
+    import bench_resample
+    now = 1770000000
+    payloads = bench_resample.synthetic_payloads(now)
+    xrays, plasma, mag = (payloads[name] for name in bench_resample.FEEDS)
+    assert noaa_fetcher.render_xray(xrays, now) == bench_resample.legacy_xray(xrays, now)
+    assert noaa_fetcher.render_solar_wind(plasma, mag, now) == bench_resample.legacy_solar_wind(plasma, mag, now)
+
+    # Exact ties between neighbours, repeated times and nulls, in feed (time) order
+    def tag(t):
+        return time.strftime("%Y-%m-%d %H:%M:%S.000", time.gmtime(t))
+    end = (now // 60) * 60
+    plasma = [["time_tag", "density", "speed", "temperature"],
+              [tag(end - 630), "1.00", "300.0", "1"], [tag(end - 570), "2.50", "410.0", "1"],
+              [tag(end - 570), "3.25", None, "1"], [tag(end - 60), None, "500.0", "1"], [tag(end), "4.10", "420.5", "1"]]
+    mag = [["time_tag", "bx_gsm", "by_gsm", "bz_gsm", "lon_gsm", "lat_gsm", "bt"],
+           [tag(end - 900), "1.0", "-2.0", "3.0", "0", "0", "4.0"], [tag(end - 300), "-1.5", "0.5", "-2.5", "0", "0", None],
+           [tag(end - 30), "0.1", "0.2", "0.3", "0", "0", "0.4"]]
+    assert noaa_fetcher.render_solar_wind(plasma, mag, now) == bench_resample.legacy_solar_wind(plasma, mag, now)
+    xray_end = (now // 600) * 600 + 300 - 600
+    xrays = [{"time_tag": tag(t).replace(" ", "T")[:19] + "Z", "energy": energy, "flux": flux}
+             for t, flux in ((xray_end - 1200, 1e-6), (xray_end - 900, 2e-6), (xray_end - 600, 3e-6), (xray_end - 600, 4e-6))
+             for energy in ("0.05-0.4nm", "0.1-0.8nm")]
+    assert noaa_fetcher.render_xray(xrays, now) == bench_resample.legacy_xray(xrays, now)
+
+if __name__ == "__main__":
+    test_nearest_within_tolerance()
+    test_series()
+    test_render_matches_legacy()
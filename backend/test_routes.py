@@ -0,0 +1,42 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from routes import RouteTable
+
+def _table():
+    table = RouteTable()
+    table.add("/version.pl", "version")
+    table.add("/worldwx/wx.txt", "world_wx")
+    table.add_prefix("/SDO/", "sdo", executor="io")
+    table.add_prefix("/geomag/", "static", cacheable=True)
+    table.add_prefix("/a/b/", "deep")
+    table.add_suffix(".txt", "static_txt")
+    table.add_suffix(".bmp.z", "static_bmpz", content_type="application/octet-stream")
+    table.add_suffix(".z", "any_z")
+    return table
+
+def test_route_match():
+    print("Testing route table matching...")
+    table = _table()
+    handler = lambda path: getattr(table.match(path), "handler", None)
+    assert handler("/version.pl") == "version"
+    assert handler("/worldwx/wx.txt") == "world_wx"        # exact beats suffix
+    assert handler("/SDO/f_304_170.bmp.z") == "sdo"         # prefix beats suffix
+    assert handler("/geomag/kindex.txt") == "static"
+    assert handler("/geomag/sub/dir/x") == "static"
+    assert handler("/a/b/c") == "deep" and handler("/a/c.txt") == "static_txt"
+    assert handler("/maps/map-D-DRAP.bmp.z") == "static_bmpz"  # longest suffix wins
+    assert handler("/x.z") == "any_z"
+    assert handler("/geomag") is None and handler("/nope.pl") is None
+    assert table.match("/SDO/x").executor == "io" and table.match("/geomag/x").cacheable
+
+def test_bad_executor():
+    try:
+        RouteTable().add("/x", None, executor="gpu")
+    except ValueError:
+        return
+    assert False, "expected ValueError"
+
+if __name__ == "__main__":
+    test_route_match()
+    test_bad_executor()
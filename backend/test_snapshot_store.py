@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import snapshot_store
+
+def test_publish_and_generation():
+    print("Testing atomic publish and generations...")
+    with tempfile.TemporaryDirectory() as d:
+        store = snapshot_store.SnapshotStore(d, check_interval=0)
+        store.publish("geomag/kindex.txt", "1.00\n2.33\n")
+        first = store.current()
+        assert first.generation == 1 and first.parsed("geomag/kindex.txt") == ((1.0,), (2.33,))
+        with open(os.path.join(d, "geomag", "kindex.txt"), "rb") as f:
+            assert f.read() == b"1.00\n2.33\n"
+        assert not [n for n in os.listdir(os.path.join(d, "geomag")) if n.endswith(".tmp")]
+
+        # A batch is one generation, even when published from several threads
+        with store.batch():
+            threads = [threading.Thread(target=store.publish, args=(name, "5 6 7 8\n"))
+                       for name in ("ssn/ssn-31.txt", "Bz/Bz.txt", "xray/xray.txt")]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert store.current().generation == 1
+        second = store.current()
+        assert second.generation == 2 and second.get("Bz/Bz.txt").generation == 2
+        assert second.get("geomag/kindex.txt").generation == 1
+        assert second.parsed("xray/xray.txt") is None and second.body("xray/xray.txt") == b"5 6 7 8\n"
+        # Snapshots already handed out never change
+        assert first.get("ssn/ssn-31.txt") is None
+
+def test_other_process():
+    print("\nTesting pickup of another process's publishes...")
+    with tempfile.TemporaryDirectory() as d:
+        fetcher = snapshot_store.SnapshotStore(d, check_interval=0)
+        server = snapshot_store.SnapshotStore(d, check_interval=0)
+        fetcher.publish("solar-wind/swind-24hr.txt", "1700000000 4.1 380\n")
+        snap = server.current()
+        assert snap.generation == 1 and snap.parsed("solar-wind/swind-24hr.txt") == ((1700000000.0, 4.1, 380.0),)
+        assert server.current() is snap  # unchanged manifest: same snapshot
+
+        # The server's own publish keeps the fetcher's product listed
+        server.publish("ssn/ssn-31.txt", "2026 01 05 120\n")
+        fetcher.publish("solar-wind/swind-24hr.txt", "1700000060 4.2 390\n")
+        snap = server.current()
+        assert snap.generation == 3 and snap.parsed("ssn/ssn-31.txt") == ((2026.0, 1.0, 5.0, 120.0),)
+        assert snap.parsed("solar-wind/swind-24hr.txt")[-1][2] == 390.0
+
+def test_no_manifest():
+    print("\nTesting products written before any publish...")
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "worldwx"))
+        with open(os.path.join(d, "worldwx", "wx.txt"), "w") as f:
+            f.write("# lat lng ...\n10 20 25.0 50 3.0 180 1013 Clear 3600\n")
+        store = snapshot_store.SnapshotStore(d, check_interval=0)
+        snap = store.current()
+        assert snap.generation == 1 and snap.parsed("worldwx/wx.txt")[0][:2] == (10.0, 20.0)
+        assert store.current().generation == 1
+
+def test_unchanged_and_confirm():
+    print("\nTesting identical publishes and confirm()...")
+    with tempfile.TemporaryDirectory() as d:
+        store = snapshot_store.SnapshotStore(d, check_interval=0)
+        assert not store.confirm("dst/dst.txt")
+        store.publish("dst/dst.txt", "x\n")
+        mtime = os.stat(store.path("dst/dst.txt")).st_mtime_ns
+        mark = store.mark()
+        assert not store.published_since("dst/dst.txt", mark)
+        store.publish("dst/dst.txt", "x\n")
+        assert store.current().generation == 1 and os.stat(store.path("dst/dst.txt")).st_mtime_ns == mtime
+        assert store.published_since("dst/dst.txt", mark)
+        mark = store.mark()
+        assert store.confirm("dst/dst.txt") and store.published_since("dst/dst.txt", mark)
+        report = store.take_report()
+        print(snapshot_store.format_report(report))
+        assert report == {"written": 1, "bytes_written": 2, "unchanged_writes": 1, "confirmed": 1}
+        assert store.take_report()["written"] == 0
+
+def test_large_bodies_not_kept():
+    print("\nTesting that bodies above max_body are not held in memory...")
+    with tempfile.TemporaryDirectory() as d:
+        store = snapshot_store.SnapshotStore(d, check_interval=0, max_body=16)
+        body = "".join(f"{i}.00\n" for i in range(10))
+        store.publish("geomag/kindex.txt", body)
+        dataset = store.current().get("geomag/kindex.txt")
+        assert dataset.body is None and len(dataset.parsed) == 10
+        assert store.stats()["bytes"] == 0
+        store.publish("geomag/kindex.txt", body)  # still recognised as unchanged
+        assert store.current().generation == 1 and store.take_report()["unchanged_writes"] == 1
+
+def test_grid_rows():
+    print("\nTesting worldwx grid rows with and without the TZ column...")
+    body = b"#   lat     lng  temp,C\n10 20 15.0 50 2 90 1013 Clear 3600\n-10 30 25.0 60 3 180 1010 Rain\n1 2 short\n"
+    rows = snapshot_store.parse_grid(body)
+    assert [(lat, lng, len(parts)) for lat, lng, parts in rows] == [(10.0, 20.0, 9), (-10.0, 30.0, 8)]
+
+if __name__ == "__main__":
+    test_publish_and_generation()
+    test_other_process()
+    test_no_manifest()
+    test_unchanged_and_confirm()
+    test_large_bodies_not_kept()
+    test_grid_rows()
@@ -0,0 +1,18 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import startup
+
+def test_lazy_module():
+    print("Testing lazy service modules and warm-up...")
+    loaded = []
+    mod = startup.lazy("colorsys", loaded.append)
+    assert not mod.loaded and startup.status()["modules"]["colorsys"] is None
+    assert mod.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1)
+    assert mod.loaded and [m.__name__ for m in loaded] == ["colorsys"]
+    ran = []
+    startup.warm_up([lambda: ran.append(True)])
+    assert startup.is_ready() and ran and len(loaded) == 1
+
+if __name__ == "__main__":
+    test_lazy_module()
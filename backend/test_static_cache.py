@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+import email.utils
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from static_cache import StaticCache
+
+def _write(path, data, mtime):
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (mtime, mtime))
+
+def test_hit_and_invalidate():
+    print("Testing static cache hit and mtime invalidation...")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "kindex.txt")
+        _write(path, b"1 2 3\n", 1700000000)
+        cache = StaticCache(max_bytes=1024)
+        first = cache.get(path, "text/plain")
+        assert cache.get(path, "text/plain") is first
+        assert b"Content-Length: 6\r\n" in first.headers and first.etag.encode() in first.headers
+
+        _write(path, b"4 5 6 7\n", 1700000600)
+        second = cache.get(path, "text/plain")
+        assert second.body == b"4 5 6 7\n" and second.etag != first.etag
+        assert cache.stats() == {"entries": 1, "bytes": 8, "hits": 1, "misses": 2}
+
+        os.remove(path)
+        assert cache.get(path, "text/plain") is None
+        assert cache.stats()["entries"] == 0
+
+def test_byte_bound():
+    print("\nTesting static cache byte budget...")
+    with tempfile.TemporaryDirectory() as d:
+        cache = StaticCache(max_bytes=100, max_entry_bytes=60)
+        for name in "abc":
+            _write(os.path.join(d, name), name.encode() * 40, 1700000000)
+            cache.get(os.path.join(d, name), "text/plain")
+        assert cache.total_bytes <= 100
+        assert list(cache.entries) == [os.path.join(d, "b"), os.path.join(d, "c")]
+
+        _write(os.path.join(d, "big"), b"x" * 80, 1700000000)
+        big = cache.get(os.path.join(d, "big"), "text/plain")
+        assert big.body is None and b"Content-Length: 80\r\n" in big.headers  # streamed, not cached
+        assert os.path.join(d, "big") not in cache.entries
+
+def test_conditional():
+    print("\nTesting If-None-Match / If-Modified-Since...")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "f.txt")
+        _write(path, b"data", 1700000000)
+        entry = StaticCache().get(path, "text/plain")
+        assert entry.not_modified(if_none_match=entry.etag)
+        assert entry.not_modified(if_none_match=f'"x", W/{entry.etag}')
+        assert not entry.not_modified(if_none_match='"other"', if_modified_since=entry.last_modified)
+        assert entry.not_modified(if_modified_since=entry.last_modified)
+        assert not entry.not_modified(if_modified_since=email.utils.formatdate(1600000000, usegmt=True))
+        assert not entry.not_modified(if_modified_since="garbage")
+        assert not entry.not_modified()
+
+
+def test_gzip_variant():
+    print("\nTesting gzip variants...")
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+    import gzip
+    import gzip_publisher
+    from static_cache import accepts_gzip
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "solar-wind"))
+        path = os.path.join(d, "solar-wind", "swind-24hr.txt")
+        raw = b"".join(b"%d 1.23 456.7\n" % (1700000000 + 60 * i) for i in range(1440))
+        _write(path, raw, 1700000000)
+        _write(os.path.join(d, "small.txt"), b"x", 1700000000)
+
+        report = gzip_publisher.publish_gzip_variants(d)
+        assert list(report) == [os.path.join("solar-wind", "swind-24hr.txt")]
+        assert report[os.path.join("solar-wind", "swind-24hr.txt")][1] < len(raw) // 4
+
+        cache = StaticCache()
+        gz = cache.get_gzip(path, "text/plain")
+        assert gzip.decompress(gz.body) == raw
+        assert b"Content-Encoding: gzip\r\n" in gz.headers
+        assert cache.get(path, "text/plain").body == raw
+        assert b"Vary" not in cache.get(path, "text/plain").headers  # no gzip_suffixes given
+        varying = StaticCache(gzip_suffixes=gzip_publisher.GZIP_SUFFIXES)
+        assert b"Vary: Accept-Encoding\r\n" in varying.get(path, "text/plain").headers
+        assert cache.get_gzip(os.path.join(d, "small.txt"), "text/plain") is None
+
+        _write(path, raw + b"1 2 3\n", 1700000600)  # republished, variant now stale
+        assert cache.get_gzip(path, "text/plain") is None
+
+    assert accepts_gzip("gzip, deflate, br") and accepts_gzip("deflate;q=1.0, GZIP;q=0.5")
+    assert not accepts_gzip("gzip;q=0") and not accepts_gzip("identity") and not accepts_gzip(None)
+
+def test_world_wx_gzip():
+    print("\nTesting /worldwx/wx.txt gzip negotiation...")
+    import gzip
+    import server
+    import gzip_publisher
+    saved_dir = server.DATA_DIR
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, "worldwx"))
+        raw = b"".join(b"%d %d 12.3 45 1013 5 270 Clear 3600\n" % (lat, lng)
+                       for lat in range(-90, 91, 10) for lng in range(-180, 180, 10))
+        _write(os.path.join(d, "worldwx", "wx.txt"), raw, 1700000000)
+        gzip_publisher.publish_gzip_variants(d)
+        server.DATA_DIR = d
+        try:
+            head = b"GET /worldwx/wx.txt HTTP/1.1\r\nHost: x\r\n"
+            plain = server.render_request(head + b"\r\n")[0]
+            packed = server.render_request(head + b"Accept-Encoding: gzip\r\n\r\n")[0]
+        finally:
+            server.DATA_DIR = saved_dir
+    headers, body = plain.split(b"\r\n\r\n", 1)
+    assert body == raw and b"Vary: Accept-Encoding" in headers and b"Content-Encoding" not in headers
+    headers, body = packed.split(b"\r\n\r\n", 1)
+    assert b"Content-Encoding: gzip" in headers and gzip.decompress(body) == raw
+
+if __name__ == "__main__":
+    test_hit_and_invalidate()
+    test_byte_bound()
+    test_conditional()
+    test_gzip_variant()
+    test_world_wx_gzip()
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import telemetry
+
+def test_sketches():
+    print("Testing HyperLogLog, Count-Min and space-saving...")
+    hll = telemetry.HyperLogLog(14)
+    for i in range(20000):
+        hll.add(str(i))
+        hll.add(str(i))  # duplicates don't count
+    assert abs(hll.count() - 20000) / 20000 < 0.03
+    cms = telemetry.CountMinSketch(width=256, depth=4)
+    for i in range(1000):
+        cms.add(f"k{i % 50}")
+    assert cms.estimate("k7") >= 20
+    ss = telemetry.SpaceSaving(k=4)
+    for item in ["a"] * 50 + ["b"] * 30 + list("cdefghij"):
+        ss.add(item)
+    top = ss.top(2)
+    assert [t[0] for t in top] == ["a", "b"] and top[0][1] == 50
+
+def test_observe():
+    print("\nTesting telemetry from access records...")
+    assert telemetry.maidenhead(41.7, -72.7) == "FN31"
+    assert telemetry.maidenhead(*telemetry.grid_center("JO62")) == "JO62"
+    t = telemetry.Telemetry()
+    for cid, version in (("1", "4.22"), ("2", "4.22"), ("3", "4.21")):
+        ua = f"HamClock-linux/{version} (id {cid} up 7200) crc 0"
+        for _ in range(int(cid)):
+            t.observe({"ua": ua, "client": cid, "route": "/fetchVOACAPArea.pl",
+                       "path": "/fetchVOACAPArea.pl?TXLAT=41.7&TXLNG=-72.7&MHZ=14"})
+        t.observe({"ua": ua, "client": cid, "route": "/version.pl", "path": "/version.pl"})
+    snap = t.snapshot()
+    assert snap["requests"] == 9 and snap["unique_clients"] == 3
+    assert snap["versions"]["4.22"]["clients"] == 2 and snap["uptime"]["<1d"] == 9
+    assert snap["clients"][0]["client"] == "3" and snap["clients"][0]["mix"]["/fetchVOACAPArea.pl"] >= 3
+    assert t.prewarm_targets(1)[0]["grid"] == "FN31" and t.prewarm_targets(1)[0]["requests"] == 6
+
+def test_endpoint_top():
+    print("\nTesting /telemetry.json?top= validation...")
+    import server
+    response, _, records = server.render_request(b"GET /telemetry.json?top=abc HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400") and records[0]["status"] == 400
+    response, _, _ = server.render_request(b"GET /telemetry.json?top=100000 HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 200")
+    json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+if __name__ == "__main__":
+    test_sketches()
+    test_observe()
+    test_endpoint_top()
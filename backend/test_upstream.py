@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import threading
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import upstream
+
+BODIES = {"/etag": b"etag body\n", "/plain": b"no validators\n"}
+FAILURES = {"/busy": 2}
+ACTIVE = {"now": 0, "peak": 0}
+ACTIVE_LOCK = threading.Lock()
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/busy":
+            if FAILURES["/busy"] > 0:
+                FAILURES["/busy"] -= 1
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+            return
+        if self.path in ("/slow", "/slower"):
+            with ACTIVE_LOCK:
+                ACTIVE["now"] += 1
+                ACTIVE["peak"] = max(ACTIVE["peak"], ACTIVE["now"])
+            time.sleep(0.05 if self.path == "/slow" else 0.5)
+            with ACTIVE_LOCK:
+                ACTIVE["now"] -= 1
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = BODIES[self.path]
+        if self.path == "/etag" and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if self.path == "/etag":
+            self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_conditional_and_unchanged():
+    print("Testing conditional requests and body hashing...")
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    try:
+        upstream.forget()
+        upstream.take_report()
+        first = upstream.get(base + "/etag")
+        assert first.changed and not first.not_modified and first.text == "etag body\n"
+        again = upstream.get(base + "/etag")
+        assert again.status_code == 200 and again.not_modified and not again.changed
+        assert again.content == BODIES["/etag"]
+
+        assert upstream.get(base + "/plain").changed
+        assert not upstream.get(base + "/plain").changed  # same body, no validators
+        BODIES["/plain"] = b"new body\n"
+        assert upstream.get(base + "/plain").changed
+
+        report = upstream.take_report()
+        print(upstream.format_report(report))
+        assert report["requests"] == 5 and report["not_modified"] == 1
+        assert report["bytes_saved"] == len(BODIES["/etag"])
+        assert report["unchanged"] == 1 and report["bytes_unchanged"] == len(b"no validators\n")
+        assert upstream.take_report()["requests"] == 0
+    finally:
+        server.shutdown()
+
+def test_retry_and_host_limits():
+    print("\nTesting retries, per-host concurrency and the token bucket...")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    saved = dict(upstream.HOST_LIMITS), dict(upstream.HOST_RATES)
+    try:
+        upstream._hosts.pop("127.0.0.1", None)
+        upstream.HOST_LIMITS["127.0.0.1"] = 2
+        upstream.HOST_RATES["127.0.0.1"] = (20.0, 2.0)
+        resp = upstream.fetch(base + "/busy", retries=2)
+        assert resp.status_code == 200 and resp.content == b"ok"
+        stats = upstream.stats()["127.0.0.1"]
+        assert stats["retries"] == 2 and stats["errors"] == 0
+
+        FAILURES["/busy"] = 5
+        assert upstream.fetch(base + "/busy", retries=1).status_code == 503
+        assert upstream.stats()["127.0.0.1"]["errors"] == 1
+
+        # 6 requests, burst 2 then 20/s: at least 0.2 s however many threads
+        started = time.perf_counter()
+        threads = [threading.Thread(target=upstream.fetch, args=(base + "/slow",)) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+        print(upstream.stats()["127.0.0.1"], f"{wall:.3f}s")
+        assert ACTIVE["peak"] <= 2 and wall >= 0.19
+
+        # Interactive callers don't queue behind a busy host: the slot is held, so give up
+        upstream.HOST_LIMITS["127.0.0.1"] = 1
+        upstream._hosts.pop("127.0.0.1", None)
+        holder = threading.Thread(target=upstream.fetch, args=(base + "/slower",))
+        holder.start()
+        time.sleep(0.1)
+        started = time.perf_counter()
+        try:
+            upstream.fetch(base + "/slow", wait=0.01)
+            assert False, "expected HostBusy"
+        except upstream.HostBusy:
+            pass
+        assert time.perf_counter() - started < 0.2
+        holder.join()
+        assert upstream.stats()["127.0.0.1"]["busy"] == 1
+        assert upstream.fetch(base + "/slow", wait=1.0).status_code == 200
+    finally:
+        upstream.HOST_LIMITS.clear()
+        upstream.HOST_LIMITS.update(saved[0])
+        upstream.HOST_RATES.clear()
+        upstream.HOST_RATES.update(saved[1])
+        upstream._hosts.pop("127.0.0.1", None)
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_conditional_and_unchanged()
+    test_retry_and_host_limits()
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import upstream
+import upstream_replay
+
+class Origin(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = f"origin {self.path}\n".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("ETag", '"o1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_record_then_replay():
+    print("Testing recording upstream responses and replaying them offline...")
+    origin = HTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=origin.serve_forever, daemon=True).start()
+    url = f"http://localhost:{origin.server_port}/products/feed.json"
+    with tempfile.TemporaryDirectory() as d:
+        store = upstream_replay.FixtureStore(d)
+        try:
+            upstream.forget()
+            upstream.RECORD = store
+            assert upstream.fetch(url, params={"b": "2", "a": "1"}).text == "origin /products/feed.json?b=2&a=1\n"
+        finally:
+            upstream.RECORD = None
+            origin.shutdown()
+            origin.server_close()
+        assert [m["url"] for m in store.entries()] == [url + "?b=2&a=1"]
+
+        server = upstream_replay.ReplayServer(store).start()
+        try:
+            upstream.REPLAY = server.url
+            assert upstream.fetch(url, params={"b": "2", "a": "1"}).text == "origin /products/feed.json?b=2&a=1\n"
+            assert upstream.fetch(url, retries=0).status_code == 404  # never recorded
+
+            # Recorded validators are honoured, so conditional fetches see 304s
+            first = upstream.get(url, params={"b": "2", "a": "1"})
+            again = upstream.get(url, params={"b": "2", "a": "1"})
+            assert first.changed and again.not_modified and again.content == first.content
+            assert server.counts == {"served": 2, "not_modified": 1, "missing": 1, "errors": 0, "throttled": 0}
+
+            server.throttle_rate = 1.0
+            server.retry_after = 0
+            resp = upstream.fetch(url, params={"b": "2", "a": "1"}, retries=1)
+            assert resp.status_code == 429 and resp.headers["Retry-After"] == "0"
+            server.throttle_rate, server.error_rate = 0.0, 1.0
+            assert upstream.fetch(url, retries=0).status_code == 503
+
+            server.error_rate, server.latency_ms = 0.0, 100.0
+            started = time.perf_counter()
+            assert upstream.fetch(url, params={"b": "2", "a": "1"}).status_code == 200
+            assert time.perf_counter() - started >= 0.1
+            print(server.counts)
+        finally:
+            upstream.REPLAY = ""
+            upstream.forget()
+            server.stop()
+
+if __name__ == "__main__":
+    test_record_then_replay()
@@ -0,0 +1,62 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import numpy as np
+import voacap_ab
+
+def test_pixel_diff():
+    print("Testing A/B pixel diff...")
+    a = np.full((10, 20), 0x07E0, dtype='<u2')  # green
+    b = a.copy()
+    b[0, :5] = 0xF800                          # red
+    d = voacap_ab.pixel_diff(a, b)
+    assert d["changed"] == 0.025
+    assert d["max"] == 170.0
+    assert "error" in voacap_ab.pixel_diff(a, b[:5])
+
+def test_summary_running_means():
+    print("\nTesting A/B summary aggregation...")
+    summary = {}
+    for ms, mae in [(10.0, 1.0), (30.0, 3.0)]:
+        voacap_ab._update_summary(summary, {
+            "map_type": "REL",
+            "current": {"ms": ms, "rss_peak_kb": 100},
+            "orig": {"ms": ms * 10, "rss_peak_kb": 200},
+            "diff": [{"changed": 0.1, "mae": mae, "max": 50.0}],
+        })
+    voacap_ab._update_summary(summary, {"map_type": "REL", "current": {"ms": 20.0}, "orig": {"ms": 0.0, "error": "no map"}})
+    rel = summary["REL"]
+    assert rel["samples"] == 3 and rel["errors"] == 1
+    assert rel["current"]["ms_mean"] == 20.0 and rel["orig"]["ms_max"] == 300.0
+    # The failed orig run is not averaged in
+    assert rel["current"]["runs"] == 3 and rel["orig"]["runs"] == 2 and rel["orig"]["ms_mean"] == 200.0
+    assert rel["diff"]["compared"] == 2 and rel["diff"]["mae_mean"] == 2.0
+
+def test_records_rotate():
+    print("\nTesting A/B record rotation...")
+    saved = voacap_ab.AB_DIR, voacap_ab.AB_RECORDS, voacap_ab.AB_SUMMARY, voacap_ab.AB_RECORDS_MAX_BYTES, voacap_ab._summary
+    with tempfile.TemporaryDirectory() as d:
+        voacap_ab.AB_DIR = d
+        voacap_ab.AB_RECORDS = os.path.join(d, "voacap_ab.jsonl")
+        voacap_ab.AB_SUMMARY = os.path.join(d, "voacap_ab_summary.json")
+        voacap_ab.AB_RECORDS_MAX_BYTES = 200
+        voacap_ab._summary = None
+        try:
+            for _ in range(20):
+                voacap_ab._store({"map_type": "REL", "current": {"ms": 1.0}, "orig": {"ms": 2.0}})
+            assert sorted(os.listdir(d)) == ["voacap_ab.jsonl", "voacap_ab.jsonl.1", "voacap_ab.jsonl.2",
+                                             "voacap_ab_summary.json"]
+            assert os.path.getsize(voacap_ab.AB_RECORDS) < 200 + 100
+        finally:
+            (voacap_ab.AB_DIR, voacap_ab.AB_RECORDS, voacap_ab.AB_SUMMARY,
+             voacap_ab.AB_RECORDS_MAX_BYTES, voacap_ab._summary) = saved
+
+def test_sampling_off():
+    assert voacap_ab.maybe_shadow({"TXLAT": ["0"]}, "REL", rate=0) is False
+
+if __name__ == "__main__":
+    test_pixel_diff()
+    test_summary_running_means()
+    test_records_rotate()
+    test_sampling_off()
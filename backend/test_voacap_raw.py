@@ -0,0 +1,72 @@
+import sys
+import os
+import zlib
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingestion"))
+import numpy as np
+import voacap_service
+
+QUERY = {'TXLAT': ['45'], 'TXLNG': ['-90'], 'MHZ': ['14'], 'UTC': ['12'], 'YEAR': ['2026'], 'MONTH': ['2']}
+
+def test_raw_roundtrip():
+    print("Testing raw VOACAP export round trip...")
+    rel = np.linspace(0.0, 1.0, 660 * 330).reshape(330, 660)
+    muf = np.linspace(0.0, 45.0, 660 * 330).reshape(330, 660)
+    blob = voacap_service.encode_voacap_raw({b"REL\0": rel, b"MUF\0": muf}, 660, 330)
+    header, fields = voacap_service.decode_voacap_raw(blob)
+
+    assert header['width'] == 660 and header['height'] == 330
+    assert header['lat0'] == 90.0 and header['lng0'] == -180.0
+    assert np.max(np.abs(fields['REL'] - rel)) <= 0.5 / 255 + 1e-6
+    assert np.max(np.abs(fields['MUF'] - muf)) <= 0.005 + 1e-4
+    print(f"  {len(blob)} bytes compressed")
+
+def test_raw_matches_grid():
+    print("\nTesting raw export against the vectorized grid...")
+    voacap_service.VOACAP_RAW_CACHE.clear()
+    blob = voacap_service.generate_voacap_raw(QUERY)
+    assert voacap_service.generate_voacap_raw(QUERY) is blob  # cached
+
+    raw = zlib.decompress(blob)
+    # uint8 REL + uint16 MUF: 3 bytes/pixel vs 8 for a float32 pair
+    assert len(raw) < 660 * 330 * 8 / 2.5
+
+    header, fields = voacap_service.decode_voacap_raw(blob)
+    assert fields['REL'].shape == (330, 660)
+    assert 0.0 <= fields['REL'].min() and fields['REL'].max() <= 1.0
+    assert fields['MUF'].max() > 0.0
+
+def test_raw_resample():
+    print("\nTesting raw export resampling...")
+    q = dict(QUERY, WIDTH=['330'], HEIGHT=['165'])
+    header, fields = voacap_service.decode_voacap_raw(voacap_service.generate_voacap_raw(q))
+    assert (header['width'], header['height']) == (330, 165)
+    assert fields['MUF'].shape == (165, 330)
+
+def test_raw_cache_concurrent_eviction():
+    print("\nTesting raw cache eviction under concurrent exports...")
+    voacap_service.VOACAP_RAW_CACHE.clear()
+    for i in range(voacap_service.MAX_CACHE_SIZE):
+        voacap_service.VOACAP_RAW_CACHE[('filler', i)] = b""
+    results = []
+
+    def export(mhz):
+        q = dict(QUERY, MHZ=[str(mhz)], WIDTH=['66'], HEIGHT=['33'])
+        for _ in range(5):
+            results.append(voacap_service.generate_voacap_raw(q))
+
+    threads = [threading.Thread(target=export, args=(mhz,)) for mhz in range(3, 27, 3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 5 * len(threads) and all(r is not None for r in results)
+    assert len(voacap_service.VOACAP_RAW_CACHE) <= voacap_service.MAX_CACHE_SIZE
+    voacap_service.VOACAP_RAW_CACHE.clear()
+
+if __name__ == "__main__":
+    test_raw_roundtrip()
+    test_raw_matches_grid()
+    test_raw_resample()
+    test_raw_cache_concurrent_eviction()
+    print("\nAll raw export tests passed!")
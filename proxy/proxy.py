@@ -6,6 +6,7 @@ import datetime
 import hashlib
 import difflib
 import json
+import threading
 import parity_checker
 
 PORT = int(os.environ.get("PROXY_PORT", 9085))
@@ -25,6 +26,40 @@ PARITY_SUMMARY = os.environ.get("PARITY_SUMMARY", os.path.join(DEBUG_DIR, "logs"
 # EXCLUSIVE: Only local backend
 PROXY_MODE = os.environ.get("PROXY_MODE", "SHADOW").upper()
 
+# Hop-by-hop headers are never forwarded between client and backends
+HOP_BY_HOP = {"connection", "keep-alive", "proxy-connection", "te", "trailer", "transfer-encoding", "upgrade"}
+
+class ConnectionPool:
+    """Idle keep-alive HTTPConnections per (host, port), shared by handler threads."""
+
+    def __init__(self, max_idle=8):
+        self.max_idle = max_idle
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def get(self, host, port, timeout):
+        """Return (connection, reused)."""
+        with self.lock:
+            conns = self.idle.get((host, port))
+            if conns:
+                conn = conns.pop()
+                if conn.sock:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def put(self, host, port, conn):
+        with self.lock:
+            conns = self.idle.setdefault((host, port), [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
+
+BACKEND_POOL = ConnectionPool()
+# Errors that mean a pooled connection went stale before the request reached the backend
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
 class ShadowProxy(http.server.SimpleHTTPRequestHandler):
     def update_parity_summary(self, path, match_result):
         try:
@@ -67,19 +102,32 @@ class ShadowProxy(http.server.SimpleHTTPRequestHandler):
             print(f"  [SUMMARY] Error: {e}")
 
     def fetch_from_backend(self, host, port, timeout, path, headers):
-        try:
-            conn = http.client.HTTPConnection(host, port, timeout=timeout)
-            # Remove host header to avoid conflicts
-            clean_headers = {key: val for key, val in headers.items() if key.lower() != 'host'}
-            conn.request("GET", path, headers=clean_headers)
-            response = conn.getresponse()
-            data = response.read()
-            status = response.status
-            resp_headers = response.getheaders()
-            conn.close()
-            return status, resp_headers, data
-        except Exception as e:
-            return 502, [], str(e).encode()
+        # Remove host and hop-by-hop headers to avoid conflicts
+        clean_headers = {key: val for key, val in headers.items()
+                         if key.lower() != 'host' and key.lower() not in HOP_BY_HOP}
+        conn, reused = BACKEND_POOL.get(host, port, timeout)
+        while True:
+            try:
+                conn.request("GET", path, headers=clean_headers)
+                response = conn.getresponse()
+                data = response.read()
+            except STALE_CONNECTION_ERRORS as e:
+                conn.close()
+                if reused:
+                    # Idle connection was closed by the peer: retry once on a fresh one
+                    conn, reused = http.client.HTTPConnection(host, port, timeout=timeout), False
+                    continue
+                return 502, [], str(e).encode()
+            except Exception as e:
+                # Timeouts included: the backend may already be working on the request
+                conn.close()
+                return 502, [], str(e).encode()
+
+            if response.will_close:
+                conn.close()
+            else:
+                BACKEND_POOL.put(host, port, conn)
+            return response.status, response.getheaders(), data
 
     def do_GET(self):
         if self.path.startswith("/parity"):
@@ -129,16 +177,19 @@ class ShadowProxy(http.server.SimpleHTTPRequestHandler):
             print(f"  [VERIFY] SERVED ORIGINAL: {self.path}")
             self.send_backend_response(orig_status, orig_headers, orig_data)
 
-    protocol_version = "HTTP/1.0"
+    # HTTP/1.1 keep-alive towards HamClock; every response carries Content-Length
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+    # Headers and body go out in separate writes; don't let Nagle hold the body
+    disable_nagle_algorithm = True
 
     def send_backend_response(self, status, headers, data):
         try:
             self.send_response(status)
             for key, val in headers:
-                if key.lower() not in ['content-length', 'transfer-encoding', 'connection']:
+                if key.lower() != 'content-length' and key.lower() not in HOP_BY_HOP:
                     self.send_header(key, val)
             self.send_header("Content-Length", str(len(data)))
-            self.send_header("Connection", "close")
             self.end_headers()
             self.wfile.write(data)
         except (BrokenPipeError, ConnectionResetError):
@@ -225,11 +276,13 @@ class ShadowProxy(http.server.SimpleHTTPRequestHandler):
                 html += "<p>No parity data collected yet.</p>"
             
             html += "</body></html>"
-            
+            body = html.encode('utf-8')
+
             self.send_response(200)
             self.send_header("Content-type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
             self.end_headers()
-            self.wfile.write(html.encode('utf-8'))
+            self.wfile.write(body)
         except Exception as e:
             self.send_error(500, str(e))
 
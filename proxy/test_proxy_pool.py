@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import socket
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import proxy
+
+def _backend(handle):
+    """One-shot raw TCP backend on a free port; `handle(conn, n)` answers the n-th connection."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(8)
+    calls = []
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            calls.append(time.time())
+            threading.Thread(target=handle, args=(conn, len(calls)), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener, calls
+
+def _ok(conn):
+    conn.recv(65536)
+    conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+
+def test_stale_connection_retried_once():
+    print("Testing a stale pooled connection is retried once on a fresh one...")
+    def handle(conn, n):
+        _ok(conn)
+        conn.close()  # keep-alive response, then the backend drops the idle connection
+    listener, calls = _backend(handle)
+    port = listener.getsockname()[1]
+    fetch = proxy.ShadowProxy.fetch_from_backend
+    assert fetch(None, "127.0.0.1", port, 5, "/a", {})[0] == 200
+    time.sleep(0.1)
+    status, _, data = fetch(None, "127.0.0.1", port, 5, "/b", {})
+    assert status == 200 and data == b"ok" and len(calls) == 2
+    listener.close()
+
+def test_timeout_not_retried():
+    print("\nTesting a timeout on a pooled connection answers 502 without a retry...")
+    def handle(conn, n):
+        if n == 1:
+            _ok(conn)
+            conn.recv(65536)  # second request on the kept-alive connection: never answered
+            time.sleep(2)
+        else:
+            _ok(conn)
+        conn.close()
+    listener, calls = _backend(handle)
+    port = listener.getsockname()[1]
+    fetch = proxy.ShadowProxy.fetch_from_backend
+    assert fetch(None, "127.0.0.1", port, 5, "/a", {})[0] == 200
+    started = time.perf_counter()
+    status, _, _ = fetch(None, "127.0.0.1", port, 0.3, "/slow", {})
+    assert status == 502 and time.perf_counter() - started < 0.6 and len(calls) == 1
+    listener.close()
+
+if __name__ == "__main__":
+    test_stale_connection_retried_once()
+    test_timeout_not_retried()
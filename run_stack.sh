@@ -89,6 +89,8 @@ stop_client() {
 
 start_backend() {
     stop_backend
+    echo "Building VOACAP asset bundle..."
+    python3 backend/scripts/build_voacap_assets.py >> "$LOG_DIR/server.log" 2>&1
     echo "Starting Backend Server (Port $BACKEND_PORT)..."
     python3 -u backend/server.py >> "$LOG_DIR/server.log" 2>&1 &
     echo "Starting Data Scheduler..."